@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+from threading import Thread, Lock
+import requests
+from requests.adapters import HTTPAdapter
+
+__all__ = [u'get_session', u'prewarm']
+
+#pool settings
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 4
+PREWARM_TIMEOUT = 5.0
+
+__session = None
+__lock = Lock()
+logger = logging.getLogger(u'httpsession')
+
+
+def get_session():
+    """
+    Return module wide http session. Session keeps connections alive and pools them per host, so successive
+    requests to the same host don't pay for new TCP and TLS handshakes
+
+    Return:
+        Session: requests session instance
+    """
+    global __session
+    with __lock:
+        if __session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+            session.mount(u'http://', adapter)
+            session.mount(u'https://', adapter)
+            __session = session
+
+    return __session
+
+
+def __prewarm(url):
+    """
+    Open connection to specified url
+
+    Args:
+        url (string): url to connect to
+    """
+    try:
+        get_session().head(url, timeout=PREWARM_TIMEOUT)
+    except:
+        #connection will be opened by next request
+        logger.debug(u'Unable to prewarm connection to %s' % url)
+
+
+def prewarm(url):
+    """
+    Open connection to specified url in background, so it is ready (and pooled) when real request is sent
+
+    Args:
+        url (string): url to connect to
+    """
+    thread = Thread(target=__prewarm, args=(url,))
+    thread.daemon = True
+    thread.start()
+
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from threading import Lock
+import numpy
+
+__all__ = [u'RollingHistogram', u'LatencyTracker']
+
+
+class RollingHistogram(object):
+    """
+    Distribution of last values (rolling window) stored in a preallocated array
+    """
+
+    def __init__(self, size=200):
+        """
+        Constructor
+
+        Args:
+            size (int): number of values kept
+        """
+        #members
+        self.size = size
+        self.__values = numpy.zeros(size, dtype=numpy.float64)
+        self.__count = 0
+        self.__lock = Lock()
+
+    def add(self, value):
+        """
+        Add value (oldest value is dropped when window is full)
+
+        Args:
+            value (float): value
+        """
+        with self.__lock:
+            self.__values[self.__count % self.size] = value
+            self.__count += 1
+
+    def reset(self):
+        """
+        Drop all values
+        """
+        with self.__lock:
+            self.__count = 0
+
+    def get_stats(self):
+        """
+        Return distribution of values in window
+
+        Return:
+            dict: count (int): number of values added since reset, window (int): number of values in window,
+                  mean, p50, p95, p99, max (float): None if no value
+        """
+        with self.__lock:
+            count = self.__count
+            values = self.__values[:min(count, self.size)].copy()
+
+        if len(values)==0:
+            return {u'count': count, u'window': 0, u'mean': None, u'p50': None, u'p95': None, u'p99': None, u'max': None}
+
+        p50, p95, p99 = numpy.percentile(values, [50, 95, 99])
+        return {
+            u'count': count,
+            u'window': len(values),
+            u'mean': float(values.mean()),
+            u'p50': float(p50),
+            u'p95': float(p95),
+            u'p99': float(p99),
+            u'max': float(values.max())
+        }
+
+
+class LatencyTracker(object):
+    """
+    Aggregate latencies of command processing stages.
+
+    Each command carries a timeline (dict of timestamps in seconds, see MARK_XXX), and each stage is the duration
+    between two marks of the timeline. Stages whose marks are missing in timeline are ignored.
+    """
+
+    MARK_HOTWORD_CAPTURE = u'hotword_capture'
+    MARK_HOTWORD = u'hotword'
+    MARK_SPEECH_END = u'speech_end'
+    MARK_ENDPOINT = u'endpoint'
+    MARK_AUDIO_READY = u'audio_ready'
+    MARK_STT_REQUEST = u'stt_request'
+    MARK_STT_RESPONSE = u'stt_response'
+    MARK_EVENT = u'event'
+
+    #stage name, start mark, end mark
+    STAGES = [
+        (u'detection', MARK_HOTWORD_CAPTURE, MARK_HOTWORD),
+        (u'endpointing', MARK_SPEECH_END, MARK_ENDPOINT),
+        (u'audio', MARK_ENDPOINT, MARK_AUDIO_READY),
+        (u'queue', MARK_AUDIO_READY, MARK_STT_REQUEST),
+        (u'stt', MARK_STT_REQUEST, MARK_STT_RESPONSE),
+        (u'event', MARK_STT_RESPONSE, MARK_EVENT),
+        (u'total', MARK_SPEECH_END, MARK_EVENT),
+    ]
+
+    def __init__(self, window=200):
+        """
+        Constructor
+
+        Args:
+            window (int): number of last commands kept per stage
+        """
+        #members
+        self.histograms = dict([(stage, RollingHistogram(window)) for stage, _, _ in self.STAGES])
+
+    def add_timeline(self, timeline):
+        """
+        Add command timeline
+
+        Args:
+            timeline (dict): command timeline (mark: timestamp)
+        """
+        for stage, start, end in self.STAGES:
+            if timeline.get(start) is not None and timeline.get(end) is not None:
+                self.histograms[stage].add(timeline[end] - timeline[start])
+
+    def reset(self):
+        """
+        Reset all stages
+        """
+        for histogram in self.histograms.values():
+            histogram.reset()
+
+    def get_stats(self):
+        """
+        Return latency distribution of each stage
+
+        Return:
+            dict: stages stats (see RollingHistogram.get_stats) in seconds
+        """
+        return dict([(stage, histogram.get_stats()) for stage, histogram in self.histograms.items()])
+
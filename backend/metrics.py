@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import itertools
+from threading import Lock
+
+__all__ = [u'Counter', u'CallbackMetric', u'MetricsRegistry']
+
+
+def format_sample(name, labels=None):
+    """
+    Format sample name with its labels (Prometheus syntax)
+
+    Args:
+        name (string): metric name
+        labels (dict): metric labels
+
+    Return:
+        string: sample name (name{label="value",...})
+    """
+    if not labels:
+        return name
+    values = [u'%s="%s"' % (key, unicode(labels[key]).replace(u'\\', u'\\\\').replace(u'"', u'\\"')) for key in sorted(labels.keys())]
+    return u'%s{%s}' % (name, u','.join(values))
+
+
+class Counter(object):
+    """
+    Monotonic counter that can be incremented from any thread without lock.
+
+    Value is held by an itertools.count: next() is a single C call executed under the GIL, so concurrent
+    increments are never lost, and nothing is looked up or built when incrementing.
+    """
+
+    TYPE = u'counter'
+
+    def __init__(self, name, help, labels=None):
+        """
+        Constructor
+
+        Args:
+            name (string): metric name
+            help (string): metric description
+            labels (dict): metric labels
+        """
+        #members
+        self.name = name
+        self.help = help
+        self.labels = labels or {}
+        self.__count = itertools.count()
+        #bound method: counter.inc() costs a single call
+        self.inc = self.__count.next
+
+    def get(self):
+        """
+        Return counter value
+
+        Return:
+            int: value
+        """
+        #pickling state of itertools.count is its next value, read without incrementing
+        return self.__count.__reduce__()[1][0]
+
+
+class CallbackMetric(object):
+    """
+    Metric whose value is read from a callback when metrics are collected (nothing is done on hot path)
+    """
+
+    def __init__(self, name, help, callback, type=u'gauge', labels=None):
+        """
+        Constructor
+
+        Args:
+            name (string): metric name
+            help (string): metric description
+            callback (function): function returning metric value (no param)
+            type (string): metric type (gauge or counter)
+            labels (dict): metric labels
+        """
+        #members
+        self.name = name
+        self.help = help
+        self.TYPE = type
+        self.labels = labels or {}
+        self.__callback = callback
+
+    def get(self):
+        """
+        Return metric value
+
+        Return:
+            int|float: value
+        """
+        return self.__callback()
+
+
+class MetricsRegistry(object):
+    """
+    Registry of module metrics. Metrics are registered once (at startup) and then updated without lock nor
+    allocation. Registering an existing metric (same name and labels) returns existing instance, so a metric
+    survives objects updating it (metrics are not reset when speech recognition task restarts).
+    """
+
+    def __init__(self, namespace=None):
+        """
+        Constructor
+
+        Args:
+            namespace (string): prefix of metrics names in Prometheus output
+        """
+        #members
+        self.namespace = namespace
+        self.__metrics = []
+        self.__samples = {}
+        self.__lock = Lock()
+
+    def __register(self, metric):
+        """
+        Register metric
+
+        Args:
+            metric (Counter|CallbackMetric): metric to register
+
+        Return:
+            registered metric (existing one if any)
+        """
+        sample = format_sample(metric.name, metric.labels)
+        with self.__lock:
+            if sample in self.__samples:
+                return self.__samples[sample]
+            self.__samples[sample] = metric
+            self.__metrics.append(metric)
+
+        return metric
+
+    def counter(self, name, help, labels=None):
+        """
+        Register counter
+
+        Args:
+            name (string): metric name
+            help (string): metric description
+            labels (dict): metric labels
+
+        Return:
+            Counter: counter instance
+        """
+        return self.__register(Counter(name, help, labels))
+
+    def callback(self, name, help, callback, type=u'gauge', labels=None):
+        """
+        Register metric read from callback
+
+        Args:
+            name (string): metric name
+            help (string): metric description
+            callback (function): function returning metric value
+            type (string): metric type (gauge or counter)
+            labels (dict): metric labels
+
+        Return:
+            CallbackMetric: metric instance
+        """
+        if type not in (u'gauge', u'counter'):
+            raise Exception(u'Parameter type is invalid: gauge or counter expected')
+
+        return self.__register(CallbackMetric(name, help, callback, type, labels))
+
+    def get_values(self):
+        """
+        Return metrics values
+
+        Return:
+            dict: values by sample name (name or name{label="value"})
+        """
+        with self.__lock:
+            metrics = list(self.__metrics)
+
+        return dict([(format_sample(metric.name, metric.labels), metric.get()) for metric in metrics])
+
+    def to_prometheus(self):
+        """
+        Return metrics in Prometheus text exposition format
+
+        Return:
+            string: metrics dump
+        """
+        with self.__lock:
+            metrics = list(self.__metrics)
+
+        #group samples by metric name (HELP and TYPE written once)
+        names = []
+        groups = {}
+        for metric in metrics:
+            if metric.name not in groups:
+                names.append(metric.name)
+                groups[metric.name] = []
+            groups[metric.name].append(metric)
+
+        lines = []
+        for name in names:
+            full_name = u'%s_%s' % (self.namespace, name) if self.namespace else name
+            lines.append(u'# HELP %s %s' % (full_name, groups[name][0].help))
+            lines.append(u'# TYPE %s %s' % (full_name, groups[name][0].TYPE))
+            for metric in groups[name]:
+                value = metric.get()
+                lines.append(u'%s %s' % (format_sample(full_name, metric.labels), value if value is not None else u'NaN'))
+
+        return u'\n'.join(lines) + u'\n'
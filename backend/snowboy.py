@@ -2,11 +2,14 @@
 # -*- coding: utf-8 -*
 
 import logging
-import io
-import requests
 import os
+import time
 import uuid
-import raspiot.libs.internals.tools as Tools
+import json
+import struct
+import base64
+import hashlib
+from raspiot.libs.externals.httpsession import get_session
 from raspiot.utils import MissingParameter
 
 class Snowboy():
@@ -35,20 +38,29 @@ class Snowboy():
     }
     AGE_GROUP = [u'0_9', u'10_19', u'20_29', u'30_39', u'40_49', u'50_59', u'60+']
     GENDER = [u'F', u'M']
+    CACHE_SIZE = 5
+    #last access time of cached models (file mtime can't be touched on read-only filesystem)
+    CACHE_INDEX = u'index.json'
+    #read size of recordings, multiple of 3 to encode base64 by chunks
+    CHUNK_SIZE = 3 * 8192
         
-    def __init__(self, cleep_filesystem, token=None):
+    def __init__(self, cleep_filesystem, token=None, cache_path=None, cache_size=CACHE_SIZE):
         """
         Constructor
 
         Args:
             cleep_filesystem (CleepFilesystem): CleepFilesystem instance
             token (string): api token
+            cache_path (string): directory to cache trained voice models in. If None cache is disabled
+            cache_size (int): max number of cached voice models (least recently used models are evicted)
         """
         #members
         self.logger = logging.getLogger(self.__class__.__name__)
         self.logger.setLevel(logging.DEBUG)
         self.cleep_filesystem = cleep_filesystem
         self.token = token
+        self.cache_path = cache_path
+        self.cache_size = cache_size
 
     def set_api_token(self, token):
         """
@@ -81,16 +93,134 @@ class Snowboy():
         #check params
         if record1 is None or not os.path.exists(record1):
             raise MissingParameter('Parameter record1 is invalid')
-        if record2 is None or not os.path.exists(record1):
+        if record2 is None or not os.path.exists(record2):
             raise MissingParameter('Parameter record2 is invalid')
-        if record3 is None or not os.path.exists(record1):
+        if record3 is None or not os.path.exists(record3):
             raise MissingParameter('Parameter record3 is invalid')
+
+        #recordings are read by chunks when needed
+        sources = [lambda record=record: self.__iter_file(record) for record in (record1, record2, record3)]
+        return self.__train(sources, hotword)
+
+    def train_samples(self, samples, hotword=u'unknown', rate=16000, channels=1, sample_width=2):
+        """
+        Train to get personal voice model from in-memory recordings (no file involved)
+
+        Args:
+            samples (list): list of 3 raw PCM voice recordings (bytes)
+            hotword (string): hotword corresponding to recordings
+            rate (int): samples rate (in Hz)
+            channels (int): number of channels
+            sample_width (int): sample width (in bytes)
+
+        Return:
+            string: path to personal voice model (note that generated file is never deleted by the library)
+        """
+        #check params
+        if samples is None or len(samples)!=3:
+            raise MissingParameter('Parameter samples is invalid: 3 recordings are expected')
+        for sample in samples:
+            if sample is None or len(sample)==0:
+                raise MissingParameter('Parameter samples is invalid: empty recording')
+
+        sources = [lambda sample=sample: self.__iter_pcm(sample, rate, channels, sample_width) for sample in samples]
+        return self.__train(sources, hotword)
+
+    def __iter_file(self, path):
+        """
+        Read file by chunks
+
+        Args:
+            path (string): file path
+
+        Return:
+            generator: file content chunks (bytes)
+        """
+        with open(path, u'rb') as fd:
+            while True:
+                chunk = fd.read(self.CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+    def __iter_pcm(self, data, rate, channels, sample_width):
+        """
+        Build wav content from raw PCM data by chunks (PCM data is not copied)
+
+        Args:
+            data (bytes): raw PCM data
+            rate (int): samples rate (in Hz)
+            channels (int): number of channels
+            sample_width (int): sample width (in bytes)
+
+        Return:
+            generator: wav content chunks (bytes)
+        """
+        yield struct.pack('<4sI4s4sIHHIIHH4sI', b'RIFF', 36 + len(data), b'WAVE', b'fmt ', 16, 1, channels, rate,
+                          rate * channels * sample_width, channels * sample_width, sample_width * 8, b'data', len(data))
+        view = memoryview(data)
+        for offset in range(0, len(data), self.CHUNK_SIZE):
+            yield view[offset:offset+self.CHUNK_SIZE].tobytes()
+
+    def __iter_base64(self, chunks):
+        """
+        Encode chunks to base64 by chunks
+
+        Args:
+            chunks (iterable): data chunks (bytes)
+
+        Return:
+            generator: base64 encoded chunks (bytes)
+        """
+        pending = b''
+        for chunk in chunks:
+            chunk = pending + chunk
+            size = len(chunk) - len(chunk) % 3
+            if size>0:
+                yield base64.b64encode(chunk[:size])
+            pending = chunk[size:]
+        if len(pending)>0:
+            yield base64.b64encode(pending)
+
+    def __iter_body(self, data, sources):
+        """
+        Build training request json body by chunks, so recordings are never fully loaded (neither encoded) in
+        memory
+
+        Args:
+            data (dict): training parameters
+            sources (list): list of recordings sources (function returning recording chunks)
+
+        Return:
+            generator: json body chunks (bytes)
+        """
+        #parameters and opening of voice samples list
+        yield (json.dumps(data)[:-1] + u', "voice_samples": [').encode(u'utf-8')
+        for index, source in enumerate(sources):
+            yield b'{"wave": "' if index==0 else b', {"wave": "'
+            for chunk in self.__iter_base64(source()):
+                yield chunk
+            yield b'"}'
+        yield b']}'
+
+    def __train(self, sources, hotword):
+        """
+        Post voice recordings to snowboy training api
+
+        Args:
+            sources (list): list of 3 wav recordings sources (function returning recording chunks)
+            hotword (string): hotword corresponding to recordings
+
+        Return:
+            string: path to personal voice model
+        """
+        #check params
         if hotword is None or len(hotword)==0:
             raise MissingParameter('Parameter hotword is invalid')
         if self.token is None or len(self.token.strip())==0:
             raise MissingParameter('Please set snowboy api token before training')
-        
-        #prepare data
+
+        #prepare data (voice samples are streamed)
         #TODO append other data (age_group, gender, microphone and language)
         data = {
             u'name': hotword,
@@ -99,30 +229,182 @@ class Snowboy():
             u'language': 'ot',
             u'universal_hotword': {
                 u'language': 'ot'
-            },
-            u'voice_samples': [
-                {u'wave': Tools.file_to_base64(record1)},
-                {u'wave': Tools.file_to_base64(record2)},
-                {u'wave': Tools.file_to_base64(record3)}
-            ]
+            }
         }
 
-        #post
+        #same recordings and parameters always give same model
         voice_model_path = '%s.pmdl' % os.path.join('/tmp', str(uuid.uuid4()))
+        cache_key = self.__get_cache_key(data, sources)
+        cached_model_path = self.__get_cached_model(cache_key)
+        if cached_model_path is not None:
+            self.__copy_file(cached_model_path, voice_model_path)
+            self.logger.info('Personal voice model found in cache and wrote to %s' % voice_model_path)
+            return voice_model_path
+
+        #post
         self.logger.debug('Personal voice model will be stored to %s' % voice_model_path)
         try:
-            resp = requests.post(self.SNOWBOY_TRAIN_V1, json=data)
-            if resp.status_code!=201:
-                self.logger.debug('Train response %s: %s' % (resp.status_code, resp.content))
-            if resp.ok:
-                fd = self.cleep_filesystem.open(voice_model_path, u'wb')
-                fd.write(resp.content)
-                self.cleep_filesystem.close(fd)
-                self.logger.info('Personal voice model wrote to %s' % voice_model_path)
-
-                return voice_model_path
+            headers = {u'Content-Type': u'application/json'}
+            resp = get_session().post(self.SNOWBOY_TRAIN_V1, data=self.__iter_body(data, sources), headers=headers, stream=True)
+            try:
+                if resp.status_code!=201:
+                    self.logger.debug('Train response %s: %s' % (resp.status_code, resp.content))
+                if resp.ok:
+                    #stream model to disk
+                    fd = self.cleep_filesystem.open(voice_model_path, u'wb')
+                    try:
+                        for chunk in resp.iter_content(self.CHUNK_SIZE):
+                            fd.write(chunk)
+                    finally:
+                        self.cleep_filesystem.close(fd)
+                    self.logger.info('Personal voice model wrote to %s' % voice_model_path)
+                    self.__cache_model(cache_key, voice_model_path)
+
+                    return voice_model_path
+            finally:
+                resp.close()
         except:
-            self.logger.exception('Failed to train at %s with %s' % (self.SNOWBOY_TRAIN_V1, data))
+            self.logger.exception('Failed to train hotword "%s" at %s' % (hotword, self.SNOWBOY_TRAIN_V1))
             raise Exception(u'Error during personal voice model build')
 
+    def __copy_file(self, src, dst):
+        """
+        Copy file by chunks
+
+        Args:
+            src (string): source file path
+            dst (string): destination file path
+        """
+        fd = self.cleep_filesystem.open(dst, u'wb')
+        try:
+            for chunk in self.__iter_file(src):
+                fd.write(chunk)
+        finally:
+            self.cleep_filesystem.close(fd)
+
+    def __get_cache_key(self, data, sources):
+        """
+        Compute cache key of training request: hash of recordings and training parameters (api token is not part
+        of key because it doesn't change generated model)
+
+        Args:
+            data (dict): training parameters
+            sources (list): list of recordings sources (function returning recording chunks)
+
+        Return:
+            string: cache key
+        """
+        hasher = hashlib.sha256()
+        for key in (u'name', u'microphone', u'language'):
+            hasher.update((u'%s=%s;' % (key, data[key])).encode(u'utf-8'))
+        hasher.update((u'universal_language=%s;' % data[u'universal_hotword'][u'language']).encode(u'utf-8'))
+        for source in sources:
+            sample_hasher = hashlib.sha256()
+            for chunk in source():
+                sample_hasher.update(chunk)
+            hasher.update(sample_hasher.digest())
+
+        return hasher.hexdigest()
+
+    def __get_cache_file(self, cache_key):
+        """
+        Return cache file path of specified key
+
+        Args:
+            cache_key (string): cache key
+
+        Return:
+            string: cached voice model path
+        """
+        return os.path.join(self.cache_path, u'%s.pmdl' % cache_key)
+
+    def __get_cached_model(self, cache_key):
+        """
+        Return cached voice model
+
+        Args:
+            cache_key (string): cache key
+
+        Return:
+            string: cached voice model path or None if not cached
+        """
+        if not self.cache_path:
+            return None
+
+        path = self.__get_cache_file(cache_key)
+        if not os.path.exists(path):
+            return None
 
+        #mark model as recently used
+        try:
+            index = self.__load_cache_index()
+            index[cache_key] = time.time()
+            self.__save_cache_index(index)
+        except:
+            self.logger.exception(u'Unable to update voice models cache index')
+
+        return path
+
+    def __load_cache_index(self):
+        """
+        Load last access time of cached models
+
+        Return:
+            dict: last access time (timestamp) by cache key (empty if index doesn't exist or is invalid)
+        """
+        path = os.path.join(self.cache_path, self.CACHE_INDEX)
+        if not os.path.exists(path):
+            return {}
+
+        try:
+            with open(path, u'r') as fd:
+                index = json.load(fd)
+            return index if isinstance(index, dict) else {}
+        except:
+            self.logger.exception(u'Invalid voice models cache index, it is reset')
+            return {}
+
+    def __save_cache_index(self, index):
+        """
+        Save last access time of cached models
+
+        Args:
+            index (dict): last access time by cache key
+        """
+        fd = self.cleep_filesystem.open(os.path.join(self.cache_path, self.CACHE_INDEX), u'w')
+        try:
+            fd.write(json.dumps(index))
+        finally:
+            self.cleep_filesystem.close(fd)
+
+    def __cache_model(self, cache_key, voice_model_path):
+        """
+        Store voice model in cache, evicting least recently used models if cache is full
+
+        Args:
+            cache_key (string): cache key
+            voice_model_path (string): voice model to cache
+        """
+        if not self.cache_path or self.cache_size<=0:
+            return
+
+        try:
+            if not os.path.exists(self.cache_path):
+                self.cleep_filesystem.mkdir(self.cache_path, True)
+            self.__copy_file(voice_model_path, self.__get_cache_file(cache_key))
+            index = self.__load_cache_index()
+            index[cache_key] = time.time()
+
+            #evict least recently used models (models missing from index are the oldest ones)
+            keys = [os.path.splitext(filename)[0] for filename in os.listdir(self.cache_path) if filename.endswith(u'.pmdl')]
+            keys.sort(key=lambda key: index.get(key, 0), reverse=True)
+            for key in keys[self.cache_size:]:
+                path = self.__get_cache_file(key)
+                self.logger.debug(u'Evict cached voice model %s' % path)
+                self.cleep_filesystem.rm(path)
+            index = dict([(key, index[key]) for key in keys[:self.cache_size] if key in index])
+            self.__save_cache_index(index)
+
+        except:
+            #cache is not mandatory
+            self.logger.exception(u'Unable to cache voice model:')
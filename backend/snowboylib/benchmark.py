@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import wave
+import audioop
+import numpy
+from vad import frame_energies
+
+TOP_DIR = os.path.dirname(os.path.abspath(__file__))
+RESOURCE_FILE = os.path.join(TOP_DIR, u'resources/common.res')
+MODEL_FILE = os.path.join(TOP_DIR, u'resources/snowboy.umdl')
+
+#detector audio format
+RATE = 16000
+SAMPLE_WIDTH = 2
+
+
+def load_wav(path, rate=RATE):
+    """
+    Load wav file and convert it to detector audio format (mono, 16 bits, specified rate)
+
+    Args:
+        path (string): wav file path
+        rate (int): output sample rate
+
+    Return:
+        numpy.ndarray: int16 samples
+    """
+    wav = wave.open(path, 'rb')
+    try:
+        channels = wav.getnchannels()
+        width = wav.getsampwidth()
+        framerate = wav.getframerate()
+        #frames count of streamed wav headers can be wrong, read until end of file
+        chunks = []
+        while True:
+            chunk = wav.readframes(framerate)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        data = b''.join(chunks)
+    finally:
+        wav.close()
+
+    if channels>1:
+        data = data[:len(data)-len(data)%(channels*width)]
+        data = audioop.tomono(data, width, 0.5, 0.5) if channels==2 else data[::channels]
+    if width!=SAMPLE_WIDTH:
+        data = audioop.lin2lin(data, width, SAMPLE_WIDTH)
+    if framerate!=rate:
+        data, _ = audioop.ratecv(data, SAMPLE_WIDTH, 1, framerate, rate, None)
+
+    return numpy.frombuffer(data, dtype=numpy.int16)
+
+
+def synthetic_noise(length, level=0.0, seed=0):
+    """
+    Generate white gaussian noise
+
+    Args:
+        length (int): number of samples
+        level (float): noise RMS level (in int16 scale)
+        seed (int): random seed (same seed gives same noise)
+
+    Return:
+        numpy.ndarray: int16 samples
+    """
+    noise = numpy.random.RandomState(seed).normal(0.0, level, length) if level>0 else numpy.zeros(length)
+    return numpy.clip(noise, -32768, 32767).astype(numpy.int16)
+
+
+def speech_end(samples, rate=RATE, threshold=None, frame_time=0.01):
+    """
+    Return position of end of speech in samples (end of last frame with energy above threshold)
+
+    Args:
+        samples (numpy.ndarray): int16 samples
+        rate (int): sample rate
+        threshold (int): RMS energy under which a frame is silent. If None, 10% of loudest frame energy is used
+                         (recordings noise floor is often above fixed thresholds)
+        frame_time (float): analysis frame duration in seconds
+
+    Return:
+        int: end of speech position (0 if no speech)
+    """
+    frame_length = max(1, int(frame_time * rate))
+    energies = frame_energies(samples, frame_length)
+    if len(energies)==0:
+        return 0
+    if threshold is None:
+        threshold = max(300, 0.1 * energies.max())
+    voiced = numpy.nonzero(energies>=threshold)[0]
+    if len(voiced)==0:
+        return 0
+    return int(voiced[-1] + 1) * frame_length
+
+
+def build_stream(clips, rate=RATE, gap=2.0, noise_level=0.0, seed=0):
+    """
+    Build audio stream made of hotword clips separated by gaps, mixed with noise
+
+    Args:
+        clips (list): list of hotword clips (int16 samples)
+        rate (int): sample rate
+        gap (float): duration of audio before, between and after clips (in seconds)
+        noise_level (float): RMS level of noise added on whole stream (0 for no noise)
+        seed (int): noise random seed
+
+    Return:
+        tuple: stream samples (numpy.ndarray) and list of hotwords (dict: start, end (end of speech), stop (end of
+               clip) positions in samples)
+    """
+    gap_length = int(gap * rate)
+    parts = [numpy.zeros(gap_length, dtype=numpy.int16)]
+    hotwords = []
+    position = gap_length
+    for clip in clips:
+        hotwords.append({
+            u'start': position,
+            u'end': position + speech_end(clip, rate),
+            u'stop': position + len(clip)
+        })
+        position += len(clip) + gap_length
+        parts.append(clip)
+        parts.append(numpy.zeros(gap_length, dtype=numpy.int16))
+    stream = numpy.concatenate(parts)
+
+    if noise_level>0:
+        mixed = stream.astype(numpy.int32) + synthetic_noise(len(stream), noise_level, seed)
+        stream = numpy.clip(mixed, -32768, 32767).astype(numpy.int16)
+
+    return stream, hotwords
+
+
+def create_detector(model=MODEL_FILE, resource=RESOURCE_FILE, sensitivity=0.5, audio_gain=1.0):
+    """
+    Create snowboy detector
+
+    Args:
+        model (string): voice model path
+        resource (string): resource file path
+        sensitivity (float): detector sensitivity
+        audio_gain (float): detector audio gain
+
+    Return:
+        SnowboyDetect: detector instance
+    """
+    import snowboydetect
+    detector = snowboydetect.SnowboyDetect(resource_filename=resource.encode(), model_str=model.encode())
+    detector.SetAudioGain(audio_gain)
+    detector.SetSensitivity(u','.join([str(sensitivity)] * detector.NumHotwords()).encode())
+    return detector
+
+
+def run_detection(detector, stream, chunk_size):
+    """
+    Feed stream to detector by chunks as fast as possible, measuring CPU time of each RunDetection call
+
+    Args:
+        detector (SnowboyDetect): detector instance
+        stream (numpy.ndarray): int16 samples
+        chunk_size (int): chunk size in samples
+
+    Return:
+        tuple: detections positions in samples (list, position is end of chunk where hotword is detected) and CPU
+               time of each chunk in seconds (numpy.ndarray)
+    """
+    data = stream.tobytes()
+    chunk_bytes = chunk_size * SAMPLE_WIDTH
+    detections = []
+    cpu_times = []
+    for offset in range(0, len(data) - chunk_bytes + 1, chunk_bytes):
+        chunk = data[offset:offset+chunk_bytes]
+        start = time.clock()
+        status = detector.RunDetection(chunk)
+        cpu_times.append(time.clock() - start)
+        if status>0:
+            detections.append((offset + chunk_bytes) // SAMPLE_WIDTH)
+
+    return detections, numpy.array(cpu_times)
+
+
+def match_detections(detections, hotwords, tolerance):
+    """
+    Match detections with hotwords: first detection between hotword start and end of clip plus tolerance is a hit
+    (following ones in this window are the same hotword), detections outside hotwords windows are false alarms
+
+    Args:
+        detections (list): detections positions in samples
+        hotwords (list): hotwords positions (see build_stream)
+        tolerance (int): max delay of detection after end of clip (in samples)
+
+    Return:
+        dict: hits (int), misses (int), false_alarms (int), latencies (list: detection position minus end of speech
+              in samples, one per hit)
+    """
+    remaining = list(detections)
+    latencies = []
+    for hotword in hotwords:
+        hits = [position for position in remaining if hotword[u'start']<=position<=hotword[u'stop']+tolerance]
+        if len(hits)>0:
+            latencies.append(hits[0] - hotword[u'end'])
+            remaining = [position for position in remaining if position not in hits]
+
+    return {
+        u'hits': len(latencies),
+        u'misses': len(hotwords) - len(latencies),
+        u'false_alarms': len(remaining),
+        u'latencies': latencies
+    }
+
+
+def benchmark(clips, model=MODEL_FILE, resource=RESOURCE_FILE, chunk_sizes=[2048], audio_gains=[1.0], sensitivities=[0.5],
+              noise_levels=[0.0], gap=2.0, rate=RATE, detector_factory=create_detector):
+    """
+    Run detector on hotword clips for each combination of parameters
+
+    Args:
+        clips (list): list of hotword clips (int16 samples)
+        model (string): voice model path
+        resource (string): resource file path
+        chunk_sizes (list): chunk sizes (in samples)
+        audio_gains (list): detector audio gains
+        sensitivities (list): detector sensitivities
+        noise_levels (list): RMS levels of noise added to stream
+        gap (float): duration of audio around clips (in seconds)
+        rate (int): sample rate
+        detector_factory (function): function creating detector (params: model, resource, sensitivity, audio_gain)
+
+    Return:
+        list: one result (dict) per combination::
+            {
+                chunk_size (int), audio_gain (float), sensitivity (float), noise_level (float),
+                rtf (float): real-time factor (CPU time / audio duration),
+                frame_cpu_mean, frame_cpu_p95, frame_cpu_max (float): CPU time per chunk (in seconds),
+                hits, misses, false_alarms (int),
+                latency_mean, latency_max (float): detection latency from end of speech (in samples, None if no hit)
+            }
+    """
+    results = []
+    for noise_level in noise_levels:
+        stream, hotwords = build_stream(clips, rate, gap, noise_level)
+        duration = float(len(stream)) / rate
+        for chunk_size in chunk_sizes:
+            for audio_gain in audio_gains:
+                for sensitivity in sensitivities:
+                    detector = detector_factory(model, resource, sensitivity, audio_gain)
+                    detections, cpu_times = run_detection(detector, stream, chunk_size)
+                    matches = match_detections(detections, hotwords, int(gap * rate))
+                    latencies = matches[u'latencies']
+                    results.append({
+                        u'chunk_size': chunk_size,
+                        u'audio_gain': audio_gain,
+                        u'sensitivity': sensitivity,
+                        u'noise_level': noise_level,
+                        u'rtf': float(cpu_times.sum()) / duration,
+                        u'frame_cpu_mean': float(cpu_times.mean()) if len(cpu_times)>0 else 0.0,
+                        u'frame_cpu_p95': float(numpy.percentile(cpu_times, 95)) if len(cpu_times)>0 else 0.0,
+                        u'frame_cpu_max': float(cpu_times.max()) if len(cpu_times)>0 else 0.0,
+                        u'hits': matches[u'hits'],
+                        u'misses': matches[u'misses'],
+                        u'false_alarms': matches[u'false_alarms'],
+                        u'latency_mean': float(numpy.mean(latencies)) if len(latencies)>0 else None,
+                        u'latency_max': int(max(latencies)) if len(latencies)>0 else None
+                    })
+
+    return results
+
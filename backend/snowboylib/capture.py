@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+from threading import Lock
+import pyaudio
+from ringbuffer import SharedRingBuffer
+from sources import AudioSource
+
+logger = logging.getLogger(u'capture')
+
+
+class AudioCapture(AudioSource):
+    """
+    Audio capture service (microphone audio source): it owns the only PortAudio input stream and publishes captured audio to any number of
+    subscribers (hotword detector, training recorder, level meter...).
+
+    Each subscriber is a RingBufferReader with its own read cursor on a shared ring buffer, so audio is captured
+    once and a subscriber can come and go without interrupting others (and without opening audio device again).
+    """
+
+    def __init__(self, rate=16000, channels=1, sample_width=2, frames_per_buffer=2048, buffer_time=5.0):
+        """
+        Constructor. Audio stream is opened immediately
+
+        Args:
+            rate (int): sample rate (in Hz)
+            channels (int): number of channels
+            sample_width (int): sample width (in bytes)
+            frames_per_buffer (int): number of frames per PortAudio buffer
+            buffer_time (float): duration of audio kept in ring buffer (in seconds)
+        """
+        AudioSource.__init__(self, rate, channels, sample_width)
+
+        #members
+        self.frames_per_buffer = frames_per_buffer
+        self.buffer = SharedRingBuffer(int(rate * buffer_time) * channels * sample_width)
+        self.__lock = Lock()
+        self.__closed = False
+
+        #open audio stream
+        self.audio = pyaudio.PyAudio()
+        self.stream_in = self.audio.open(
+            input=True,
+            output=False,
+            format=self.audio.get_format_from_width(sample_width),
+            channels=channels,
+            rate=rate,
+            frames_per_buffer=frames_per_buffer,
+            stream_callback=self.__audio_callback
+        )
+
+    def __audio_callback(self, in_data, frame_count, time_info, status):
+        """
+        PortAudio callback: publish captured audio to subscribers
+        """
+        self.buffer.extend(in_data)
+        #input only stream: no output data to return
+        return None, pyaudio.paContinue
+
+    def is_closed(self):
+        """
+        Return True if audio stream is closed
+
+        Return:
+            bool: True if closed
+        """
+        return self.__closed
+
+    def subscribe(self, name=None):
+        """
+        Subscribe to captured audio
+
+        Args:
+            name (string): subscriber name
+
+        Return:
+            RingBufferReader: reader of captured audio (get audio captured from now)
+        """
+        if self.__closed:
+            raise Exception(u'Audio capture is closed')
+        logger.debug(u'New audio subscriber "%s"' % name)
+        return self.buffer.subscribe(name)
+
+    def unsubscribe(self, reader):
+        """
+        Unsubscribe from captured audio
+
+        Args:
+            reader (RingBufferReader): reader returned by subscribe
+        """
+        logger.debug(u'Audio subscriber "%s" removed' % reader.name)
+        self.buffer.unsubscribe(reader)
+
+    def get_subscribers(self):
+        """
+        Return subscribers names
+
+        Return:
+            list: list of names
+        """
+        return [reader.name for reader in self.buffer.get_readers()]
+
+    def record(self, duration, name=u'recorder', endpointer=None):
+        """
+        Record audio from capture during specified duration. Other subscribers are not disturbed
+
+        Args:
+            duration (float): max recording duration (in seconds)
+            name (string): subscriber name
+            endpointer (Endpointer): if specified, recording stops as soon as endpointer detects end of utterance
+
+        Return:
+            bytes: raw PCM data (shorter than duration if capture is closed while recording)
+        """
+        size = int(duration * self.rate) * self.channels * self.sample_width
+        #read audio by PortAudio buffers to stop quickly at endpoint
+        frame_size = self.frames_per_buffer * self.channels * self.sample_width
+        reader = self.subscribe(name)
+        chunks = []
+        length = 0
+        try:
+            while length<size and not self.__closed:
+                if not reader.wait(min(frame_size, size - length), duration) and len(reader)==0:
+                    #no audio captured during whole duration
+                    break
+                chunk = reader.get(size - length)
+                if endpointer and endpointer.process(chunk):
+                    #keep audio until endpoint only
+                    chunk = chunk[:max(0, endpointer.get_endpoint_offset(self.sample_width) - length)]
+                    chunks.append(chunk)
+                    break
+                chunks.append(chunk)
+                length += len(chunk)
+        finally:
+            self.unsubscribe(reader)
+
+        return b''.join(chunks)
+
+    def close(self):
+        """
+        Close audio stream. Remaining subscribers are interrupted
+        """
+        with self.__lock:
+            if self.__closed:
+                return
+            self.__closed = True
+
+        for reader in self.buffer.get_readers():
+            self.buffer.unsubscribe(reader)
+        self.stream_in.stop_stream()
+        self.stream_in.close()
+        self.audio.terminate()
+
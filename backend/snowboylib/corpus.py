@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import audioop
+import logging
+import multiprocessing
+from sources import PcmSource, WavFileSource
+from benchmark import create_detector, MODEL_FILE, RESOURCE_FILE
+
+logger = logging.getLogger(u'corpus')
+
+EXTENSIONS = (u'.wav', u'.flac')
+#detector audio format
+RATE = 16000
+SAMPLE_WIDTH = 2
+CHUNK_TIME = 0.1
+
+#detector of worker process
+__detector = None
+
+
+def list_corpus(directory, extensions=EXTENSIONS):
+    """
+    List audio files of corpus directory (recursively)
+
+    Args:
+        directory (string): corpus directory
+        extensions (tuple): audio files extensions
+
+    Return:
+        list: sorted audio files paths
+    """
+    paths = []
+    for root, _, filenames in os.walk(directory):
+        for filename in filenames:
+            if os.path.splitext(filename)[1].lower() in extensions:
+                paths.append(os.path.join(root, filename))
+
+    return sorted(paths)
+
+
+def __iter_flac(path, chunk_time=CHUNK_TIME):
+    """
+    Read FLAC file (decoded by speech_recognition using flac binary) and convert it to detector audio format
+
+    Args:
+        path (string): FLAC file path
+        chunk_time (float): duration of read chunks (in seconds)
+
+    Return:
+        generator: raw PCM chunks (mono, 16 bits, 16kHz)
+    """
+    import speech_recognition
+    state = None
+    with speech_recognition.AudioFile(path) as source:
+        frames = max(1, int(chunk_time * source.SAMPLE_RATE))
+        while True:
+            #stream is converted to mono by speech_recognition
+            data = source.stream.read(frames)
+            if not data:
+                break
+            if source.SAMPLE_WIDTH!=SAMPLE_WIDTH:
+                data = audioop.lin2lin(data, source.SAMPLE_WIDTH, SAMPLE_WIDTH)
+            if source.SAMPLE_RATE!=RATE:
+                data, state = audioop.ratecv(data, SAMPLE_WIDTH, 1, source.SAMPLE_RATE, RATE, state)
+            yield data
+
+
+def open_source(path, chunk_time=CHUNK_TIME):
+    """
+    Open audio file as audio source in detector audio format
+
+    Args:
+        path (string): wav or flac file path
+        chunk_time (float): duration of read chunks (in seconds)
+
+    Return:
+        PcmSource: audio source
+    """
+    if path.lower().endswith(u'.flac'):
+        return PcmSource(__iter_flac(path, chunk_time), rate=RATE, channels=1, sample_width=SAMPLE_WIDTH)
+    return WavFileSource(path, rate=RATE, channels=1, sample_width=SAMPLE_WIDTH, chunk_time=chunk_time)
+
+
+def scan_file(detector, path, chunk_time=CHUNK_TIME):
+    """
+    Scan audio file for hotwords
+
+    Args:
+        detector (SnowboyDetect): detector instance (reset before scanning)
+        path (string): audio file path
+        chunk_time (float): duration of chunks fed to detector (in seconds)
+
+    Return:
+        dict: scan result::
+            {
+                path (string): file path,
+                duration (float): audio duration (in seconds),
+                elapsed (float): scanning duration (in seconds),
+                detections (list): list of detections (dict: time (float): detection time from beginning of file in
+                                   seconds (end of detection chunk), hotword (int): hotword index (starting at 1)),
+                error (string): error message (None if no error)
+            }
+    """
+    result = {
+        u'path': path,
+        u'duration': 0.0,
+        u'elapsed': 0.0,
+        u'detections': [],
+        u'error': None
+    }
+    start = time.time()
+    try:
+        detector.Reset()
+        source = open_source(path, chunk_time)
+        reader = source.subscribe(u'scanner')
+        chunk_size = int(chunk_time * RATE) * SAMPLE_WIDTH
+        position = 0
+        while reader.wait(chunk_size):
+            data = reader.get(chunk_size)
+            position += len(data)
+            status = detector.RunDetection(data)
+            if status>0:
+                result[u'detections'].append({
+                    u'time': float(position // SAMPLE_WIDTH) / RATE,
+                    u'hotword': status
+                })
+        source.close()
+        result[u'duration'] = float(position // SAMPLE_WIDTH) / RATE
+
+    except Exception as e:
+        logger.exception(u'Unable to scan file "%s":' % path)
+        result[u'error'] = str(e)
+
+    result[u'elapsed'] = time.time() - start
+    return result
+
+
+def __init_worker(model, resource, sensitivity, audio_gain, detector_factory):
+    """
+    Worker process initializer: create worker detector (one per process)
+    """
+    global __detector
+    __detector = detector_factory(model, resource, sensitivity, audio_gain)
+
+
+def __scan_worker(args):
+    """
+    Scan file in worker process
+    """
+    path, chunk_time = args
+    return scan_file(__detector, path, chunk_time)
+
+
+def scan_corpus(paths, model=MODEL_FILE, resource=RESOURCE_FILE, sensitivity=0.5, audio_gain=1.0, processes=None,
+                chunk_time=CHUNK_TIME, detector_factory=create_detector, callback=None):
+    """
+    Scan audio files for hotwords using a pool of processes, each process running its own detector
+
+    Args:
+        paths (list): audio files paths
+        model (string): voice model path
+        resource (string): resource file path
+        sensitivity (float): detector sensitivity
+        audio_gain (float): detector audio gain
+        processes (int): number of processes (None for one per CPU core)
+        chunk_time (float): duration of chunks fed to detector (in seconds)
+        detector_factory (function): function creating detector (params: model, resource, sensitivity, audio_gain),
+                                     must be picklable (module level function)
+        callback (function): function called with each file result as soon as file is scanned
+
+    Return:
+        list: files results (see scan_file) in paths order
+    """
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    processes = max(1, min(processes, len(paths)))
+
+    results = {}
+    pool = multiprocessing.Pool(processes, __init_worker, (model, resource, sensitivity, audio_gain, detector_factory))
+    try:
+        #biggest files first to balance load between processes
+        ordered = sorted(paths, key=lambda path: os.path.getsize(path), reverse=True)
+        for result in pool.imap_unordered(__scan_worker, [(path, chunk_time) for path in ordered]):
+            results[result[u'path']] = result
+            if callback:
+                callback(result)
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+    return [results[path] for path in paths]
+
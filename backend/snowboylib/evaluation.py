@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import numpy
+import logging
+import multiprocessing
+from benchmark import create_detector, build_stream, run_detection, match_detections, MODEL_FILE, RESOURCE_FILE, RATE
+from corpus import list_corpus, open_source, scan_file
+
+logger = logging.getLogger(u'evaluation')
+
+POSITIVE_DIR = u'positive'
+NEGATIVE_DIR = u'negative'
+MAX_FA_PER_HOUR = 0.5
+CHUNK_SIZE = 2048
+
+#evaluation data of worker process
+__evaluation = None
+
+
+def load_clips(paths):
+    """
+    Load hotword clips in detector audio format
+
+    Args:
+        paths (list): audio files paths
+
+    Return:
+        list: list of int16 samples (numpy.ndarray)
+    """
+    clips = []
+    for path in paths:
+        source = open_source(path)
+        reader = source.subscribe(u'loader')
+        chunks = []
+        while reader.wait(RATE):
+            chunks.append(reader.get())
+        source.close()
+        clips.append(numpy.frombuffer(b''.join(chunks), dtype=numpy.int16))
+
+    return clips
+
+
+def load_dataset(directory):
+    """
+    Load labeled dataset: hotword clips in "positive" sub directory, background audio (without hotword) in
+    "negative" sub directory (wav or flac files)
+
+    Args:
+        directory (string): dataset directory
+
+    Return:
+        tuple: positive clips (list of numpy.ndarray) and negative files paths (list, read while evaluating)
+    """
+    positives = list_corpus(os.path.join(directory, POSITIVE_DIR))
+    negatives = list_corpus(os.path.join(directory, NEGATIVE_DIR))
+    if len(positives)==0:
+        raise Exception(u'No positive clip found in %s' % os.path.join(directory, POSITIVE_DIR))
+    if len(negatives)==0:
+        #false accepts rate can't be measured
+        raise Exception(u'No negative audio found in %s' % os.path.join(directory, NEGATIVE_DIR))
+
+    return load_clips(positives), negatives
+
+
+def evaluate(detector, clips, negatives, chunk_size=CHUNK_SIZE, gap=2.0):
+    """
+    Evaluate detector on labeled data
+
+    Args:
+        detector (SnowboyDetect): detector instance
+        clips (list): positive hotword clips (int16 samples)
+        negatives (list): negative audio files paths
+        chunk_size (int): chunk size in samples
+        gap (float): duration of silence around positive clips (in seconds)
+
+    Return:
+        dict: evaluation result::
+            {
+                miss_rate (float): ratio of missed positive clips,
+                false_accepts (int): detections in negative audio,
+                negative_hours (float): duration of negative audio (in hours),
+                fa_per_hour (float): false accepts per hour (None if no negative audio),
+                latency_mean, latency_p95 (float): detection latency from end of hotword speech (in seconds, None if
+                                                   no hit)
+            }
+    """
+    #positives
+    stream, hotwords = build_stream(clips, RATE, gap)
+    detections, _ = run_detection(detector, stream, chunk_size)
+    matches = match_detections(detections, hotwords, int(gap * RATE))
+    latencies = numpy.array(matches[u'latencies'], dtype=numpy.float64) / RATE
+
+    #negatives
+    false_accepts = 0
+    duration = 0.0
+    for path in negatives:
+        result = scan_file(detector, path, float(chunk_size) / RATE)
+        if result[u'error']:
+            raise Exception(u'Unable to read negative audio "%s": %s' % (path, result[u'error']))
+        false_accepts += len(result[u'detections'])
+        duration += result[u'duration']
+    hours = duration / 3600.0
+
+    return {
+        u'miss_rate': float(matches[u'misses']) / len(clips) if len(clips)>0 else 0.0,
+        u'false_accepts': false_accepts,
+        u'negative_hours': hours,
+        u'fa_per_hour': false_accepts / hours if hours>0 else None,
+        u'latency_mean': float(latencies.mean()) if len(latencies)>0 else None,
+        u'latency_p95': float(numpy.percentile(latencies, 95)) if len(latencies)>0 else None
+    }
+
+
+def __init_worker(clips, negatives, model, resource, chunk_size, detector_factory):
+    """
+    Worker process initializer: store evaluation data
+    """
+    global __evaluation
+    __evaluation = (clips, negatives, model, resource, chunk_size, detector_factory)
+
+
+def __evaluate_worker(setting):
+    """
+    Evaluate one setting in worker process
+    """
+    sensitivity, audio_gain = setting
+    clips, negatives, model, resource, chunk_size, detector_factory = __evaluation
+    detector = detector_factory(model, resource, sensitivity, audio_gain)
+    result = evaluate(detector, clips, negatives, chunk_size)
+    result.update({
+        u'sensitivity': sensitivity,
+        u'audio_gain': audio_gain
+    })
+
+    return result
+
+
+def sweep(clips, negatives, sensitivities, audio_gains, model=MODEL_FILE, resource=RESOURCE_FILE, chunk_size=CHUNK_SIZE,
+          processes=None, detector_factory=create_detector):
+    """
+    Evaluate each combination of sensitivity and audio gain in parallel (one setting per process at a time)
+
+    Args:
+        clips (list): positive hotword clips (int16 samples)
+        negatives (list): negative audio files paths
+        sensitivities (list): detector sensitivities
+        audio_gains (list): detector audio gains
+        model (string): voice model path
+        resource (string): resource file path
+        chunk_size (int): chunk size in samples
+        processes (int): number of processes (None for one per CPU core)
+        detector_factory (function): function creating detector (params: model, resource, sensitivity, audio_gain),
+                                     must be picklable (module level function)
+
+    Return:
+        list: evaluation results (see evaluate, plus sensitivity and audio_gain) ordered by audio gain and
+              sensitivity
+    """
+    settings = [(sensitivity, audio_gain) for audio_gain in audio_gains for sensitivity in sensitivities]
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    processes = max(1, min(processes, len(settings)))
+
+    pool = multiprocessing.Pool(processes, __init_worker, (clips, negatives, model, resource, chunk_size, detector_factory))
+    try:
+        results = pool.map(__evaluate_worker, settings)
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+    return results
+
+
+def suggest(results, max_fa_per_hour=MAX_FA_PER_HOUR):
+    """
+    Suggest best operating point: lowest miss rate among settings under false accepts budget (then lowest latency,
+    then lowest sensitivity). If no setting meets the budget, setting with lowest false accepts rate is suggested.
+    Settings whose false accepts rate is unknown (no negative audio) never meet the budget.
+
+    Args:
+        results (list): sweep results
+        max_fa_per_hour (float): max false accepts per hour
+
+    Return:
+        dict: suggested setting result with config (dict) to write into module config (sensitivity, audiogain keys),
+              or None if no setting has known false accepts rate
+    """
+    results = [result for result in results if result[u'fa_per_hour'] is not None]
+    if len(results)==0:
+        return None
+
+    def latency(result):
+        return result[u'latency_mean'] if result[u'latency_mean'] is not None else float(u'inf')
+
+    candidates = [result for result in results if result[u'fa_per_hour']<=max_fa_per_hour]
+    if len(candidates)>0:
+        best = min(candidates, key=lambda result: (result[u'miss_rate'], latency(result), result[u'sensitivity']))
+    else:
+        best = min(results, key=lambda result: (result[u'fa_per_hour'], result[u'miss_rate'], latency(result)))
+
+    suggestion = dict(best)
+    suggestion[u'within_budget'] = len(candidates)>0
+    suggestion[u'config'] = {
+        u'sensitivity': best[u'sensitivity'],
+        u'audiogain': best[u'audio_gain']
+    }
+
+    return suggestion
+
@@ -0,0 +1,562 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+from threading import Lock, Condition
+
+#overrun policies of SharedRingBuffer readers (applied when reader falls behind writer by more than its max lag)
+#oldest unread data is lost, reader keeps newest data
+POLICY_DROP_OLDEST = u'drop_oldest'
+#new data is lost until reader consumed its backlog
+POLICY_DROP_NEWEST = u'drop_newest'
+#whole backlog is skipped, reader goes on with fresh data
+POLICY_CATCH_UP = u'catch_up'
+POLICIES = (POLICY_DROP_OLDEST, POLICY_DROP_NEWEST, POLICY_CATCH_UP)
+
+
+class RingBuffer(object):
+    """
+    Preallocated ring buffer to hold audio from PortAudio
+
+    Audio is copied in place into a fixed size bytearray using a write cursor, and consumed using a read
+    cursor, so nothing is allocated on the audio callback path.
+    Cursors are absolute byte positions (they never wrap), buffer offsets are computed modulo buffer size.
+    Consumer can block on wait until enough data is written, instead of polling the buffer.
+
+    Note:
+        Views returned by get_views are not copies: they are valid until the writer wraps over them, so
+        consume them before next audio callback (or copy them using get).
+    """
+
+    def __init__(self, size=4096):
+        """
+        Constructor
+
+        Args:
+            size (int): buffer size in bytes
+        """
+        if size<=0:
+            raise Exception(u'Parameter size is invalid: must be greater than 0')
+
+        #members
+        self._size = size
+        self._buf = bytearray(size)
+        self._view = memoryview(self._buf)
+        self._lock = Lock()
+        self._cond = Condition(self._lock)
+        self._wanted = 1
+        self._interrupted = False
+        self._write_pos = 0
+        self._read_pos = 0
+        self.overruns = 0
+        self.dropped = 0
+
+    def __len__(self):
+        """
+        Return number of bytes available for reading
+        """
+        return self._write_pos - self._read_pos
+
+    def size(self):
+        """
+        Return buffer capacity in bytes
+        """
+        return self._size
+
+    def clear(self):
+        """
+        Drop all available data
+        """
+        with self._lock:
+            self._read_pos = self._write_pos
+
+    def extend(self, data):
+        """
+        Append data at the end of buffer. If reader is too late, oldest data is overwritten and overrun counters
+        are updated.
+
+        Args:
+            data (bytes): data to append
+        """
+        length = len(data)
+        if length==0:
+            return
+        data = memoryview(data)
+        skipped = 0
+        if length>self._size:
+            #keep only newest data
+            skipped = length - self._size
+            data = data[skipped:]
+
+        with self._lock:
+            #copy data in place (2 parts if data wraps at end of buffer)
+            offset = (self._write_pos + skipped) % self._size
+            count = len(data)
+            first = min(count, self._size - offset)
+            self._view[offset:offset+first] = data[:first]
+            if first<count:
+                self._view[0:count-first] = data[first:]
+            self._write_pos += length
+
+            #check overrun
+            available = self._write_pos - self._read_pos
+            if available>self._size:
+                self.overruns += 1
+                self.dropped += available - self._size
+                self._read_pos = self._write_pos - self._size
+
+            #wake up consumer if enough data is available
+            if available>=self._wanted:
+                self._cond.notify_all()
+
+    def wait(self, size=1, timeout=None):
+        """
+        Block until at least size bytes are available for reading
+
+        Note:
+            Without timeout, waiting is really blocking (no polling), so make sure interrupt is called to stop
+            waiting consumer if audio stream is stopped.
+
+        Args:
+            size (int): number of bytes to wait for
+            timeout (float): max waiting time in seconds. If None wait until data is available or buffer interrupted
+
+        Return:
+            bool: True if data is available, False if timeout occured or buffer was interrupted
+        """
+        with self._cond:
+            self._wanted = max(1, min(size, self._size))
+            if self._write_pos-self._read_pos<self._wanted and not self._interrupted:
+                self._cond.wait(timeout)
+
+            return not self._interrupted and self._write_pos-self._read_pos>=self._wanted
+
+    def interrupt(self):
+        """
+        Wake up waiting consumer. Following calls to wait return immediately until reset_interrupt is called
+        """
+        with self._cond:
+            self._interrupted = True
+            self._cond.notify_all()
+
+    def reset_interrupt(self):
+        """
+        Reset interrupt flag set by interrupt
+        """
+        with self._cond:
+            self._interrupted = False
+
+    def get_views(self, size=None):
+        """
+        Retrieve data from the beginning of buffer without copying it
+
+        Args:
+            size (int): max number of bytes to read. If None all available data is returned
+
+        Return:
+            tuple: tuple of 0, 1 or 2 memoryviews (2 when data wraps at end of buffer)
+        """
+        with self._lock:
+            available = self._write_pos - self._read_pos
+            if size is None or size>available:
+                size = available
+            if size==0:
+                return ()
+
+            offset = self._read_pos % self._size
+            self._read_pos += size
+            if offset+size<=self._size:
+                return (self._view[offset:offset+size],)
+            return (self._view[offset:], self._view[:offset+size-self._size])
+
+    def get_previous(self, size):
+        """
+        Return data preceding read cursor (already read data), as long as it was not overwritten by writer. This
+        is free history of read audio (pre-roll)
+
+        Args:
+            size (int): number of bytes to return
+
+        Return:
+            bytes: copy of data (can be shorter than size if data was overwritten)
+        """
+        with self._lock:
+            size = min(size, self._read_pos, self._size - (self._write_pos - self._read_pos))
+            if size<=0:
+                return b''
+
+            offset = (self._read_pos - size) % self._size
+            if offset+size<=self._size:
+                return self._view[offset:offset+size].tobytes()
+            return self._view[offset:].tobytes() + self._view[:offset+size-self._size].tobytes()
+
+    def get(self, size=None):
+        """
+        Retrieve data from the beginning of buffer
+
+        Args:
+            size (int): max number of bytes to read. If None all available data is returned
+
+        Return:
+            bytes: copy of read data (empty if no data available)
+        """
+        return b''.join([view.tobytes() for view in self.get_views(size)])
+
+
+class SharedRingBuffer(object):
+    """
+    Preallocated ring buffer written by one producer and read by any number of consumers
+
+    Each consumer gets its own RingBufferReader (own read cursor, own overrun policy and counters), data is
+    written once and never copied per consumer. A slow consumer only loses its own data, other consumers are
+    not affected.
+    """
+
+    def __init__(self, size=4096):
+        """
+        Constructor
+
+        Args:
+            size (int): buffer size in bytes
+        """
+        if size<=0:
+            raise Exception(u'Parameter size is invalid: must be greater than 0')
+
+        #members
+        self._size = size
+        self._buf = bytearray(size)
+        self._view = memoryview(self._buf)
+        self._lock = Lock()
+        self._cond = Condition(self._lock)
+        self._write_pos = 0
+        self._readers = []
+        #time of last write (arrival time of newest data)
+        self.write_time = None
+
+    def size(self):
+        """
+        Return buffer capacity in bytes
+        """
+        return self._size
+
+    def get_readers(self):
+        """
+        Return current readers
+
+        Return:
+            list: list of RingBufferReader
+        """
+        with self._lock:
+            return list(self._readers)
+
+    def subscribe(self, name=None):
+        """
+        Create new reader. Reader read cursor starts at current write position (it only gets data written after
+        subscription, but already written data is available as history using get_previous)
+
+        Args:
+            name (string): reader name (for logs)
+
+        Return:
+            RingBufferReader: new reader
+        """
+        reader = RingBufferReader(self, name)
+        with self._lock:
+            reader._read_pos = self._write_pos
+            self._readers.append(reader)
+
+        return reader
+
+    def unsubscribe(self, reader):
+        """
+        Remove reader. Reader waiting for data is interrupted and its ended flag is set (it won't get data anymore)
+
+        Args:
+            reader (RingBufferReader): reader returned by subscribe
+        """
+        with self._cond:
+            if reader in self._readers:
+                self._readers.remove(reader)
+            reader._interrupted = True
+            reader.ended = True
+            self._cond.notify_all()
+
+    def extend(self, data):
+        """
+        Append data at the end of buffer. Overrun policy of readers that are too late is applied and their
+        overrun counters are updated.
+
+        Args:
+            data (bytes): data to append
+        """
+        length = len(data)
+        if length==0:
+            return
+        data = memoryview(data)
+        skipped = 0
+        if length>self._size:
+            #keep only newest data
+            skipped = length - self._size
+            data = data[skipped:]
+
+        with self._lock:
+            #copy data in place (2 parts if data wraps at end of buffer)
+            offset = (self._write_pos + skipped) % self._size
+            count = len(data)
+            first = min(count, self._size - offset)
+            self._view[offset:offset+first] = data[:first]
+            if first<count:
+                self._view[0:count-first] = data[first:]
+            self._write_pos += length
+            self.write_time = time.time()
+
+            #check overrun and wake up readers
+            notify = False
+            for reader in self._readers:
+                reader._check_overrun()
+                if reader._end()-reader._read_pos>=reader._wanted:
+                    notify = True
+            if notify:
+                self._cond.notify_all()
+
+    def _slice(self, pos, size):
+        """
+        Return views on buffer data (must be called with lock acquired)
+
+        Args:
+            pos (int): absolute position of first byte
+            size (int): number of bytes (must be > 0)
+
+        Return:
+            tuple: tuple of 1 or 2 memoryviews (2 when data wraps at end of buffer)
+        """
+        offset = pos % self._size
+        if offset+size<=self._size:
+            return (self._view[offset:offset+size],)
+        return (self._view[offset:], self._view[:offset+size-self._size])
+
+
+class RingBufferReader(object):
+    """
+    Read cursor on SharedRingBuffer. It has same reading API than RingBuffer so it can be used in place of it by
+    consumers
+
+    When reader falls behind writer by more than its max lag, its overrun policy is applied (see POLICY_XXX).
+    Default policy drops oldest data, keeping a full buffer of newest data.
+    """
+
+    def __init__(self, buffer, name=None):
+        """
+        Constructor
+
+        Args:
+            buffer (SharedRingBuffer): buffer to read
+            name (string): reader name
+        """
+        #members
+        self.buffer = buffer
+        self.name = name
+        self.ended = False
+        self._wanted = 1
+        self._interrupted = False
+        self._read_pos = 0
+        #end of data kept by drop newest policy (None if reader is not dropping new data)
+        self._hold_pos = None
+        self.policy = POLICY_DROP_OLDEST
+        self.max_lag = buffer._size
+        self.overruns = 0
+        self.dropped = 0
+
+    def __len__(self):
+        """
+        Return number of bytes available for reading
+        """
+        return self._end() - self._read_pos
+
+    def _end(self):
+        """
+        Return absolute position of end of readable data
+        """
+        return self.buffer._write_pos if self._hold_pos is None else self._hold_pos
+
+    def _check_overrun(self):
+        """
+        Apply overrun policy after data is written (must be called with lock acquired)
+        """
+        buffer = self.buffer
+        lag = buffer._write_pos - self._read_pos
+        if self._hold_pos is not None:
+            if lag>buffer._size:
+                #kept data is overwritten, reader is still too late: fall back to newest data
+                self.overruns += 1
+                self.dropped += lag - buffer._size
+                self._read_pos = buffer._write_pos - buffer._size
+                self._hold_pos = None
+            return
+        if lag<=self.max_lag:
+            return
+
+        self.overruns += 1
+        if self.policy==POLICY_DROP_NEWEST:
+            #keep backlog, data written after it is dropped when reader reaches its end
+            self._hold_pos = self._read_pos + self.max_lag
+        elif self.policy==POLICY_CATCH_UP:
+            self.dropped += lag
+            self._read_pos = buffer._write_pos
+        else:
+            self.dropped += lag - self.max_lag
+            self._read_pos = buffer._write_pos - self.max_lag
+
+    def _release_hold(self):
+        """
+        Skip data dropped by drop newest policy (must be called with lock acquired)
+        """
+        if self._hold_pos is not None:
+            self.dropped += self.buffer._write_pos - self._hold_pos
+            self._read_pos = self.buffer._write_pos
+            self._hold_pos = None
+
+    def set_policy(self, policy=POLICY_DROP_OLDEST, max_lag=None):
+        """
+        Set overrun policy
+
+        Args:
+            policy (string): overrun policy (see POLICY_XXX)
+            max_lag (int): max number of unread bytes before policy is applied (buffer size if None). It should
+                           be a multiple of audio frame size. Drop newest policy keeps at most half of buffer,
+                           so kept data is not overwritten while reader consumes it
+        """
+        if policy not in POLICIES:
+            raise Exception(u'Parameter policy is invalid: must be one of %s' % u', '.join(POLICIES))
+        if max_lag is not None and max_lag<=0:
+            raise Exception(u'Parameter max_lag is invalid: must be greater than 0')
+
+        buffer = self.buffer
+        with buffer._lock:
+            max_lag = buffer._size if max_lag is None else min(max_lag, buffer._size)
+            if policy==POLICY_DROP_NEWEST:
+                max_lag = min(max_lag, buffer._size // 2)
+            if policy!=POLICY_DROP_NEWEST:
+                self._release_hold()
+            self.policy = policy
+            self.max_lag = max_lag
+
+    def get_lag(self):
+        """
+        Return how far reader is behind writer (unread data, including data dropped by drop newest policy)
+
+        Return:
+            int: number of bytes
+        """
+        return self.buffer._write_pos - self._read_pos
+
+    def size(self):
+        """
+        Return buffer capacity in bytes
+        """
+        return self.buffer._size
+
+    @property
+    def write_time(self):
+        """
+        Return time newest data was written to buffer
+        """
+        return self.buffer.write_time
+
+    def clear(self):
+        """
+        Drop all available data
+        """
+        with self.buffer._lock:
+            self._release_hold()
+            self._read_pos = self.buffer._write_pos
+
+    def wait(self, size=1, timeout=None):
+        """
+        Block until at least size bytes are available for reading
+
+        Args:
+            size (int): number of bytes to wait for
+            timeout (float): max waiting time in seconds. If None wait until data is available or reader interrupted
+
+        Return:
+            bool: True if data is available, False if timeout occured or reader was interrupted
+        """
+        buffer = self.buffer
+        with buffer._cond:
+            self._wanted = max(1, min(size, buffer._size))
+            if self._end()-self._read_pos<self._wanted and not self._interrupted:
+                buffer._cond.wait(timeout)
+
+            return not self._interrupted and self._end()-self._read_pos>=self._wanted
+
+    def interrupt(self):
+        """
+        Wake up waiting reader. Following calls to wait return immediately until reset_interrupt is called
+        """
+        with self.buffer._cond:
+            self._interrupted = True
+            self.buffer._cond.notify_all()
+
+    def reset_interrupt(self):
+        """
+        Reset interrupt flag set by interrupt
+        """
+        with self.buffer._cond:
+            self._interrupted = False
+
+    def get_views(self, size=None):
+        """
+        Retrieve data from reader position without copying it
+
+        Args:
+            size (int): max number of bytes to read. If None all available data is returned
+
+        Return:
+            tuple: tuple of 0, 1 or 2 memoryviews (2 when data wraps at end of buffer)
+        """
+        buffer = self.buffer
+        with buffer._lock:
+            available = self._end() - self._read_pos
+            if size is None or size>available:
+                size = available
+            if size==0:
+                return ()
+
+            views = buffer._slice(self._read_pos, size)
+            self._read_pos += size
+            if self._hold_pos is not None and self._read_pos>=self._hold_pos:
+                #backlog consumed, go on with new data
+                self._release_hold()
+            return views
+
+    def get_previous(self, size):
+        """
+        Return data preceding read cursor, as long as it was not overwritten by writer
+
+        Args:
+            size (int): number of bytes to return
+
+        Return:
+            bytes: copy of data (can be shorter than size if data was overwritten)
+        """
+        buffer = self.buffer
+        with buffer._lock:
+            size = min(size, self._read_pos, buffer._size - (buffer._write_pos - self._read_pos))
+            if size<=0:
+                return b''
+
+            return b''.join([view.tobytes() for view in buffer._slice(self._read_pos - size, size)])
+
+    def get(self, size=None):
+        """
+        Retrieve data from reader position
+
+        Args:
+            size (int): max number of bytes to read. If None all available data is returned
+
+        Return:
+            bytes: copy of read data (empty if no data available)
+        """
+        return b''.join([view.tobytes() for view in self.get_views(size)])
+
@@ -1,12 +1,15 @@
 #!/usr/bin/env python
 
-import collections
 import pyaudio
 import snowboydetect
+from ringbuffer import RingBuffer, POLICY_DROP_OLDEST
+from capture import AudioCapture
+from vad import Endpointer
 import time
 import wave
 import os
 import logging
+from threading import Lock
 
 logging.basicConfig()
 logger = logging.getLogger("snowboy")
@@ -17,22 +20,11 @@ RESOURCE_FILE = os.path.join(TOP_DIR, "resources/common.res")
 DETECT_DING = os.path.join(TOP_DIR, "resources/ding.wav")
 DETECT_DONG = os.path.join(TOP_DIR, "resources/dong.wav")
 TMP_DIR = '/tmp'
-
-
-class RingBuffer(object):
-    """Ring buffer to hold audio from PortAudio"""
-    def __init__(self, size = 4096):
-        self._buf = collections.deque(maxlen=size)
-
-    def extend(self, data):
-        """Adds data to the end of buffer"""
-        self._buf.extend(data)
-
-    def get(self):
-        """Retrieves data from the beginning of buffer and clears it"""
-        tmp = bytes(bytearray(self._buf))
-        self._buf.clear()
-        return tmp
+FRAMES_PER_BUFFER = 2048
+#audio format expected by snowboy models
+DETECT_RATE = 16000
+DETECT_CHANNELS = 1
+DETECT_SAMPLE_WIDTH = 2
 
 
 def play_audio_file(fname=DETECT_DING):
@@ -60,7 +52,8 @@ def play_audio_file(fname=DETECT_DING):
 class HotwordDetector(object):
     """
     Snowboy decoder to detect whether a keyword specified by `decoder_model`
-    exists in a microphone input stream.
+    exists in an audio stream (microphone by default, or any audio source:
+    wav file, raw PCM iterator, socket...).
 
     :param decoder_model: decoder model file path, a string or a list of strings
     :param resource: resource file path.
@@ -69,98 +62,158 @@ class HotwordDetector(object):
                               decoder. If an empty list is provided, then the
                               default sensitivity in the model will be used.
     :param audio_gain: multiply input volume by this factor.
+    :param source: audio source to read audio from (AudioCapture shared with
+                   other consumers, WavFileSource, PcmSource, SocketSource).
+                   Its audio format must match models format. If None,
+                   detector opens its own microphone AudioCapture.
+    :param overrun_policy: what to do when detection falls behind audio
+                           source (see ringbuffer POLICY_XXX): drop oldest
+                           audio, drop newest audio, or catch up by skipping
+                           stale audio.
+    :param max_lag: max duration in second of audio waiting for detection
+                    before overrun policy is applied. If None, duration of
+                    source buffer.
     """
     def __init__(self, decoder_model,
                  resource=RESOURCE_FILE,
                  sensitivity=[],
-                 audio_gain=1):
-
-        def audio_callback(in_data, frame_count, time_info, status):
-            self.ring_buffer.extend(in_data)
-            play_data = chr(0) * len(in_data)
-            return play_data, pyaudio.paContinue
+                 audio_gain=1,
+                 source=None,
+                 overrun_policy=POLICY_DROP_OLDEST,
+                 max_lag=None):
 
         tm = type(decoder_model)
-        ts = type(sensitivity)
         if tm is not list:
             decoder_model = [decoder_model]
-        if ts is not list:
-            sensitivity = [sensitivity]
         model_str = ",".join(decoder_model)
 
         self.detector = snowboydetect.SnowboyDetect(
             resource_filename=resource.encode(), model_str=model_str.encode())
         self.detector.SetAudioGain(audio_gain)
         self.num_hotwords = self.detector.NumHotwords()
-
-        if len(decoder_model) > 1 and len(sensitivity) == 1:
-            sensitivity = sensitivity*self.num_hotwords
-        if len(sensitivity) != 0:
-            assert self.num_hotwords == len(sensitivity), \
-                "number of hotwords in decoder_model (%d) and sensitivity " \
-                "(%d) does not match" % (self.num_hotwords, len(sensitivity))
-        sensitivity_str = ",".join([str(t) for t in sensitivity])
-        if len(sensitivity) != 0:
+        self.audio_gain = audio_gain
+        self._callbacks = None
+        #timestamps of last detection stages (hotword_capture, hotword,
+        #speech_end, endpoint)
+        self.timestamps = {}
+
+        sensitivity_str = self._sensitivityString(sensitivity)
+        if sensitivity_str:
             self.detector.SetSensitivity(sensitivity_str.encode())
 
-        self.ring_buffer = RingBuffer(
-            self.detector.NumChannels() * self.detector.SampleRate() * 5)
-        self.audio = pyaudio.PyAudio()
-        self.stream_in = self.audio.open(
-            input=True, output=False,
-            format=self.audio.get_format_from_width(
-                self.detector.BitsPerSample() / 8),
-            channels=self.detector.NumChannels(),
-            rate=self.detector.SampleRate(),
-            frames_per_buffer=2048,
-            stream_callback=audio_callback)
+        #settings changed while detecting, applied before next frame
+        self._settingsLock = Lock()
+        self._pendingSensitivity = None
+        self._pendingAudioGain = None
+        self._pendingModel = None
+
+        #detection frame (bytes of one PortAudio buffer)
+        self.frame_size = self.detector.NumChannels() * FRAMES_PER_BUFFER * \
+            self.detector.BitsPerSample() / 8
+        self._bytesPerSecond = self.detector.SampleRate() * \
+            self.detector.NumChannels() * self.detector.BitsPerSample() / 8
+
+        #read audio from source (5 seconds of audio buffered)
+        self._ownSource = source is None
+        if source is None:
+            source = AudioCapture(
+                rate=self.detector.SampleRate(),
+                channels=self.detector.NumChannels(),
+                sample_width=self.detector.BitsPerSample() / 8,
+                frames_per_buffer=FRAMES_PER_BUFFER)
+        assert source.rate == self.detector.SampleRate() and \
+            source.channels == self.detector.NumChannels() and \
+            source.sample_width == self.detector.BitsPerSample() / 8, \
+            "audio format of source does not match models"
+        self.source = source
+        self.ring_buffer = source.subscribe("detector")
+        self.setOverrunPolicy(overrun_policy, max_lag)
+        #duration in second of captured audio waiting for detection when
+        #last frame was read
+        self.lag = 0.0
 
 
     def start(self, detected_callback=play_audio_file,
               interrupt_check=lambda: False,
-              sleep_time=0.03,
+              sleep_time=None,
               audio_recorder_callback=None,
-              silent_count_threshold=15,
-              recording_timeout=100):
+              trailing_silence=0.7,
+              max_utterance=10.0,
+              vad_threshold=300,
+              recording_to_file=True,
+              audio_chunk_callback=None,
+              preroll_time=0.1,
+              error_callback=None):
         """
-        Start the voice detector. For every `sleep_time` second it checks the
-        audio buffer for triggering keywords. If detected, then call
-        corresponding function in `detected_callback`, which can be a single
-        function (single model) or a list of callback functions (multiple
-        models). Every loop it also calls `interrupt_check` -- if it returns
-        True, then breaks from the loop and return.
+        Start the voice detector. It blocks until the audio callback signals a
+        full detection frame is available, then checks it for triggering
+        keywords. If detected, then call corresponding function in
+        `detected_callback`, which can be a single function (single model) or a
+        list of callback functions (multiple models). Every loop it also calls
+        `interrupt_check` -- if it returns True, then breaks from the loop and
+        return. It also returns at end of audio source (end of file, closed
+        socket...).
 
         :param detected_callback: a function or list of functions. The number of
                                   items must match the number of models in
                                   `decoder_model`.
         :param interrupt_check: a function that returns True if the main loop
                                 needs to stop.
-        :param float sleep_time: how much time in second every loop waits.
+        :param float sleep_time: max time in second to wait for audio before
+                                 checking `interrupt_check` again. If None
+                                 waits until audio is available or `interrupt`
+                                 is called.
         :param audio_recorder_callback: if specified, this will be called after
                                         a keyword has been spoken and after the
                                         phrase immediately after the keyword has
                                         been recorded. The function will be
                                         passed the name of the file where the
-                                        phrase was recorded.
-        :param silent_count_threshold: indicates how long silence must be heard
-                                       to mark the end of a phrase that is
-                                       being recorded.
-        :param recording_timeout: limits the maximum length of a recording.
+                                        phrase was recorded, or the raw PCM
+                                        data if `recording_to_file` is False.
+        :param float trailing_silence: indicates how long (in second) silence
+                                       must be heard to mark the end of a
+                                       phrase that is being recorded.
+        :param float max_utterance: limits the maximum length of a recording
+                                    (in second).
+        :param vad_threshold: RMS energy of audio under which audio is
+                              considered as silence.
+        :param recording_to_file: if False, recorded phrase is not saved to a
+                                  wav file but passed in memory to
+                                  `audio_recorder_callback`.
+        :param audio_chunk_callback: if specified, this will be called with
+                                     each chunk of audio while the phrase
+                                     after the keyword is being recorded (to
+                                     stream it while user is speaking).
+        :param float preroll_time: duration in second of audio preceding the
+                                   keyword detection that is added in front of
+                                   the recorded phrase. Recorded phrase starts
+                                   at detection point (keyword audio is not
+                                   recorded), pre-roll keeps the beginning of
+                                   phrases spoken right after the keyword.
+        :param error_callback: if specified, this will be called (without
+                               argument) each time detector fails to process
+                               audio.
         :return: None
         """
+        self.ring_buffer.reset_interrupt()
         if interrupt_check():
             logger.debug("detect voice return")
             return
 
-        tc = type(detected_callback)
-        if tc is not list:
-            detected_callback = [detected_callback]
-        if len(detected_callback) == 1 and self.num_hotwords > 1:
-            detected_callback *= self.num_hotwords
+        self._callbacks = self._callbacksList(detected_callback,
+                                              self.num_hotwords)
 
-        assert self.num_hotwords == len(detected_callback), \
-            "Error: hotwords in your models (%d) do not match the number of " \
-            "callbacks (%d)" % (self.num_hotwords, len(detected_callback))
+        #pre-roll size aligned on samples
+        bytes_per_frame = self.detector.NumChannels() * self.sampleWidth()
+        preroll_size = int(preroll_time * self.sampleRate()) * bytes_per_frame
+
+        #end of phrase detector (measured in samples)
+        endpointer = Endpointer(self.sampleRate(),
+                                channels=self.detector.NumChannels(),
+                                trailing_silence=trailing_silence,
+                                max_utterance=max_utterance,
+                                threshold=vad_threshold)
+        self.endpointLatency = None
 
         logger.debug("detecting...")
 
@@ -169,70 +222,273 @@ class HotwordDetector(object):
             if interrupt_check():
                 logger.debug("detect voice break")
                 break
-            data = self.ring_buffer.get()
-            if len(data) == 0:
-                time.sleep(sleep_time)
+            if not self.ring_buffer.wait(self.frame_size, sleep_time):
+                if self.ring_buffer.ended:
+                    logger.debug("end of audio source")
+                    if state == "ACTIVE":
+                        #end of audio ends phrase being recorded
+                        if recording_to_file:
+                            audio_recorder_callback(self.saveMessage())
+                        else:
+                            audio_recorder_callback(self.getMessage())
+                    break
                 continue
+            #lag of oldest audio of processed data (read before it is consumed)
+            self.lag = float(self.ring_buffer.get_lag()) / self._bytesPerSecond
+            #one frame at a time, so detection point (and pre-roll) is accurate
+            #to one frame even if detection is late
+            data = self.ring_buffer.get(self.frame_size)
 
+            self._applyPendingSettings()
             status = self.detector.RunDetection(data)
             if status == -1:
                 logger.warning("Error initializing streams or reading audio data")
+                if error_callback is not None:
+                    error_callback()
 
             #small state machine to handle recording of phrase after keyword
             if state == "PASSIVE":
                 if status > 0: #key word found
+                    self.timestamps = {
+                        "hotword_capture": self.ring_buffer.write_time,
+                        "hotword": time.time()
+                    }
+                    #start recording at detection point (drop keyword audio)
+                    #with pre-roll taken from ring buffer history
                     self.recordedData = []
-                    self.recordedData.append(data)
-                    silentCount = 0
-                    recordingCount = 0
+                    if preroll_size > 0:
+                        self.recordedData.append(
+                            self.ring_buffer.get_previous(preroll_size))
+                    endpointer.reset()
+                    recordedLength = 0
+                    for chunk in self.recordedData:
+                        endpointer.process(chunk)
+                        recordedLength += len(chunk)
                     message = "Keyword " + str(status) + " detected at time: "
                     message += time.strftime("%Y-%m-%d %H:%M:%S",
                                          time.localtime(time.time()))
                     logger.info(message)
-                    callback = detected_callback[status-1]
+                    callback = self._callbacks[status-1]
                     if callback is not None:
                         callback()
 
                     if audio_recorder_callback is not None:
                         state = "ACTIVE"
+                        if audio_chunk_callback is not None and \
+                                len(self.recordedData) > 0:
+                            audio_chunk_callback(self.recordedData[0])
                     continue
 
             elif state == "ACTIVE":
-                stopRecording = False
-                if recordingCount > recording_timeout:
-                    stopRecording = True
-                elif status == -2: #silence found
-                    if silentCount > silent_count_threshold:
-                        stopRecording = True
-                    else:
-                        silentCount = silentCount + 1
-                elif status == 0: #voice found
-                    silentCount = 0
-
+                stopRecording = endpointer.process(data)
                 if stopRecording == True:
-                    fname = self.saveMessage()
-                    audio_recorder_callback(fname)
-                    state = "PASSIVE"
-                    continue
+                    #keep audio until endpoint only
+                    data = data[:max(0, endpointer.get_endpoint_offset(
+                        self.sampleWidth()) - recordedLength)]
 
-                recordingCount = recordingCount + 1
+                recordedLength += len(data)
                 self.recordedData.append(data)
+                if audio_chunk_callback is not None and len(data) > 0:
+                    audio_chunk_callback(data)
+
+                if stopRecording == True:
+                    self.endpointLatency = endpointer.get_latency()
+                    self.timestamps["endpoint"] = time.time()
+                    if self.ring_buffer.write_time is not None:
+                        self.timestamps["speech_end"] = \
+                            self.ring_buffer.write_time - self.endpointLatency
+                    logger.debug("End of phrase detected %.3f seconds after "
+                                 "end of speech" % self.endpointLatency)
+                    if recording_to_file:
+                        audio_recorder_callback(self.saveMessage())
+                    else:
+                        audio_recorder_callback(self.getMessage())
+                    state = "PASSIVE"
 
         logger.debug("finished.")
 
+    def _callbacksList(self, detected_callback, num_hotwords):
+        """
+        Build list of detection callbacks (one per hotword).
+        :param detected_callback: a function or list of functions.
+        :param num_hotwords: number of hotwords in models.
+        :return: list of callbacks
+        """
+        if type(detected_callback) is not list:
+            detected_callback = [detected_callback]
+        if len(detected_callback) == 1 and num_hotwords > 1:
+            detected_callback = detected_callback * num_hotwords
+
+        assert num_hotwords == len(detected_callback), \
+            "Error: hotwords in your models (%d) do not match the number of " \
+            "callbacks (%d)" % (num_hotwords, len(detected_callback))
+        return detected_callback
+
+    def _sensitivityString(self, sensitivity, num_hotwords=None):
+        """
+        Build sensitivity string expected by SnowboyDetect.
+        :param sensitivity: a float or a list of floats (one per hotword).
+        :param num_hotwords: number of hotwords in models (default current
+                             models).
+        :return: sensitivity string (empty to keep models sensitivity)
+        """
+        if num_hotwords is None:
+            num_hotwords = self.num_hotwords
+        if type(sensitivity) is not list:
+            sensitivity = [sensitivity]
+        if num_hotwords > 1 and len(sensitivity) == 1:
+            sensitivity = sensitivity*num_hotwords
+        if len(sensitivity) != 0:
+            assert num_hotwords == len(sensitivity), \
+                "number of hotwords in decoder_model (%d) and sensitivity " \
+                "(%d) does not match" % (num_hotwords, len(sensitivity))
+        return ",".join([str(t) for t in sensitivity])
+
+    def swapModel(self, decoder_model, detected_callback=None,
+                  resource=RESOURCE_FILE, sensitivity=[]):
+        """
+        Load new models while detecting. Models are loaded in caller thread
+        and swapped before next audio frame is processed, audio stream and
+        buffered audio are kept.
+        :param decoder_model: decoder model file path, a string or a list of
+                              strings. Audio format must be the same as
+                              current models.
+        :param detected_callback: a function or list of functions for new
+                                  models. If None, current callbacks are kept.
+        :param resource: resource file path.
+        :param sensitivity: decoder sensitivity, a float of a list of floats.
+        :return: None
+        """
+        if type(decoder_model) is not list:
+            decoder_model = [decoder_model]
+        model_str = ",".join(decoder_model)
+
+        detector = snowboydetect.SnowboyDetect(
+            resource_filename=resource.encode(), model_str=model_str.encode())
+        assert detector.SampleRate() == self.detector.SampleRate() and \
+            detector.NumChannels() == self.detector.NumChannels() and \
+            detector.BitsPerSample() == self.detector.BitsPerSample(), \
+            "audio format of new models does not match current models"
+        num_hotwords = detector.NumHotwords()
+        sensitivity_str = self._sensitivityString(sensitivity, num_hotwords)
+        if sensitivity_str:
+            detector.SetSensitivity(sensitivity_str.encode())
+
+        if detected_callback is None:
+            detected_callback = self._callbacks
+        callbacks = None
+        if detected_callback is not None:
+            callbacks = self._callbacksList(detected_callback, num_hotwords)
+
+        with self._settingsLock:
+            detector.SetAudioGain(self.audio_gain)
+            self._pendingModel = (detector, num_hotwords, callbacks)
+
+    def setSensitivity(self, sensitivity):
+        """
+        Change decoder sensitivity while detecting. New value is applied
+        before next audio frame is processed.
+        :param sensitivity: a float or a list of floats (one per hotword).
+        :return: None
+        """
+        sensitivity_str = self._sensitivityString(sensitivity)
+        with self._settingsLock:
+            self._pendingSensitivity = sensitivity_str
+
+    def setAudioGain(self, audio_gain):
+        """
+        Change audio gain while detecting. New value is applied before next
+        audio frame is processed.
+        :param audio_gain: multiply input volume by this factor.
+        :return: None
+        """
+        with self._settingsLock:
+            self._pendingAudioGain = audio_gain
+
+    def setOverrunPolicy(self, policy, max_lag=None):
+        """
+        Change what happens when detection falls behind audio source. Applied
+        immediately. Note that audio skipped while a phrase is recorded is
+        also missing from recorded phrase.
+        :param policy: overrun policy (see ringbuffer POLICY_XXX).
+        :param max_lag: max duration in second of audio waiting for detection
+                        before policy is applied (None for source buffer
+                        duration).
+        :return: None
+        """
+        max_lag_size = None
+        if max_lag is not None:
+            #keep whole audio frames
+            bytes_per_frame = self.detector.NumChannels() * self.sampleWidth()
+            max_lag_size = max(1, int(max_lag * self.detector.SampleRate())) * \
+                bytes_per_frame
+        self.ring_buffer.set_policy(policy, max_lag_size)
+
+    def _applyPendingSettings(self):
+        """
+        Apply settings changed with setSensitivity and setAudioGain from the
+        detection thread (between frames).
+        :return: None
+        """
+        if self._pendingSensitivity is None and \
+                self._pendingAudioGain is None and self._pendingModel is None:
+            return
+        with self._settingsLock:
+            if self._pendingModel is not None:
+                detector, num_hotwords, callbacks = self._pendingModel
+                self.detector = detector
+                self.num_hotwords = num_hotwords
+                if callbacks is not None:
+                    self._callbacks = callbacks
+                #sensitivity was set for previous models
+                self._pendingSensitivity = None
+                logger.debug("voice models swapped")
+            if self._pendingSensitivity:
+                self.detector.SetSensitivity(self._pendingSensitivity.encode())
+            if self._pendingAudioGain is not None:
+                self.detector.SetAudioGain(self._pendingAudioGain)
+                self.audio_gain = self._pendingAudioGain
+            self._pendingSensitivity = None
+            self._pendingAudioGain = None
+            self._pendingModel = None
+
+    def interrupt(self):
+        """
+        Wake up detection loop waiting for audio, so `interrupt_check` is
+        checked immediately. Call it after making `interrupt_check` return True.
+        :return: None
+        """
+        self.ring_buffer.interrupt()
+
+    def sampleRate(self):
+        """
+        Return sample rate of recorded audio (in Hz).
+        """
+        return self.detector.SampleRate()
+
+    def sampleWidth(self):
+        """
+        Return sample width of recorded audio (in bytes).
+        """
+        return self.detector.BitsPerSample() / 8
+
+    def getMessage(self):
+        """
+        Return the message stored in self.recordedData as raw PCM data.
+        """
+        return b''.join(self.recordedData)
+
     def saveMessage(self):
         """
         Save the message stored in self.recordedData to a timestamped file.
         """
         filename = os.path.join(TMP_DIR, 'output' + str(int(time.time())) + '.wav')
-        data = b''.join(self.recordedData)
+        data = self.getMessage()
 
         #use wave to save data
         wf = wave.open(filename, 'wb')
         wf.setnchannels(1)
-        wf.setsampwidth(self.audio.get_sample_size(
-            self.audio.get_format_from_width(
-                self.detector.BitsPerSample() / 8)))
+        wf.setsampwidth(self.sampleWidth())
         wf.setframerate(self.detector.SampleRate())
         wf.writeframes(data)
         wf.close()
@@ -241,9 +497,10 @@ class HotwordDetector(object):
 
     def terminate(self):
         """
-        Terminate audio stream. Users cannot call start() again to detect.
+        Stop reading audio source (and close it if it was opened by
+        detector). Users cannot call start() again to detect.
         :return: None
         """
-        self.stream_in.stop_stream()
-        self.stream_in.close()
-        self.audio.terminate()
+        self.source.unsubscribe(self.ring_buffer)
+        if self._ownSource:
+            self.source.close()
@@ -0,0 +1,451 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+import wave
+import socket
+import audioop
+import logging
+from ringbuffer import RingBuffer
+
+logger = logging.getLogger(u'sources')
+
+
+class AudioSource(object):
+    """
+    Audio source base class. A source provides raw PCM audio to subscribers, each subscriber gets a reader with
+    RingBuffer reading API (wait, get, get_views, get_previous, interrupt, reset_interrupt), overrun API
+    (set_policy, get_lag) and an ended flag set when source has no more audio.
+
+    AudioCapture (microphone) is the live source, other sources in this module are pulled by their reader: audio
+    is read only when reader waits for it, so they run as fast as the consumer (faster than real time) and never
+    lose audio.
+    """
+
+    def __init__(self, rate=16000, channels=1, sample_width=2):
+        """
+        Constructor
+
+        Args:
+            rate (int): sample rate (in Hz)
+            channels (int): number of channels
+            sample_width (int): sample width (in bytes)
+        """
+        #members
+        self.rate = rate
+        self.channels = channels
+        self.sample_width = sample_width
+
+    def subscribe(self, name=None):
+        """
+        Subscribe to source audio
+
+        Args:
+            name (string): subscriber name
+
+        Return:
+            reader instance
+        """
+        raise NotImplementedError(u'subscribe must be implemented')
+
+    def unsubscribe(self, reader):
+        """
+        Unsubscribe from source audio
+
+        Args:
+            reader: reader returned by subscribe
+        """
+        raise NotImplementedError(u'unsubscribe must be implemented')
+
+    def is_closed(self):
+        """
+        Return True if source is closed
+
+        Return:
+            bool: True if closed
+        """
+        return False
+
+    def close(self):
+        """
+        Close source
+        """
+        pass
+
+
+class PullReader(object):
+    """
+    Reader of PcmSource: chunks are pulled from source iterator when reader waits for audio. Read audio is kept in
+    a ring buffer for get_previous (history).
+    """
+
+    def __init__(self, source, name=None, buffer_time=5.0):
+        """
+        Constructor
+
+        Args:
+            source (PcmSource): source to read
+            name (string): reader name
+            buffer_time (float): duration of audio kept in buffer (in seconds)
+        """
+        #members
+        self.source = source
+        self.name = name
+        self.ended = False
+        #time newest data was pulled
+        self.write_time = None
+        self._interrupted = False
+        self._buffer = RingBuffer(int(source.rate * buffer_time) * source.channels * source.sample_width)
+
+    def __len__(self):
+        """
+        Return number of bytes available for reading
+        """
+        return len(self._buffer)
+
+    def size(self):
+        """
+        Return buffer capacity in bytes
+        """
+        return self._buffer.size()
+
+    def clear(self):
+        """
+        Drop all available data
+        """
+        self._buffer.clear()
+
+    def wait(self, size=1, timeout=None):
+        """
+        Pull audio from source until at least size bytes are available
+
+        Note:
+            At end of source, remaining audio is available even if shorter than size (and ended flag is set).
+
+        Args:
+            size (int): number of bytes to wait for
+            timeout (float): unused, sources returning no data (empty chunk) stop waiting
+
+        Return:
+            bool: True if data is available, False if source has no data yet, ended or reader was interrupted
+        """
+        size = max(1, min(size, self._buffer.size()))
+        while len(self._buffer)<size and not self.ended and not self._interrupted:
+            chunk = self.source._pull()
+            if chunk is None:
+                self.ended = True
+            elif len(chunk)==0:
+                #no audio available yet
+                break
+            else:
+                self._buffer.extend(chunk)
+                self.write_time = time.time()
+
+        if self._interrupted:
+            return False
+        return len(self._buffer)>=size or (self.ended and len(self._buffer)>0)
+
+    def interrupt(self):
+        """
+        Stop waiting. Following calls to wait return immediately until reset_interrupt is called
+        """
+        self._interrupted = True
+
+    def reset_interrupt(self):
+        """
+        Reset interrupt flag set by interrupt
+        """
+        self._interrupted = False
+
+    def set_policy(self, policy=None, max_lag=None):
+        """
+        Set overrun policy. Unused: audio is pulled when reader needs it, so reader is never late
+        """
+        pass
+
+    def get_lag(self):
+        """
+        Return number of pulled bytes not read yet
+
+        Return:
+            int: number of bytes
+        """
+        return len(self._buffer)
+
+    def get_views(self, size=None):
+        """
+        Retrieve read audio without copying it
+
+        Args:
+            size (int): max number of bytes to read. If None all available data is returned
+
+        Return:
+            tuple: tuple of 0, 1 or 2 memoryviews
+        """
+        return self._buffer.get_views(size)
+
+    def get_previous(self, size):
+        """
+        Return audio preceding read cursor
+
+        Args:
+            size (int): number of bytes to return
+
+        Return:
+            bytes: copy of data
+        """
+        return self._buffer.get_previous(size)
+
+    def get(self, size=None):
+        """
+        Retrieve read audio
+
+        Args:
+            size (int): max number of bytes to read. If None all available data is returned
+
+        Return:
+            bytes: copy of read data
+        """
+        return self._buffer.get(size)
+
+
+class PcmSource(AudioSource):
+    """
+    Audio source reading raw PCM chunks from an iterator. Iterator can yield empty chunk when no audio is available
+    yet (reader stops waiting), source ends when iterator is exhausted.
+
+    Only one reader can be subscribed at a time (audio is pulled by reader).
+    """
+
+    def __init__(self, chunks, rate=16000, channels=1, sample_width=2, realtime=False):
+        """
+        Constructor
+
+        Args:
+            chunks (iterable): raw PCM chunks (bytes)
+            rate (int): sample rate (in Hz)
+            channels (int): number of channels
+            sample_width (int): sample width (in bytes)
+            realtime (bool): if True audio is delivered at real time pace (simulates microphone), otherwise as fast as
+                             reader consumes it
+        """
+        AudioSource.__init__(self, rate, channels, sample_width)
+
+        #members
+        self.realtime = realtime
+        self.__chunks = iter(chunks)
+        self.__reader = None
+        self.__closed = False
+        self.__start_time = None
+        self.__pulled = 0
+
+    def _pull(self):
+        """
+        Pull next chunk from iterator
+
+        Return:
+            bytes: audio chunk, empty if no audio available yet, None if source ended
+        """
+        if self.__closed:
+            return None
+        try:
+            chunk = next(self.__chunks)
+        except StopIteration:
+            return None
+
+        if self.realtime and len(chunk)>0:
+            #wait until chunk is "captured"
+            if self.__start_time is None:
+                self.__start_time = time.time()
+            self.__pulled += len(chunk)
+            delay = self.__start_time + float(self.__pulled) / (self.rate * self.channels * self.sample_width) - time.time()
+            if delay>0:
+                time.sleep(delay)
+
+        return chunk
+
+    def subscribe(self, name=None):
+        """
+        Subscribe to source audio
+
+        Args:
+            name (string): subscriber name
+
+        Return:
+            PullReader: source reader
+        """
+        if self.__closed:
+            raise Exception(u'Audio source is closed')
+        if self.__reader is not None:
+            raise Exception(u'Audio source already has a reader')
+        self.__reader = PullReader(self, name)
+
+        return self.__reader
+
+    def unsubscribe(self, reader):
+        """
+        Unsubscribe from source audio
+
+        Args:
+            reader (PullReader): reader returned by subscribe
+        """
+        if reader is self.__reader:
+            self.__reader = None
+        reader.ended = True
+        reader.interrupt()
+
+    def is_closed(self):
+        """
+        Return True if source is closed
+
+        Return:
+            bool: True if closed
+        """
+        return self.__closed
+
+    def close(self):
+        """
+        Close source
+        """
+        self.__closed = True
+        if self.__reader is not None:
+            self.unsubscribe(self.__reader)
+
+
+class WavFileSource(PcmSource):
+    """
+    Audio source reading a wav file. Audio can be converted on the fly to expected format (mono, 16 bits, other
+    rate), for example to feed a detector with any recording.
+    """
+
+    def __init__(self, path, rate=None, channels=None, sample_width=None, chunk_time=0.1, realtime=False):
+        """
+        Constructor
+
+        Args:
+            path (string): wav file path
+            rate (int): output sample rate (None to keep file rate)
+            channels (int): output channels, only 1 (mono) conversion is supported (None to keep file channels)
+            sample_width (int): output sample width (None to keep file sample width)
+            chunk_time (float): duration of read chunks (in seconds)
+            realtime (bool): deliver audio at real time pace
+        """
+        self.path = path
+        self.__wav = wave.open(path, 'rb')
+        self.__in_rate = self.__wav.getframerate()
+        self.__in_channels = self.__wav.getnchannels()
+        self.__in_width = self.__wav.getsampwidth()
+        if channels is not None and channels!=self.__in_channels and channels!=1:
+            raise Exception(u'Only mono conversion is supported')
+        self.__chunk_frames = max(1, int(chunk_time * self.__in_rate))
+
+        PcmSource.__init__(
+            self,
+            self.__read(),
+            rate=rate or self.__in_rate,
+            channels=channels or self.__in_channels,
+            sample_width=sample_width or self.__in_width,
+            realtime=realtime
+        )
+
+    def __read(self):
+        """
+        Read and convert wav file by chunks
+
+        Return:
+            generator: raw PCM chunks
+        """
+        state = None
+        try:
+            while True:
+                #frames count of streamed wav headers can be wrong, read until end of file
+                data = self.__wav.readframes(self.__chunk_frames)
+                if not data:
+                    break
+
+                #convert format
+                width = self.__in_width
+                if self.channels==1 and self.__in_channels>1:
+                    data = data[:len(data)-len(data)%(self.__in_channels*width)]
+                    if self.__in_channels==2:
+                        data = audioop.tomono(data, width, 0.5, 0.5)
+                    else:
+                        data = b''.join([data[i:i+width] for i in range(0, len(data), width*self.__in_channels)])
+                if self.sample_width!=width:
+                    data = audioop.lin2lin(data, width, self.sample_width)
+                    width = self.sample_width
+                if self.rate!=self.__in_rate:
+                    data, state = audioop.ratecv(data, width, self.channels, self.__in_rate, self.rate, state)
+
+                yield data
+        finally:
+            self.__wav.close()
+
+
+class SocketSource(PcmSource):
+    """
+    Audio source reading raw PCM sent on a connected socket (ends when peer closes connection)
+    """
+
+    def __init__(self, sock, rate=16000, channels=1, sample_width=2, chunk_size=4096, timeout=0.5):
+        """
+        Constructor
+
+        Args:
+            sock (socket): connected socket
+            rate (int): sample rate (in Hz)
+            channels (int): number of channels
+            sample_width (int): sample width (in bytes)
+            chunk_size (int): max number of bytes received at once
+            timeout (float): max time to wait for data (in seconds) before giving hand back to reader
+        """
+        self.sock = sock
+        self.chunk_size = chunk_size
+        self.sock.settimeout(timeout)
+
+        PcmSource.__init__(self, self.__receive(), rate=rate, channels=channels, sample_width=sample_width)
+
+    def __receive(self):
+        """
+        Receive audio from socket
+
+        Note:
+            Received data is cut at any byte, chunks are aligned on audio frames (channels * sample width) and
+            partial frame is kept for next chunk.
+
+        Return:
+            generator: raw PCM chunks
+        """
+        frame_size = self.channels * self.sample_width
+        partial = b''
+        while True:
+            try:
+                data = self.sock.recv(self.chunk_size)
+            except socket.timeout:
+                yield b''
+                continue
+            except socket.error:
+                logger.exception(u'Audio socket error:')
+                break
+            if not data:
+                #connection closed by peer
+                if partial:
+                    logger.debug(u'Incomplete audio frame dropped at end of socket stream')
+                break
+
+            data = partial + data
+            length = len(data) - len(data) % frame_size
+            partial = data[length:]
+            #yield empty chunk if less than a frame was received (no audio available yet)
+            yield data[:length]
+
+    def close(self):
+        """
+        Close source and its socket
+        """
+        PcmSource.close(self)
+        try:
+            self.sock.close()
+        except:
+            pass
+
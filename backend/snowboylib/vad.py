@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy
+
+
+def frame_energies(samples, frame_length):
+    """
+    Compute RMS energy of consecutive frames of samples (last incomplete frame is ignored)
+
+    Args:
+        samples (numpy.ndarray): int16 samples
+        frame_length (int): number of samples per frame
+
+    Return:
+        numpy.ndarray: RMS energy of each frame
+    """
+    count = len(samples) // frame_length
+    frames = samples[:count*frame_length].reshape(count, frame_length).astype(numpy.float32)
+    return numpy.sqrt(numpy.mean(frames * frames, axis=1))
+
+
+def trim_silence(samples, sample_rate, duration=0.1, threshold=10, window_time=0.02):
+    """
+    Remove silence from samples, with same semantics than sox command
+    "silence 1 <duration> <threshold>% -1 <duration> <threshold>%":
+
+     - beginning of audio is removed until signal is above threshold during duration
+     - then each silence lasting at least duration is removed (including trailing silence)
+
+    Like sox, signal level is RMS value computed over a sliding window, threshold is a percentage of full scale.
+    Everything is computed on whole arrays (no loop on samples).
+
+    Args:
+        samples (numpy.ndarray): mono int16 samples
+        sample_rate (int): sample rate (in Hz)
+        duration (float): min duration of silence to remove and of signal to keep (in seconds)
+        threshold (float): signal threshold in percentage of full scale (0..100)
+        window_time (float): RMS window duration (in seconds)
+
+    Return:
+        numpy.ndarray: trimmed int16 samples (empty if audio is only silence)
+    """
+    if len(samples)==0:
+        return samples
+    min_length = max(1, int(duration * sample_rate))
+    window = max(1, int(window_time * sample_rate))
+
+    #sliding RMS over last window samples (window starts filled with zeros like sox)
+    squares = samples.astype(numpy.float64)
+    squares *= squares
+    sums = numpy.cumsum(squares)
+    sums[window:] -= sums[:-window].copy()
+    loud = numpy.sqrt(sums / window) > threshold / 100.0 * 32768
+
+    #runs of loud or silent samples
+    starts = numpy.concatenate(([0], numpy.nonzero(loud[1:]!=loud[:-1])[0] + 1))
+    lengths = numpy.diff(numpy.concatenate((starts, [len(loud)])))
+    loud_runs = loud[starts]
+    long_runs = lengths>=min_length
+
+    #mode before each run is given by last long run: copy after long loud run, trim after long silence
+    indexes = numpy.where(long_runs, numpy.arange(len(starts)), -1)
+    last_long = numpy.concatenate(([-1], numpy.maximum.accumulate(indexes)[:-1]))
+    copying = (last_long>=0) & loud_runs[numpy.maximum(last_long, 0)]
+
+    #in trim mode only long loud runs are kept, in copy mode only long silences are removed
+    keep = (long_runs & loud_runs) | (copying & ~(long_runs & ~loud_runs))
+
+    return samples[numpy.repeat(keep, lengths)]
+
+
+class Endpointer(object):
+    """
+    Energy based end of utterance detector.
+
+    Audio is split in fixed duration frames, and utterance ends when trailing silence (frames with energy below
+    threshold) lasts specified duration, or when utterance reaches its max duration. Everything is measured in
+    samples so endpoint doesn't depend on audio chunks size.
+    """
+
+    def __init__(self, sample_rate=16000, channels=1, frame_time=0.01, trailing_silence=0.7, max_utterance=10.0, threshold=300, wait_speech=False):
+        """
+        Constructor
+
+        Args:
+            sample_rate (int): audio sample rate (16 bits samples only)
+            channels (int): number of interleaved channels
+            frame_time (float): analysis frame duration in seconds
+            trailing_silence (float): silence duration in seconds that ends utterance
+            max_utterance (float): max utterance duration in seconds
+            threshold (int): RMS energy under which a frame is silent
+            wait_speech (bool): if True, silence preceding first voiced frame doesn't end utterance (only max
+                                utterance duration does)
+        """
+        #members
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frame_length = max(1, int(frame_time * sample_rate))
+        self.silence_frames = max(1, int(round(trailing_silence / frame_time)))
+        self.max_samples = int(max_utterance * sample_rate)
+        self.threshold = threshold
+        self.wait_speech = wait_speech
+        self.reset()
+
+    def reset(self):
+        """
+        Reset endpointer for new utterance
+        """
+        self.__pending = numpy.zeros(0, dtype=numpy.int16)
+        self.__silence_run = 0
+        #samples of utterance processed so far (including pending ones)
+        self.samples = 0
+        #samples of utterance until end of last voiced frame
+        self.voiced_samples = 0
+        #endpoint position in samples (None until endpoint detected)
+        self.endpoint = None
+        #number of samples between end of speech and endpoint decision
+        self.latency = None
+
+    def process(self, data):
+        """
+        Process audio chunk
+
+        Args:
+            data (bytes): raw PCM data (16 bits)
+
+        Return:
+            bool: True if endpoint is reached
+        """
+        if self.endpoint is not None:
+            return True
+
+        samples = numpy.frombuffer(data, dtype=numpy.int16)
+        if self.channels>1:
+            samples = samples[:len(samples)-len(samples)%self.channels].reshape(-1, self.channels).mean(axis=1).astype(numpy.int16)
+        start = self.samples - len(self.__pending)
+        self.samples += len(samples)
+        samples = numpy.concatenate((self.__pending, samples))
+
+        #frames energy
+        energies = frame_energies(samples, self.frame_length)
+        count = len(energies)
+        self.__pending = samples[count*self.frame_length:]
+
+        #index of last voiced frame at each frame (previous silence run counts as voiced frame before first frame)
+        indexes = numpy.arange(count)
+        voiced = numpy.where(energies>=self.threshold, indexes, -1 - self.__silence_run)
+        last_voiced = numpy.maximum.accumulate(voiced) if count>0 else voiced
+        runs = indexes - last_voiced
+        if self.wait_speech and self.voiced_samples==0:
+            #no speech yet: leading silence is not trailing silence
+            runs[last_voiced<0] = 0
+
+        #check trailing silence
+        ends = numpy.nonzero(runs>=self.silence_frames)[0]
+        if len(ends)>0:
+            self.__update_voiced(start, last_voiced[ends[0]])
+            end = start + (ends[0] + 1) * self.frame_length
+            self.__set_endpoint(min(end, self.max_samples))
+            return True
+        if count>0:
+            self.__update_voiced(start, last_voiced[-1])
+            self.__silence_run = int(runs[-1])
+
+        #check max duration
+        if self.samples>=self.max_samples:
+            self.__set_endpoint(self.max_samples)
+            return True
+
+        return False
+
+    def __update_voiced(self, start, last_voiced):
+        """
+        Update end of speech position
+
+        Args:
+            start (int): position of first processed frame in samples
+            last_voiced (int): index of last voiced frame (negative if no voiced frame in processed frames)
+        """
+        if last_voiced>=0:
+            self.voiced_samples = start + (int(last_voiced) + 1) * self.frame_length
+
+    def __set_endpoint(self, endpoint):
+        """
+        Store endpoint
+
+        Args:
+            endpoint (int): endpoint position in samples
+        """
+        self.endpoint = endpoint
+        self.voiced_samples = min(self.voiced_samples, endpoint)
+        #decision is taken at end of processed chunk
+        self.latency = self.samples - self.voiced_samples
+
+    def has_speech(self):
+        """
+        Return True if a voiced frame was processed
+
+        Return:
+            bool: True if speech was detected
+        """
+        return self.voiced_samples>0
+
+    def get_endpoint_offset(self, sample_width=2):
+        """
+        Return endpoint position in bytes from beginning of utterance
+
+        Args:
+            sample_width (int): sample width in bytes
+
+        Return:
+            int: endpoint offset or None if endpoint is not reached
+        """
+        if self.endpoint is None:
+            return None
+        return self.endpoint * self.channels * sample_width
+
+    def get_latency(self):
+        """
+        Return endpoint latency: duration between end of speech and endpoint decision
+
+        Return:
+            float: latency in seconds or None if endpoint is not reached
+        """
+        if self.latency is None:
+            return None
+        return float(self.latency) / self.sample_rate
+
@@ -4,16 +4,24 @@
 import time
 import logging
 import os
-import collections
 import pyaudio
 import audioop
 import uuid
-from threading import Thread, Lock, Timer
+import wave
+import numpy
+from functools import partial
+from threading import Thread, Lock, Event
+from Queue import Queue, Full
 from raspiot.raspiot import RaspIotResource
-from raspiot.libs.commands.sox import Sox
 from raspiot.libs.internals.console import Console
 from raspiot.libs.externals.snowboy import Snowboy
 from raspiot.libs.externals.snowboylib import snowboydetect, snowboydecoder
+from raspiot.libs.externals.snowboylib.capture import AudioCapture
+from raspiot.libs.externals.snowboylib.ringbuffer import RingBuffer, POLICIES, POLICY_DROP_OLDEST
+from raspiot.libs.externals.snowboylib.vad import trim_silence, Endpointer
+from raspiot.libs.externals.latency import LatencyTracker
+from raspiot.libs.externals.metrics import MetricsRegistry
+from raspiot.libs.externals.sttproviders import BingSttProvider, GoogleCloudSttProvider, SphinxSttProvider, StreamingServerSttProvider
 from raspiot.utils import MissingParameter, InvalidParameter, CommandError
 import speech_recognition as speechrecognition
 
@@ -26,74 +34,183 @@ class BuildPersonalVoiceModelTask(Thread):
     Build snowboy personal voice model can take more than 1 minute, so we must parallelize its process
     """
 
-    TMP = u'/tmp/'
+    TRIM_DURATION = 0.1
+    TRIM_THRESHOLD = 10
 
-    def __init__(self, token, recordings, end_of_training_callback, logger):
+    def __init__(self, cleep_filesystem, token, recordings, end_of_training_callback, logger, cache_path=None):
         """
         Constructor
 
         Args:
+            cleep_filesystem (CleepFilesystem): CleepFilesystem instance
             token (string): api token
-            recordings (list): list of 3 recordings
+            recordings (list): list of 3 recordings (wav files paths)
             end_of_training_callback (callback): function called when training is terminated (params: error (bool), model filepath (string))
             logger (logger): logger instance
+            cache_path (string): trained voice models cache directory (None to disable cache)
         """
         Thread.__init__(self)
         Thread.daemon = True
 
         #members
         self.logger = logger
+        self.cache_path = cache_path
+        self.cleep_filesystem = cleep_filesystem
         self.callback = end_of_training_callback
         self.token = token
         self.recordings = recordings
-        self.sox = Sox()
+
+    def __load_recording(self, path):
+        """
+        Load recording and remove its silences (in memory)
+
+        Args:
+            path (string): wav file path (16 bits samples)
+
+        Return:
+            tuple: trimmed mono raw PCM data (bytes) and sample rate (int)
+        """
+        wav = wave.open(path, 'rb')
+        try:
+            channels = wav.getnchannels()
+            rate = wav.getframerate()
+            if wav.getsampwidth()!=2:
+                raise Exception(u'Recording "%s" is not 16 bits audio' % path)
+            samples = numpy.frombuffer(wav.readframes(wav.getnframes()), dtype=numpy.int16)
+        finally:
+            wav.close()
+
+        #mono only
+        if channels>1:
+            samples = samples[:len(samples)-len(samples)%channels].reshape(-1, channels).mean(axis=1).astype(numpy.int16)
+
+        #remove silence (same parameters than sox command from https://unix.stackexchange.com/a/293868)
+        trimmed = trim_silence(samples, rate, self.TRIM_DURATION, self.TRIM_THRESHOLD)
+        if len(trimmed)==0:
+            #only silence detected, fall back to original recording
+            self.logger.debug(u'No voice found in recording "%s", recording is not trimmed' % path)
+            trimmed = samples
+
+        return trimmed.tobytes(), rate
 
     def run(self):
         """
         Task
         """
-        #remove silence in recordings
-        #command from https://unix.stackexchange.com/a/293868
-        trimmed_recordings = [
-            os.path.join(self.TMP, '%s.wav' % str(uuid.uuid4())),
-            os.path.join(self.TMP, '%s.wav' % str(uuid.uuid4())),
-            os.path.join(self.TMP, '%s.wav' % str(uuid.uuid4()))
-        ]
-        for i in range(len(self.recordings)):
-            if not self.sox.trim_audio(self.recordings[i], trimmed_recordings[i]):
-                #error during trimming fall back to original file
-                trimmed_recordings[i] = self.recordings[i]
-
-        #build personal voice model
         error = None
         voice_model = None
-        snowboy = Snowboy(self.cleep_filesystem, self.token)
+        snowboy = Snowboy(self.cleep_filesystem, self.token, cache_path=self.cache_path)
         try:
-            voice_model = snowboy.train(trimmed_recordings[0], trimmed_recordings[1], trimmed_recordings[2])
+            #remove silence in recordings
+            samples = [self.__load_recording(recording) for recording in self.recordings]
+            rates = set([rate for _, rate in samples])
+            if len(rates)!=1:
+                raise Exception(u'Recordings have different sample rates')
+
+            #build personal voice model
+            voice_model = snowboy.train_samples([data for data, _ in samples], rate=rates.pop())
             self.logger.debug(u'Generated voice model: %s' % voice_model)
 
         except:
             self.logger.exception('Error during snowboy training:')
-            error = snowboy.get_last_error()
+            error = u'Error during voice model training'
 
         #end of process callback
         self.callback(error, voice_model)
 
 
+class CommandRecognitionTask(Thread):
+    """
+    Speech to text worker. It recognizes commands pushed to queue by speech recognition process, so STT provider
+    calls never block hotword detection
+    """
+
+    def __init__(self, logger, commands, recognize_callback):
+        """
+        Constructor
+
+        Args:
+            logger (logger): logger instance
+            commands (Queue): queue of recorded commands (tuple (AudioData, SttStream, hotword, timeline)). None stops the worker
+            recognize_callback (callback): function called with each recorded command (params: audio (AudioData), stream (SttStream), hotword (string), timeline (dict))
+        """
+        Thread.__init__(self)
+        Thread.daemon = True
+
+        #members
+        self.logger = logger
+        self.commands = commands
+        self.recognize_callback = recognize_callback
+
+    def run(self):
+        """
+        Task
+        """
+        while True:
+            command = self.commands.get()
+            if command is None:
+                #stop requested
+                break
+
+            try:
+                self.recognize_callback(*command)
+            except:
+                self.logger.exception(u'Exception during command recognition:')
+
+        self.logger.debug(u'Command recognition worker stopped')
+
+
 class SpeechRecognitionProcess(Thread):
     """
     Speech recognition process
+
+    Process lifecycle: STARTING (subscribed to audio capture) -> RUNNING -> STOPPING (stop requested) -> STOPPED
+    (unsubscribed from audio capture)
     """
-    def __init__(self, logger, voice_model, events, provider_token, sensitivity=0.4, audio_gain=1):
+
+    STATE_STARTING = u'starting'
+    STATE_RUNNING = u'running'
+    STATE_STOPPING = u'stopping'
+    STATE_STOPPED = u'stopped'
+
+    ERROR_NO_AUDIO = u'no_audio'
+    ERROR_QUEUE_FULL = u'queue_full'
+    ERROR_UNKNOWN_VALUE = u'unknown_value'
+    ERROR_REQUEST = u'request_error'
+    ERROR_NO_COMMAND = u'no_command'
+    ERROR_PROVIDER = u'provider_error'
+
+    #consecutive hotword detection failures before process stops
+    MAX_DETECTION_ERRORS = 5
+    #delay before restarting failed detection (multiplied by number of consecutive failures)
+    DETECTION_RETRY_DELAY = 1.0
+    #detection running longer than this time resets consecutive failures count (in seconds)
+    DETECTION_ERRORS_WINDOW = 60.0
+
+    def __init__(self, logger, capture, voice_models, events, provider, sensitivity=0.4, audio_gain=1, stt_workers=1, stt_queue_size=5, prewarm=True, preroll_time=0.1, trailing_silence=0.7, max_utterance=10.0, latency_tracker=None, metrics=None, overrun_policy=POLICY_DROP_OLDEST, max_lag=None):
         """
         Constructor
 
         Args:
             logger (logger): logger instance
-            voice_model (string): voice model file path (pmdl or umdl)
+            capture (AudioCapture): shared audio capture to detect hotword in
+            voice_models (list): list of voice models (dict: name (string), path (string): pmdl or umdl file path with
+                                 one hotword). All models are run by the same detector
             events (dict): events instances (keys: ('hotword_detected', 'hotword_released', 'command_detected', 'command_error'))
+            provider (SttProvider): speech to text provider instance
             sensitivity (float): great value make detector more sensitive to false positive
             audio_gain (int): decrease volume (<1) or boost volume (>1)
+            stt_workers (int): number of threads recognizing commands
+            stt_queue_size (int): max number of recorded commands waiting for recognition
+            prewarm (bool): open connections to STT provider as soon as hotword is detected
+            preroll_time (float): duration (in seconds) of audio preceding hotword detection added in front of command
+            trailing_silence (float): duration (in seconds) of silence ending command
+            max_utterance (float): max command duration (in seconds)
+            latency_tracker (LatencyTracker): tracker commands processing stages latencies are added to
+            metrics (MetricsRegistry): registry process counters are registered to (private registry if None)
+            overrun_policy (string): what to do when detection falls behind audio capture (see ringbuffer POLICY_XXX)
+            max_lag (float): max duration (in seconds) of audio waiting for detection before overrun policy is applied
+                             (None for audio capture buffer duration)
         """
         Thread.__init__(self)
         Thread.daemon = True
@@ -101,23 +218,188 @@ class SpeechRecognitionProcess(Thread):
         #members
         self.logger = logger
         self.running = True
+        self.state = self.STATE_STARTING
+        self.__stopped = Event()
+        self.__stop_requested = Event()
         self.hotword_detected_event = events[u'hotword_detected']
         self.hotword_released_event = event = events[u'hotword_released']
         self.command_detected_event = events[u'command_detected']
         self.command_error_event = events[u'command_error']
-        self.detector = snowboydecoder.HotwordDetector(voice_model, sensitivity=sensitivity, audio_gain=audio_gain)
-        self.recognizer = speechrecognition.Recognizer()
-        self.provider_token = provider_token
-        self.voice_model = voice_model
+        self.detector = snowboydecoder.HotwordDetector(
+            [model[u'path'] for model in voice_models],
+            sensitivity=sensitivity,
+            audio_gain=audio_gain,
+            source=capture,
+            overrun_policy=overrun_policy,
+            max_lag=max_lag
+        )
+        self.provider = provider
+        self.prewarm = prewarm
+        self.preroll_time = preroll_time
+        self.trailing_silence = trailing_silence
+        self.max_utterance = max_utterance
+        self.latency_tracker = latency_tracker
+        self.voice_models = voice_models
+        self.callbacks = self.__build_callbacks(voice_models)
+        self.hotword = None
         self.sensitivity = sensitivity
         self.audio_gain = audio_gain
         self.test = False
+        self.stream = None
+        self.commands = Queue(maxsize=stt_queue_size)
+        self.workers = [CommandRecognitionTask(logger, self.commands, self.recognize_command) for i in range(max(1, stt_workers))]
+
+        #counters (registered once in module registry, they are kept when process restarts)
+        if metrics is None:
+            metrics = MetricsRegistry()
+        self.hotword_detections = metrics.counter(u'hotword_detections_total', u'Hotword detections (including tests)')
+        self.detection_errors = metrics.counter(u'detection_errors_total', u'Audio frames hotword detector failed to process')
+        self.stt_requests = metrics.counter(u'stt_requests_total', u'Commands sent to STT provider')
+        self.commands_recognized = metrics.counter(u'commands_recognized_total', u'Commands recognized')
+        self.command_errors = dict([
+            (cause, metrics.counter(u'command_errors_total', u'Commands not recognized by cause', {u'cause': cause}))
+            for cause in (self.ERROR_NO_AUDIO, self.ERROR_QUEUE_FULL, self.ERROR_UNKNOWN_VALUE, self.ERROR_REQUEST, self.ERROR_NO_COMMAND, self.ERROR_PROVIDER)
+        ])
+
+    def __build_callbacks(self, voice_models):
+        """
+        Build detection callbacks: one callback per model to know which hotword is detected
+
+        Args:
+            voice_models (list): list of voice models
+
+        Return:
+            list: list of callbacks
+        """
+        return [partial(self.hotword_detected, model[u'name']) for model in voice_models]
+
+    def swap_models(self, voice_models):
+        """
+        Load new voice models in background and swap them in running detector between two audio frames. Audio
+        capture is not interrupted
+
+        Args:
+            voice_models (list): list of voice models (dict: name (string), path (string))
+        """
+        def swap():
+            try:
+                callbacks = self.__build_callbacks(voice_models)
+                self.detector.swapModel([model[u'path'] for model in voice_models], detected_callback=callbacks, sensitivity=self.sensitivity)
+                self.voice_models = voice_models
+                self.callbacks = callbacks
+                self.logger.debug(u'Voice models swapped: %s' % [model[u'name'] for model in voice_models])
+            except:
+                self.logger.exception(u'Unable to load new voice models:')
+
+        thread = Thread(target=swap)
+        thread.daemon = True
+        thread.start()
+
+    def set_provider(self, provider):
+        """
+        Change STT provider. New provider is used for next recorded commands
+
+        Args:
+            provider (SttProvider): speech to text provider instance
+        """
+        self.provider = provider
+
+    def set_sensitivity(self, sensitivity):
+        """
+        Change detector sensitivity live (applied on next audio frame)
+
+        Args:
+            sensitivity (float): great value make detector more sensitive to false positive
+        """
+        self.sensitivity = sensitivity
+        self.detector.setSensitivity(sensitivity)
+
+    def set_audio_gain(self, audio_gain):
+        """
+        Change detector audio gain live (applied on next audio frame)
+
+        Args:
+            audio_gain (float): decrease volume (<1) or boost volume (>1)
+        """
+        self.audio_gain = audio_gain
+        self.detector.setAudioGain(audio_gain)
+
+    def set_overrun_policy(self, policy, max_lag=None):
+        """
+        Change what happens when detection falls behind audio capture (applied immediately)
+
+        Args:
+            policy (string): overrun policy (see ringbuffer POLICY_XXX)
+            max_lag (float): max duration (in seconds) of audio waiting for detection before policy is applied
+        """
+        self.detector.setOverrunPolicy(policy, max_lag)
+
+    def get_lag(self):
+        """
+        Return how far detection is behind real time
+
+        Return:
+            float: duration (in seconds) of captured audio waiting for detection
+        """
+        return self.detector.lag
 
-    def stop(self):
+    def stop(self, timeout=None):
         """
         Stop recognition process
+
+        Args:
+            timeout (float): if specified, wait until detector is unsubscribed from audio capture during this time (in seconds)
+
+        Return:
+            bool: True if process is stopped (always False if no timeout specified)
         """
+        if self.state in (self.STATE_STARTING, self.STATE_RUNNING):
+            self.state = self.STATE_STOPPING
         self.running = False
+        self.__stop_requested.set()
+        #wake up detector waiting for audio
+        self.detector.interrupt()
+
+        if timeout is None:
+            return False
+        if not self.is_alive() and self.state!=self.STATE_STOPPED:
+            #thread never started, release audio capture now
+            self.__terminate()
+        self.__stopped.wait(timeout)
+
+        return self.__stopped.is_set()
+
+    def get_state(self):
+        """
+        Return process state
+
+        Return:
+            string: process state (see STATE_XXX)
+        """
+        return self.state
+
+    def __terminate(self):
+        """
+        Unsubscribe from audio capture and stop STT workers
+        """
+        try:
+            self.detector.terminate()
+        except:
+            self.logger.exception(u'Exception during hotword dectection deallocation')
+
+        #audio capture is released
+        self.state = self.STATE_STOPPED
+        self.__stopped.set()
+
+        #workers end after pending commands, don't wait for them (STT calls can be long)
+        def stop_workers():
+            for worker in self.workers:
+                if worker.is_alive():
+                    #blocking put: workers always empty the queue
+                    self.commands.put(None)
+        thread = Thread(target=stop_workers)
+        thread.daemon = True
+        thread.start()
 
     def enable_test(self):
         """
@@ -151,16 +433,25 @@ class SpeechRecognitionProcess(Thread):
         Record command after hotword detected
 
         Args:
-            recording (string): recorded file path
+            recording (bytes): recorded raw PCM data
         """
+        stream = self.stream
+        self.stream = None
+        hotword = self.hotword
+        timeline = dict(self.detector.timestamps)
+
         if self.test:
             #drop recording during test
+            if stream:
+                stream.cancel()
             return
 
-        #get recorded audio
+        #build audio from recorded data (no file involved)
+        audio = None
         try:
-            with speechrecognition.AudioFile(recording) as source:
-                audio = self.recognizer.record(source)
+            if len(recording)>0:
+                audio = speechrecognition.AudioData(recording, self.detector.sampleRate(), self.detector.sampleWidth())
+                timeline[LatencyTracker.MARK_AUDIO_READY] = time.time()
         except:
             self.logger.exception(u'Error during speech recognition')
         finally:
@@ -170,62 +461,121 @@ class SpeechRecognitionProcess(Thread):
 
         #check audio
         if not audio:
+            if stream:
+                stream.cancel()
+            self.command_errors[self.ERROR_NO_AUDIO].inc()
             self.command_error_event.send()
             self.command_error_event.render()
             self.logger.debug(u'No audio recorded')
             return
 
-        #TODO handle STT provider
-	try:
-            self.logger.debug('Recognizing audio... (token: %s)' % self.provider_token)
-            command = self.recognizer.recognize_bing(audio, key=self.provider_token.encode(), language='fr-FR')
-            self.logger.debug('Done: command=%s' % command)
+        #push command to STT workers
+        try:
+            self.commands.put_nowait((audio, stream, hotword, timeline))
+        except Full:
+            if stream:
+                stream.cancel()
+            self.command_errors[self.ERROR_QUEUE_FULL].inc()
+            self.command_error_event.send()
+            self.command_error_event.render()
+            self.logger.warning(u'Too many commands waiting for recognition, command dropped')
+
+    def stream_command(self, data):
+        """
+        Stream command audio while it is recorded
+
+        Args:
+            data (bytes): recorded raw PCM chunk
+        """
+        if self.stream:
+            self.stream.feed(data)
+
+    def recognize_command(self, audio, stream=None, hotword=None, timeline=None):
+        """
+        Recognize recorded command using STT provider and send command event. Executed by STT workers
+
+        Args:
+            audio (AudioData): recorded command
+            stream (SttStream): stream command was sent to while recorded. If specified, transcript is read from it
+            hotword (string): name of hotword that triggered command recording
+            timeline (dict): command processing timestamps (see LatencyTracker)
+        """
+        if timeline is None:
+            timeline = {}
+        try:
+            self.logger.debug(u'Recognizing audio using %s...' % self.provider.__class__.__name__)
+            timeline[LatencyTracker.MARK_STT_REQUEST] = time.time()
+            self.stt_requests.inc()
+            result = self.provider.recognize(audio, stream)
+            timeline[LatencyTracker.MARK_STT_RESPONSE] = time.time()
+            command = result[u'command']
+            self.logger.debug(u'Done in %.3f seconds: command=%s' % (result[u'duration'], command))
 
         except speechrecognition.UnknownValueError:
+            self.command_errors[self.ERROR_UNKNOWN_VALUE].inc()
             self.command_error_event.send()
             self.command_error_event.render()
             self.logger.warning(u'STT provider doesn\'t understand audio')
             return
 
         except speechrecognition.RequestError as e:
+            self.command_errors[self.ERROR_REQUEST].inc()
             self.command_error_event.send()
             self.command_error_event.render()
             self.logger.error(u'STT provider service seems to be unreachable: %s' % str(e))
             return
 
+        except Exception:
+            #unexpected provider failure (malformed result, missing library...)
+            self.command_errors[self.ERROR_PROVIDER].inc()
+            self.command_error_event.send()
+            self.command_error_event.render()
+            self.logger.exception(u'Error during command recognition:')
+            return
+
         #check command
         if not command:
+            self.command_errors[self.ERROR_NO_COMMAND].inc()
             self.command_error_event.send()
             self.command_error_event.render()
             self.logger.debug(u'No command recognized')
             return
 
         #send command detected event
+        self.commands_recognized.inc()
         self.command_detected_event.send(params={
-            u'hotword': 'not implemented',
+            u'hotword': hotword,
             u'command': command
         })
+        timeline[LatencyTracker.MARK_EVENT] = time.time()
+        if self.latency_tracker:
+            self.latency_tracker.add_timeline(timeline)
 
-        #purge recorded file
-        if os.path.exists(recording):
-            try:
-                os.remove(recording)
-            except:
-                self.logger.exception('Unable to delete recording:')
-
-    def hotword_detected(self):
+    def hotword_detected(self, hotword):
         """
         Called when hotword is detected
+
+        Args:
+            hotword (string): detected hotword name
         """
-        self.logger.debug('-> hotword detected')
+        self.logger.debug('-> hotword "%s" detected' % hotword)
+        self.hotword = hotword
+        self.hotword_detections.inc()
 
         #send hotword detected event
         if self.test:
             #send hotword test only to rpc during tests
-            self.hotword_detected_event.send(to=u'rpc')
+            self.hotword_detected_event.send(to=u'rpc', params={u'hotword': hotword})
         else:
             self.hotword_detected_event.render()
-            self.hotword_detected_event.send()
+            self.hotword_detected_event.send(params={u'hotword': hotword})
+
+            #open provider connections while command is recorded
+            if self.prewarm:
+                self.provider.prewarm()
+
+            #start streaming command to STT provider (if supported)
+            self.stream = self.provider.open_stream(self.detector.sampleRate(), self.detector.sampleWidth())
 
     def run(self):
         """
@@ -233,44 +583,48 @@ class SpeechRecognitionProcess(Thread):
         """
         self.logger.debug(u'Speech recognition thread started')
 
+        for worker in self.workers:
+            worker.start()
+        if self.running:
+            self.state = self.STATE_RUNNING
+
+        errors = 0
         while self.running:
+            started = time.time()
             try:
                 #detect hotword
                 self.detector.start(
-                        detected_callback=self.hotword_detected, 
+                        detected_callback=self.callbacks,
                         interrupt_check=self.need_to_stop,
                         audio_recorder_callback=self.record_command,
-                        sleep_time=0.01
+                        recording_to_file=False,
+                        audio_chunk_callback=self.stream_command,
+                        preroll_time=self.preroll_time,
+                        trailing_silence=self.trailing_silence,
+                        max_utterance=self.max_utterance,
+                        error_callback=self.detection_errors.inc
                 )
             except KeyboardInterrupt:
                 self.logger.debug(u'Word detection stopped by user')
 
             except:
                 self.logger.exception(u'Exception during hotword detection:')
+                errors = errors + 1 if time.time()-started<self.DETECTION_ERRORS_WINDOW else 1
+                if errors>=self.MAX_DETECTION_ERRORS:
+                    self.logger.error(u'Hotword detection failed %d times in a row, speech recognition stops' % errors)
+                    break
+                #back off before restarting detection (stop wakes up waiting)
+                self.__stop_requested.wait(self.DETECTION_RETRY_DELAY * errors)
+
+            if self.running and self.detector.ring_buffer.ended:
+                self.logger.warning(u'Audio capture closed, speech recognition stops')
+                break
 
         #clean everything
-        try:
-            self.detector.terminate()
-        except:
-            self.logger.exception(u'Exception during hotword dectection deallocation')
+        self.__terminate()
 
         self.logger.debug(u'Speech recognition thread stopped')
 
-class RingBuffer(object):
-    """Ring buffer to hold audio from PortAudio"""
-    def __init__(self, size = 4096):
-        self._buf = collections.deque(maxlen=size)
-
-    def extend(self, data):
-        """Adds data to the end of buffer"""
-        self._buf.extend(data)
-
-    def get(self):
-        """Retrieves data from the beginning of buffer and clears it"""
-        tmp = bytes(bytearray(self._buf))
-        self._buf.clear()
-        return tmp
-
 class SpeechRecognitionProcessOld1(Thread):
     """
     Speech recognition process
@@ -473,9 +827,22 @@ class Speechrecognition(RaspIotResource):
         u'hotwordtoken': None,
         u'hotwordfiles': [None, None, None],
         u'hotwordmodel': None,
+        u'hotwordname': u'hotword',
+        u'hotwordmodels': [],
         u'providerid': None,
         u'providerapikeys': {},
-        u'serviceenabled': True
+        u'serviceenabled': True,
+        u'sttworkers': 1,
+        u'streamingurl': None,
+        u'offlinegrammar': None,
+        u'prewarmconnection': True,
+        u'prerolltime': 0.1,
+        u'trailingsilence': 0.7,
+        u'maxutterance': 10.0,
+        u'sensitivity': 0.4,
+        u'audiogain': 1.0,
+        u'overrunpolicy': POLICY_DROP_OLDEST,
+        u'maxlag': None
     }
 
     RESOURCES = {
@@ -483,11 +850,20 @@ class Speechrecognition(RaspIotResource):
     }
 
     PROVIDERS = [
-        {u'id':0, u'label':u'Microsoft Bing Speech', u'enabled':True},
-        {u'id':1, u'label':u'Google Cloud Speech', u'enabled':False},
+        {u'id':0, u'label':u'Microsoft Bing Speech', u'enabled':True, u'needapikey':True, u'class':BingSttProvider},
+        {u'id':1, u'label':u'Google Cloud Speech', u'enabled':False, u'needapikey':True, u'class':GoogleCloudSttProvider},
+        {u'id':2, u'label':u'Offline recognition (CMU Sphinx)', u'enabled':True, u'needapikey':False, u'class':SphinxSttProvider},
+        {u'id':3, u'label':u'Streaming STT server', u'enabled':True, u'needapikey':False, u'class':StreamingServerSttProvider},
     ]
 
     VOICE_MODEL_PATH = u'/opt/raspiot/speechrecognition'
+    VOICE_MODEL_CACHE_PATH = u'/opt/raspiot/speechrecognition/cache'
+    HOTWORD_RECORDING_PATH = u'/tmp'
+    HOTWORD_RECORDING_DURATION = 5.0
+    HOTWORD_TRAILING_SILENCE = 0.5
+    TASK_STOP_TIMEOUT = 5.0
+    #duration of audio buffered by audio capture
+    CAPTURE_BUFFER_TIME = 5.0
 
     def __init__(self, bootstrap, debug_enabled):
         """
@@ -501,10 +877,19 @@ class Speechrecognition(RaspIotResource):
         RaspIotResource.__init__(self, self.RESOURCES, bootstrap, debug_enabled)
 
         #members
-        self.sox = Sox()
         self.__training_task = None
         self.__speech_recognition_task = None
         self.__stop_task_after_test = False
+        self.__capture = None
+        #audio capture is acquired to record hotword only (no speech recognition task)
+        self.__recording = False
+        self.latency_tracker = LatencyTracker()
+        self.metrics = MetricsRegistry(u'speechrecognition')
+        #audio lost by stopped speech recognition tasks
+        self.__audio_loss = {u'overruns': 0, u'dropped': 0}
+        self.metrics.callback(u'audio_overruns_total', u'Times hotword detector fell behind audio capture', partial(self.__get_audio_loss, u'overruns'), type=u'counter')
+        self.metrics.callback(u'audio_dropped_bytes_total', u'Audio bytes lost by hotword detector', partial(self.__get_audio_loss, u'dropped'), type=u'counter')
+        self.metrics.callback(u'detection_lag_seconds', u'Duration of captured audio waiting for hotword detection', self.__get_detection_lag)
 
         #events
         self.training_ok_event = self._get_event('speechrecognition.training.ok')
@@ -544,6 +929,7 @@ class Speechrecognition(RaspIotResource):
                 u'id': provider[u'id'],
                 u'provider': provider[u'label'],
                 u'enabled': provider[u'enabled'],
+                u'needapikey': provider[u'needapikey'],
                 u'apikey': None
             }
 
@@ -560,12 +946,104 @@ class Speechrecognition(RaspIotResource):
             u'hotwordtoken': config[u'hotwordtoken'],
             u'hotwordrecordings': self.__get_hotword_recording_status(),
             u'hotwordmodel': config[u'hotwordmodel'] is not None,
+            u'hotwordmodels': [model[u'name'] for model in self.__get_voice_models()],
             u'serviceenabled': config[u'serviceenabled'],
+            u'streamingurl': config[u'streamingurl'],
+            u'offlinegrammar': config[u'offlinegrammar'],
+            u'sensitivity': config[u'sensitivity'],
+            u'audiogain': config[u'audiogain'],
+            u'overrunpolicy': config[u'overrunpolicy'],
+            u'maxlag': config[u'maxlag'],
             u'servicerunning': self.__speech_recognition_task is not None,
+            u'servicestate': self.__speech_recognition_task.get_state() if self.__speech_recognition_task else SpeechRecognitionProcess.STATE_STOPPED,
             u'testing': self.__speech_recognition_task is not None and self.__speech_recognition_task.is_test_enabled(),
             u'hotwordtraining': self.__training_task is not None
         }
 
+    def get_latency_stats(self):
+        """
+        Return latency distribution of each command processing stage (over last commands):
+         - detection: audio captured -> hotword detected
+         - endpointing: end of speech -> end of command detected
+         - audio: end of command detected -> recorded audio ready
+         - queue: recorded audio ready -> request sent to STT provider
+         - stt: request sent to STT provider -> response received
+         - event: response received -> command event sent
+         - total: end of speech -> command event sent
+
+        Return:
+            dict: stats per stage::
+                {
+                    stage (string): {
+                        count (int), window (int),
+                        mean (float), p50 (float), p95 (float), p99 (float), max (float): in seconds
+                    },
+                    ...
+                }
+        """
+        return self.latency_tracker.get_stats()
+
+    def get_metrics(self):
+        """
+        Return runtime counters (since module started)
+
+        Return:
+            dict: counters values by name (labelled counters are named name{label="value"})::
+                {
+                    hotword_detections_total (int): hotword detections,
+                    detection_errors_total (int): audio frames hotword detector failed to process,
+                    stt_requests_total (int): commands sent to STT provider,
+                    commands_recognized_total (int): commands recognized,
+                    command_errors_total{cause="..."} (int): command errors by cause (no_audio, queue_full,
+                                                             unknown_value, request_error, no_command,
+                                                             provider_error),
+                    audio_overruns_total (int): times hotword detector fell behind audio capture,
+                    audio_dropped_bytes_total (int): audio bytes lost by hotword detector,
+                    detection_lag_seconds (float): how far hotword detection is behind real time (None if speech
+                                                   recognition is not running)
+                }
+        """
+        return self.metrics.get_values()
+
+    def get_prometheus_metrics(self):
+        """
+        Return runtime counters in Prometheus text format (names prefixed by speechrecognition_)
+
+        Return:
+            string: metrics dump
+        """
+        return self.metrics.to_prometheus()
+
+    def __get_audio_loss(self, field):
+        """
+        Return audio lost by hotword detector since module started
+
+        Args:
+            field (string): overruns or dropped
+
+        Return:
+            int: lost audio counter value
+        """
+        value = self.__audio_loss[field]
+        task = self.__speech_recognition_task
+        if task is not None:
+            value += getattr(task.detector.ring_buffer, field)
+
+        return value
+
+    def __get_detection_lag(self):
+        """
+        Return how far hotword detection is behind real time
+
+        Return:
+            float: lag in seconds (None if speech recognition is not running)
+        """
+        task = self.__speech_recognition_task
+        if task is None:
+            return None
+
+        return task.get_lag()
+
     def __start_speech_recognition_task(self, test=False):
         """
         Start spech recognition task if everything is configured
@@ -586,51 +1064,93 @@ class Speechrecognition(RaspIotResource):
         if self.__speech_recognition_task is not None:
             self.logger.debug(u'Unable to start speech recognition: process is already running')
             return False
-        if config[u'hotwordmodel'] is None or not os.path.exists(config[u'hotwordmodel']):
+        voice_models = self.__get_voice_models()
+        if len(voice_models)==0:
             self.logger.debug(u'Unable to start speech recognition: invalid voice model')
             return False
-        if config[u'providerid'] is None:
+        provider = self.__get_provider()
+        if provider is None:
             self.logger.debug(u'Unable to start speech recognition: STT provider is not configured')
             return False
 
         #start speech recognition
-        #TODO handle audio gain and sensitivity
-        provider_token = config[u'providerapikeys'][str(config[u'providerid'])]
-        self.logger.debug(u'provider_token=%s' % provider_token)
-        self.logger.debug(u'apikeys:%s providerid:%s' % (config[u'providerapikeys'], config[u'providerid']))
-        self.__speech_recognition_task = SpeechRecognitionProcess(self.logger, config[u'hotwordmodel'], self.events, provider_token)
+        self.logger.debug(u'Using STT provider %s' % provider.__class__.__name__)
+        if self.__capture is None:
+            self.logger.debug(u'Unable to start speech recognition: audio capture is not opened')
+            return False
+        self.__speech_recognition_task = SpeechRecognitionProcess(
+            self.logger,
+            self.__capture,
+            voice_models,
+            self.events,
+            provider,
+            sensitivity=config[u'sensitivity'],
+            audio_gain=config[u'audiogain'],
+            stt_workers=config[u'sttworkers'],
+            prewarm=config[u'prewarmconnection'],
+            preroll_time=config[u'prerolltime'],
+            trailing_silence=config[u'trailingsilence'],
+            max_utterance=config[u'maxutterance'],
+            latency_tracker=self.latency_tracker,
+            metrics=self.metrics,
+            overrun_policy=config[u'overrunpolicy'],
+            max_lag=config[u'maxlag']
+        )
         if test:
             #enable test mode
-            self.__speech_recognition_task.enable_test(self.hotwordDetectedEvent)
+            self.__speech_recognition_task.enable_test()
         self.__speech_recognition_task.start()
 
         return True
 
     def __stop_speech_recognition_task(self):
         """
-        Stop speech recognition task
+        Stop speech recognition task and wait until it stops reading audio capture
 
         Return:
             bool: True if speech recognition was running
         """
         if self.__speech_recognition_task is not None:
-            self.__speech_recognition_task.stop()
+            task = self.__speech_recognition_task
             self.__speech_recognition_task = None
+            if not task.stop(self.TASK_STOP_TIMEOUT):
+                self.logger.warning(u'Speech recognition task is still %s after %s seconds' % (task.get_state(), self.TASK_STOP_TIMEOUT))
+            for field in self.__audio_loss.keys():
+                self.__audio_loss[field] += getattr(task.detector.ring_buffer, field)
 
             return True
 
         return False
 
-    def __restart_speech_recognition_task(self):
+    def __update_voice_models(self):
         """
-        Restart speech recognition task (doesn't start if it wasn't started)
+        Load current voice models in running speech recognition task, without stopping it (doesn't start if it
+        wasn't started)
         """
-        if self.__speech_recognition_task is not None:
-            #stop task
+        if self.__speech_recognition_task is None:
+            return
+
+        voice_models = self.__get_voice_models()
+        if len(voice_models)==0:
+            #nothing to detect anymore
             self.__stop_speech_recognition_task()
-            #start task differing startup to make sure audio resource is free
-            t = Timer(10.0, self.__start_speech_recognition_task)
-            t.start()
+        else:
+            self.__speech_recognition_task.swap_models(voice_models)
+
+    def __update_provider(self):
+        """
+        Use configured STT provider in running speech recognition task, without stopping it (doesn't start if it
+        wasn't started)
+        """
+        if self.__speech_recognition_task is None:
+            return
+
+        provider = self.__get_provider()
+        if provider is None:
+            #no more valid provider
+            self.__stop_speech_recognition_task()
+        else:
+            self.__speech_recognition_task.set_provider(provider)
 
     def __get_hotword_recording_status(self):
         """
@@ -651,6 +1171,142 @@ class Speechrecognition(RaspIotResource):
 
         return (record1, record2, record3)
 
+    def __get_voice_models(self):
+        """
+        Return voice models to detect: personal voice model (if trained) and additional models
+
+        Return:
+            list: list of existing voice models::
+                [
+                    {
+                        name (string): hotword name
+                        path (string): voice model path
+                    },
+                    ...
+                ]
+        """
+        config = self._get_config()
+        models = []
+        if config[u'hotwordmodel'] is not None and os.path.exists(config[u'hotwordmodel']):
+            models.append({u'name': config[u'hotwordname'], u'path': config[u'hotwordmodel']})
+        for model in config[u'hotwordmodels']:
+            if os.path.exists(model[u'path']):
+                models.append({u'name': model[u'name'], u'path': model[u'path']})
+
+        return models
+
+    def add_hotword_model(self, name, path):
+        """
+        Add voice model to detect in addition to personal voice model
+
+        Args:
+            name (string): hotword name (sent in events)
+            path (string): voice model path (pmdl or umdl file with one hotword)
+
+        Return:
+            bool: True if model added
+        """
+        #check params
+        if name is None or len(name.strip())==0:
+            raise MissingParameter(u'Parameter name is missing')
+        if path is None or len(path.strip())==0:
+            raise MissingParameter(u'Parameter path is missing')
+        if not os.path.exists(path):
+            raise InvalidParameter(u'Voice model "%s" does not exist' % path)
+        if os.path.splitext(path)[1] not in (u'.pmdl', u'.umdl'):
+            raise InvalidParameter(u'Parameter path is invalid: pmdl or umdl file is expected')
+        hotwords = self.__get_hotwords_count(path)
+        if hotwords!=1:
+            raise InvalidParameter(u'Voice model "%s" contains %d hotwords while one is expected' % (path, hotwords))
+        if name in [model[u'name'] for model in self.__get_voice_models()]:
+            raise InvalidParameter(u'Hotword "%s" already exists' % name)
+
+        #save config
+        models = self._get_config_field(u'hotwordmodels')
+        models.append({u'name': name, u'path': path})
+        if not self._set_config_field(u'hotwordmodels', models):
+            return False
+
+        #update running speech recognition task
+        self.__update_voice_models()
+
+        return True
+
+    def __get_hotwords_count(self, path):
+        """
+        Return number of hotwords in voice model (one detection callback is built per model, so models with several
+        hotwords are not supported)
+
+        Args:
+            path (string): voice model path
+
+        Return:
+            int: number of hotwords
+        """
+        try:
+            detector = snowboydetect.SnowboyDetect(resource_filename=snowboydecoder.RESOURCE_FILE.encode(), model_str=path.encode())
+            return detector.NumHotwords()
+        except:
+            self.logger.exception(u'Unable to load voice model "%s":' % path)
+            raise InvalidParameter(u'Voice model "%s" is invalid' % path)
+
+    def remove_hotword_model(self, name):
+        """
+        Remove voice model added with add_hotword_model
+
+        Args:
+            name (string): hotword name
+
+        Return:
+            bool: True if model removed
+        """
+        #check params
+        models = self._get_config_field(u'hotwordmodels')
+        found = [model for model in models if model[u'name']==name]
+        if len(found)==0:
+            raise InvalidParameter(u'Hotword "%s" does not exist' % name)
+
+        #save config
+        models.remove(found[0])
+        if not self._set_config_field(u'hotwordmodels', models):
+            return False
+
+        #update running speech recognition task
+        self.__update_voice_models()
+
+        return True
+
+    def __get_provider(self):
+        """
+        Build configured STT provider
+
+        Return:
+            SttProvider: provider instance or None if provider is not configured
+        """
+        config = self._get_config()
+        if config[u'providerid'] is None:
+            return None
+
+        for provider in self.PROVIDERS:
+            if str(provider[u'id'])!=config[u'providerid'] or not provider[u'enabled']:
+                continue
+
+            if provider[u'class'] is StreamingServerSttProvider:
+                #streaming server url is used as apikey
+                if not config[u'streamingurl']:
+                    return None
+                return StreamingServerSttProvider(config[u'streamingurl'])
+
+            if provider[u'class'] is SphinxSttProvider:
+                return SphinxSttProvider(grammar=config[u'offlinegrammar'])
+
+            apikey = config[u'providerapikeys'].get(config[u'providerid'])
+            if not apikey:
+                return None
+            return provider[u'class'](apikey)
+
+        return None
+
     def __check_provider(self, provider_id):
         """
         Check if provider is valid
@@ -659,32 +1315,33 @@ class Speechrecognition(RaspIotResource):
             provider_id (int): provider id
 
         Return:
-            bool: True if provider is valid
+            dict: provider entry or None if provider is not valid
         """
         for provider in self.PROVIDERS:
             if provider[u'id']==provider_id and provider[u'enabled']:
                 #provider is valid
-                return True
+                return provider
 
         #provider was not found or is not enabled
-        return False
+        return None
 
-    def set_provider(self, provider_id, apikey):
+    def set_provider(self, provider_id, apikey=None):
         """
         Set speechtotext provider
 
         Args:
             provider_id (int): provider id
-            apikey (string): provider apikey
+            apikey (string): provider apikey (unused by providers that don't need it)
 
         Return:
             bool: True if action succeed
         """
         if provider_id is None:
             raise MissingParameter(u'Parameter provider is missing')
-        if not self.__check_provider(provider_id):
+        provider = self.__check_provider(provider_id)
+        if not provider:
             raise InvalidParameter(u'Specified provider is not valid. Please check list of supported provider.')
-        if apikey is None or len(apikey.strip())==0:
+        if provider[u'needapikey'] and (apikey is None or len(apikey.strip())==0):
             raise MissingParameter(u'Parameter apikey is missing')
 
         #save config
@@ -700,8 +1357,141 @@ class Speechrecognition(RaspIotResource):
         if not self._update_config(config):
             return False
 
-        #restart speech recognition task
-        self.__restart_speech_recognition_task()
+        #update running speech recognition task
+        self.__update_provider()
+
+        return True
+
+    def set_streaming_server(self, url):
+        """
+        Set streaming STT server url used by streaming server provider. Commands are streamed to this server while
+        they are recorded
+
+        Args:
+            url (string): streaming server url (chunked http)
+
+        Return:
+            bool: True if action succeed
+        """
+        if url is not None and len(url.strip())==0:
+            url = None
+        if url is not None and not url.startswith(u'http://') and not url.startswith(u'https://'):
+            raise InvalidParameter(u'Parameter url is invalid: http and https are supported only')
+
+        #save config
+        if not self._set_config_field(u'streamingurl', url):
+            return False
+
+        #update running speech recognition task
+        self.__update_provider()
+
+        return True
+
+    def set_offline_grammar(self, grammar):
+        """
+        Set grammar constraining offline recognition (CMU Sphinx) to a limited set of commands, which makes it
+        faster and far more accurate
+
+        Args:
+            grammar (string): JSGF (gram, jsgf) or FSG grammar file path. None to recognize any sentence
+
+        Return:
+            bool: True if action succeed
+        """
+        if grammar is not None and len(grammar.strip())==0:
+            grammar = None
+        if grammar is not None and not SphinxSttProvider.is_grammar_valid(grammar):
+            raise InvalidParameter(u'Parameter grammar is invalid: existing JSGF or FSG grammar file is expected')
+
+        #save config
+        if not self._set_config_field(u'offlinegrammar', grammar):
+            return False
+
+        #update running speech recognition task
+        self.__update_provider()
+
+        return True
+
+    def set_sensitivity(self, sensitivity):
+        """
+        Set hotword detection sensitivity. Change is applied live on running detection
+
+        Args:
+            sensitivity (float): sensitivity (0..1). Great value make detector more sensitive to false positive
+
+        Return:
+            bool: True if action succeed
+        """
+        if sensitivity is None:
+            raise MissingParameter(u'Parameter sensitivity is missing')
+        if not isinstance(sensitivity, (int, float)) or sensitivity<0.0 or sensitivity>1.0:
+            raise InvalidParameter(u'Parameter sensitivity is invalid: must be 0..1')
+
+        #save config
+        if not self._set_config_field(u'sensitivity', sensitivity):
+            return False
+
+        #update running detection
+        if self.__speech_recognition_task is not None:
+            self.__speech_recognition_task.set_sensitivity(sensitivity)
+
+        return True
+
+    def set_audio_gain(self, audio_gain):
+        """
+        Set audio gain of hotword detection. Change is applied live on running detection
+
+        Args:
+            audio_gain (float): decrease volume (<1) or boost volume (>1)
+
+        Return:
+            bool: True if action succeed
+        """
+        if audio_gain is None:
+            raise MissingParameter(u'Parameter audio_gain is missing')
+        if not isinstance(audio_gain, (int, float)) or audio_gain<=0.0 or audio_gain>10.0:
+            raise InvalidParameter(u'Parameter audio_gain is invalid: must be 0..10')
+
+        #save config
+        if not self._set_config_field(u'audiogain', audio_gain):
+            return False
+
+        #update running detection
+        if self.__speech_recognition_task is not None:
+            self.__speech_recognition_task.set_audio_gain(audio_gain)
+
+        return True
+
+    def set_overrun_policy(self, policy, max_lag=None):
+        """
+        Set what happens when hotword detection falls behind audio capture (device too slow). Change is applied
+        live on running detection
+
+        Args:
+            policy (string): overrun policy:
+                - drop_oldest: oldest audio waiting for detection is lost
+                - drop_newest: captured audio is lost until detection processed audio waiting for it
+                - catch_up: audio waiting for detection is skipped, detection goes on with fresh audio
+            max_lag (float): max duration (in seconds) of audio waiting for detection before policy is applied
+                             (None for whole audio capture buffer)
+
+        Return:
+            bool: True if action succeed
+        """
+        if policy is None:
+            raise MissingParameter(u'Parameter policy is missing')
+        if policy not in POLICIES:
+            raise InvalidParameter(u'Parameter policy is invalid: must be one of %s' % u', '.join(POLICIES))
+        if max_lag is not None and (not isinstance(max_lag, (int, float)) or max_lag<=0.0 or max_lag>self.CAPTURE_BUFFER_TIME):
+            raise InvalidParameter(u'Parameter max_lag is invalid: must be 0..%s' % self.CAPTURE_BUFFER_TIME)
+
+        #save config
+        if not self._update_config({u'overrunpolicy': policy, u'maxlag': max_lag}):
+            return False
+
+        #update running detection
+        if self.__speech_recognition_task is not None:
+            self.__speech_recognition_task.set_overrun_policy(policy, max_lag)
 
         return True
 
@@ -738,7 +1528,7 @@ class Speechrecognition(RaspIotResource):
         config = self._get_config()
 
         #launch model training
-        self.__training_task = BuildPersonalVoiceModelTask(config[u'hotwordtoken'], config[u'hotwordfiles'], self.__end_of_training, self.logger)
+        self.__training_task = BuildPersonalVoiceModelTask(self.cleep_filesystem, config[u'hotwordtoken'], config[u'hotwordfiles'], self.__end_of_training, self.logger, cache_path=self.VOICE_MODEL_CACHE_PATH)
         self.__training_task.start()
 
     def __end_of_training(self, error, voice_model_path):
@@ -761,7 +1551,7 @@ class Speechrecognition(RaspIotResource):
         #finalize training
         try:
             #get hotwords config
-            hotwords_files = self._get_config_field(u'hotwordsfiles')
+            hotwords_files = self._get_config_field(u'hotwordfiles')
 
             #move files
             model = os.path.join(self.VOICE_MODEL_PATH, 'voice_model.pmdl')
@@ -778,12 +1568,15 @@ class Speechrecognition(RaspIotResource):
             hotwords_files[1] = record2
             hotwords_files[2] = record3
             config = {
-                u'hotwordsfiles': hotwords_files,
+                u'hotwordfiles': hotwords_files,
                 u'hotwordmodel': model
             }
             if not self._update_config(config):
                 raise Exception(u'Unable to update config')
 
+            #load new model in running speech recognition task
+            self.__update_voice_models()
+
             #send event to ui model is generated
             self.training_ok_event.send(to=u'rpc')
 
@@ -806,30 +1599,35 @@ class Speechrecognition(RaspIotResource):
         if self.__training_task is not None:
             raise CommandError(u'This action is disabled during voice model building')
 
-        #stop speech recognition thread if running
-        in_use = self.__stop_speech_recognition_task()
-
-        #record sound
-        if not in_use:
-            #claim for resource
-            self.acquire_resource(u'audio.capture')
-        record = self.sox.record_sound(Sox.CHANNELS_STEREO, Sox.RATE_16K, timeout=5.0)
+        #record sound from shared audio capture (speech recognition keeps running)
+        in_use = self.__capture is not None
         if not in_use:
-            #release resource
-            self.release_resource(u'audio.capture')
+            #claim for resource (audio capture only, there may be no voice model yet)
+            self.__recording = True
+            try:
+                if not self.acquire_resource(u'audio.capture') or self.__capture is None:
+                    raise CommandError(u'Audio capture is not available')
+            finally:
+                self.__recording = False
+        try:
+            record = self.__record_hotword_sample()
+        finally:
+            if not in_use:
+                #release resource
+                self.release_resource(u'audio.capture')
 
         #save recording
         record1, record2, record3 = self.__get_hotword_recording_status()
         train = False
-        hotwords_files = self._get_config_field(u'hotwordsfiles')
+        hotwords_files = self._get_config_field(u'hotwordfiles')
         if not record1:
-            hotword_files[0] = record
+            hotwords_files[0] = record
         elif not record2:
-            hotword_files[1] = record
+            hotwords_files[1] = record
         elif not record3:
-            hotword_files[2] = record
+            hotwords_files[2] = record
             train = True
-        self._set_config_field(u'hotwordsfiles', hotwords_files)
+        self._set_config_field(u'hotwordfiles', hotwords_files)
 
         #train if all recordings are ready
         if train:
@@ -838,6 +1636,39 @@ class Speechrecognition(RaspIotResource):
 
         return self.__get_hotword_recording_status()
 
+    def __record_hotword_sample(self):
+        """
+        Record hotword sample from shared audio capture. Recording waits for user to speak and stops as soon as
+        hotword is spoken (energy endpointing)
+
+        Return:
+            string: path of recorded wav file
+        """
+        capture = self.__capture
+        endpointer = Endpointer(
+            capture.rate,
+            channels=capture.channels,
+            trailing_silence=self.HOTWORD_TRAILING_SILENCE,
+            max_utterance=self.HOTWORD_RECORDING_DURATION,
+            wait_speech=True
+        )
+        data = capture.record(self.HOTWORD_RECORDING_DURATION, u'hotwordrecorder', endpointer)
+        if len(data)==0 or not endpointer.has_speech():
+            raise CommandError(u'No voice recorded')
+
+        path = os.path.join(self.HOTWORD_RECORDING_PATH, u'%s.wav' % str(uuid.uuid4()))
+        wav = wave.open(path, 'wb')
+        try:
+            wav.setnchannels(capture.channels)
+            wav.setsampwidth(capture.sample_width)
+            wav.setframerate(capture.rate)
+            wav.writeframes(data)
+        finally:
+            wav.close()
+        self.logger.debug(u'Hotword sample recorded in %s' % path)
+
+        return path
+
     def build_hotword(self):
         """
         Launch hotword model training manually
@@ -892,7 +1723,7 @@ class Speechrecognition(RaspIotResource):
         """
         if not self.__speech_recognition_task:
             #speechrecognition task is not running, start it
-            if not self.acquire_resource(u'audio.capture'):
+            if not self.acquire_resource(u'audio.capture') or not self.__speech_recognition_task:
                 raise CommandError(u'Unable to start test')
             self.__stop_task_after_test = True
 
@@ -949,9 +1780,9 @@ class Speechrecognition(RaspIotResource):
         Return:
             bool: True if resource released
         """
+        #stop returns when task doesn't read audio capture anymore
         self.__stop_speech_recognition_task()
-        #wait few time to make sure resource is released
-        time.sleep(1.0)
+        self.__close_capture()
 
         return True
 
@@ -966,7 +1797,52 @@ class Speechrecognition(RaspIotResource):
         Return:
             bool: True if resource acquired
         """
-        return self.__start_speech_recognition_task()
+        if not self.__open_capture():
+            return False
+        if self.__recording or self.__speech_recognition_task is not None:
+            #hotword recording only needs audio capture, running task already reads it
+            return True
+        if not self.__start_speech_recognition_task():
+            #nothing would read audio capture
+            self.__close_capture()
+            return False
+
+        return True
+
+    def __open_capture(self):
+        """
+        Open shared audio capture (only audio stream opened by module)
+
+        Return:
+            bool: True if audio capture is opened
+        """
+        if self.__capture is not None:
+            return True
+
+        try:
+            self.__capture = AudioCapture(
+                rate=snowboydecoder.DETECT_RATE,
+                channels=snowboydecoder.DETECT_CHANNELS,
+                sample_width=snowboydecoder.DETECT_SAMPLE_WIDTH,
+                frames_per_buffer=snowboydecoder.FRAMES_PER_BUFFER,
+                buffer_time=self.CAPTURE_BUFFER_TIME
+            )
+            return True
+        except:
+            self.logger.exception(u'Unable to open audio capture:')
+            return False
+
+    def __close_capture(self):
+        """
+        Close shared audio capture
+        """
+        if self.__capture is not None:
+            capture = self.__capture
+            self.__capture = None
+            try:
+                capture.close()
+            except:
+                self.logger.exception(u'Error closing audio capture:')
 
 
 
@@ -10,7 +10,7 @@ class Speechrecognitionhotworddetected(Event):
 
     EVENT_NAME = u'speechrecognition.hotword.detected'
     EVENT_SYSTEM = False
-    EVENT_PARAMS = []
+    EVENT_PARAMS = [u'hotword']
 
     def __init__(self, bus, formatters_broker, events_broker):
         """
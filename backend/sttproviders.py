@@ -0,0 +1,509 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+import json
+import time
+import uuid
+import httplib
+import urlparse
+import BaseHTTPServer
+import SocketServer
+from threading import Thread
+from Queue import Queue
+import speech_recognition as speechrecognition
+from raspiot.libs.externals.httpsession import get_session, prewarm
+
+
+class SttStream(object):
+    """
+    Streaming speech to text session: audio chunks are sent to STT backend while user is still speaking, so
+    final transcript is available as soon as end of command is detected
+    """
+
+    def feed(self, data):
+        """
+        Send audio chunk to STT backend. Must not block caller (audio detection thread)
+
+        Args:
+            data (bytes): raw PCM chunk
+        """
+        raise NotImplementedError(u'Method "feed" must be implemented')
+
+    def finish(self):
+        """
+        End of audio: wait for final transcript
+
+        Return:
+            string: transcript
+
+        Raises:
+            UnknownValueError: if audio is not understood
+            RequestError: if STT backend is unreachable
+        """
+        raise NotImplementedError(u'Method "finish" must be implemented')
+
+    def cancel(self):
+        """
+        Drop stream: transcript is not needed anymore
+        """
+        pass
+
+
+class ChunkedHttpSttStream(SttStream):
+    """
+    Streams audio to a STT server using a chunked HTTP POST request.
+
+    Request body is raw PCM (audio/l16) and server must respond a json object with a "transcript" field.
+    Chunks are sent by an internal thread so feeding stream never blocks on network.
+    """
+
+    def __init__(self, url, sample_rate=16000, sample_width=2, timeout=10.0):
+        """
+        Constructor
+
+        Args:
+            url (string): STT server url (http or https)
+            sample_rate (int): audio sample rate
+            sample_width (int): audio sample width in bytes
+            timeout (float): network timeout in seconds
+        """
+        #members
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.url = urlparse.urlparse(url)
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.timeout = timeout
+        self.__chunks = Queue()
+        self.__transcript = None
+        self.__error = None
+        self.__sender = Thread(target=self.__send)
+        self.__sender.daemon = True
+        self.__sender.start()
+
+    def __send(self):
+        """
+        Open connection and send queued chunks until end of audio, then read response
+        """
+        conn = None
+        try:
+            if self.url.scheme==u'https':
+                conn = httplib.HTTPSConnection(self.url.netloc, timeout=self.timeout)
+            else:
+                conn = httplib.HTTPConnection(self.url.netloc, timeout=self.timeout)
+            conn.putrequest('POST', self.url.path or '/')
+            conn.putheader('Transfer-Encoding', 'chunked')
+            conn.putheader('Content-Type', 'audio/l16; rate=%d; channels=1' % self.sample_rate)
+            conn.endheaders()
+
+            while True:
+                chunk = self.__chunks.get()
+                if chunk is None:
+                    #end of audio
+                    conn.send(b'0\r\n\r\n')
+                    break
+                conn.send(b'%X\r\n%s\r\n' % (len(chunk), chunk))
+
+            resp = conn.getresponse()
+            content = resp.read()
+            if resp.status!=200:
+                raise Exception(u'Server returned status %s: %s' % (resp.status, content))
+            self.__transcript = json.loads(content).get(u'transcript')
+
+        except Exception as e:
+            self.logger.exception(u'Error streaming audio to %s:' % self.url.geturl())
+            self.__error = e
+
+        finally:
+            if conn:
+                conn.close()
+
+    def feed(self, data):
+        """
+        Send audio chunk to STT server
+
+        Args:
+            data (bytes): raw PCM chunk
+        """
+        if len(data)>0:
+            self.__chunks.put(data)
+
+    def finish(self):
+        """
+        End of audio: wait for final transcript
+
+        Return:
+            string: transcript
+
+        Raises:
+            UnknownValueError: if audio is not understood
+            RequestError: if STT server is unreachable
+        """
+        self.__chunks.put(None)
+        self.__sender.join(self.timeout)
+
+        if self.__sender.is_alive():
+            raise speechrecognition.RequestError(u'STT server timed out')
+        if self.__error is not None:
+            raise speechrecognition.RequestError(u'STT server error: %s' % str(self.__error))
+        if not self.__transcript:
+            raise speechrecognition.UnknownValueError()
+
+        return self.__transcript
+
+    def cancel(self):
+        """
+        Drop stream: end request without waiting for transcript
+        """
+        self.__chunks.put(None)
+
+
+class SttProvider(object):
+    """
+    Speech to text provider. Subclasses implement _recognize and open_stream if provider supports streaming
+    """
+
+    def __init__(self, apikey=None, language=u'fr-FR'):
+        """
+        Constructor
+
+        Args:
+            apikey (string): provider api key (if needed)
+            language (string): command language
+        """
+        #members
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.apikey = apikey
+        self.language = language
+        self.recognizer = speechrecognition.Recognizer()
+
+    def _recognize(self, audio):
+        """
+        Recognize audio
+
+        Args:
+            audio (AudioData): audio to recognize
+
+        Return:
+            string: transcript
+
+        Raises:
+            UnknownValueError: if audio is not understood
+            RequestError: if provider is unreachable
+        """
+        raise NotImplementedError(u'Method "_recognize" must be implemented')
+
+    def open_stream(self, sample_rate, sample_width):
+        """
+        Open streaming session
+
+        Args:
+            sample_rate (int): audio sample rate
+            sample_width (int): audio sample width in bytes
+
+        Return:
+            SttStream: stream instance or None if provider doesn't support streaming
+        """
+        return None
+
+    def prewarm(self):
+        """
+        Open connections to provider in background, so they are ready when recorded command is sent
+        """
+        pass
+
+    def recognize(self, audio, stream=None):
+        """
+        Recognize audio and measure call duration
+
+        Args:
+            audio (AudioData): audio to recognize
+            stream (SttStream): stream audio was sent to while recorded. If specified, transcript is read from it
+
+        Return:
+            dict: recognition result::
+                {
+                    command (string): transcript
+                    duration (float): call duration in seconds
+                }
+
+        Raises:
+            UnknownValueError: if audio is not understood
+            RequestError: if provider is unreachable
+        """
+        start = time.time()
+        if stream:
+            command = stream.finish()
+        else:
+            command = self._recognize(audio)
+
+        return {
+            u'command': command,
+            u'duration': time.time() - start
+        }
+
+
+class BingSttProvider(SttProvider):
+    """
+    Microsoft Bing Speech provider
+
+    Note:
+        Same REST api as speech_recognition recognize_bing, but requests are sent through pooled http session
+        so connections are kept alive (and can be prewarmed) between commands
+    """
+
+    TOKEN_URL = u'https://api.cognitive.microsoft.com/sts/v1.0/issueToken'
+    RECOGNITION_URL = u'https://speech.platform.bing.com/speech/recognition/interactive/cognitiveservices/v1'
+    #token is valid 10 minutes
+    TOKEN_DURATION = 540.0
+    TIMEOUT = 10.0
+
+    def __init__(self, apikey=None, language=u'fr-FR'):
+        """
+        Constructor
+
+        Args:
+            apikey (string): Bing speech api key
+            language (string): command language
+        """
+        SttProvider.__init__(self, apikey, language)
+
+        #members
+        self.__token = None
+        self.__token_expiration = 0.0
+
+    def __get_token(self):
+        """
+        Return access token, requesting new one if necessary
+
+        Return:
+            string: access token
+        """
+        if self.__token is None or time.time()>self.__token_expiration:
+            try:
+                resp = get_session().post(self.TOKEN_URL, headers={u'Ocp-Apim-Subscription-Key': self.apikey}, timeout=self.TIMEOUT)
+                resp.raise_for_status()
+            except Exception as e:
+                raise speechrecognition.RequestError(u'Unable to get access token: %s' % str(e))
+            self.__token = resp.text
+            self.__token_expiration = time.time() + self.TOKEN_DURATION
+
+        return self.__token
+
+    def prewarm(self):
+        if self.__token is None or time.time()>self.__token_expiration:
+            prewarm(self.TOKEN_URL)
+        prewarm(self.RECOGNITION_URL)
+
+    def _recognize(self, audio):
+        params = {
+            u'language': self.language,
+            u'locale': self.language,
+            u'requestid': str(uuid.uuid4())
+        }
+        headers = {
+            u'Authorization': u'Bearer %s' % self.__get_token(),
+            u'Content-Type': u'audio/wav; codec="audio/pcm"; samplerate=16000'
+        }
+        try:
+            data = audio.get_wav_data(convert_rate=16000, convert_width=2)
+            resp = get_session().post(self.RECOGNITION_URL, params=params, headers=headers, data=data, timeout=self.TIMEOUT)
+            resp.raise_for_status()
+            result = resp.json()
+        except Exception as e:
+            raise speechrecognition.RequestError(u'Recognition request failed: %s' % str(e))
+
+        if result.get(u'RecognitionStatus')!=u'Success' or u'DisplayText' not in result:
+            raise speechrecognition.UnknownValueError()
+
+        return result[u'DisplayText']
+
+
+class GoogleCloudSttProvider(SttProvider):
+    """
+    Google Cloud Speech provider (apikey is the json credentials content)
+    """
+
+    def _recognize(self, audio):
+        return self.recognizer.recognize_google_cloud(audio, credentials_json=self.apikey, language=self.language)
+
+
+class SphinxSttProvider(SttProvider):
+    """
+    Offline CMU Sphinx provider: recognition is performed on device, no network access is needed.
+
+    Note:
+        Pocketsphinx must be installed as well as speech_recognition language pack for configured language.
+        Recognition can be constrained to a JSGF grammar (or keywords list) which makes it faster and far more
+        accurate for a limited set of commands.
+    """
+
+    GRAMMAR_EXTENSIONS = (u'.gram', u'.jsgf', u'.fsg')
+
+    def __init__(self, apikey=None, language=u'fr-FR', grammar=None, keywords=None):
+        """
+        Constructor
+
+        Args:
+            apikey (string): unused
+            language (string): command language
+            grammar (string): path to JSGF grammar file
+            keywords (list): list of (keyword (string), sensitivity (float)) tuples to look for
+        """
+        SttProvider.__init__(self, apikey, language)
+
+        #members
+        self.grammar = grammar
+        self.keywords = keywords
+
+    @staticmethod
+    def is_grammar_valid(path):
+        """
+        Check grammar file
+
+        Args:
+            path (string): grammar file path
+
+        Return:
+            bool: True if path is an existing JSGF or FSG grammar file
+        """
+        return os.path.isfile(path) and os.path.splitext(path)[1].lower() in SphinxSttProvider.GRAMMAR_EXTENSIONS
+
+    def _recognize(self, audio):
+        return self.recognizer.recognize_sphinx(audio, language=self.language, keyword_entries=self.keywords, grammar=self.grammar)
+
+
+class StreamingServerSttProvider(SttProvider):
+    """
+    Streaming STT server provider (see ChunkedHttpSttStream). Apikey is the server url
+    """
+
+    def _recognize(self, audio):
+        stream = self.open_stream(audio.sample_rate, audio.sample_width)
+        stream.feed(audio.get_raw_data())
+        return stream.finish()
+
+    def open_stream(self, sample_rate, sample_width):
+        return ChunkedHttpSttStream(self.apikey, sample_rate, sample_width)
+
+
+class StandInSttServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """
+    Local stand-in STT server accepting chunked audio streams (see ChunkedHttpSttStream), to test and benchmark
+    streaming path without network access.
+
+    Transcript is computed by specified transcriber function, and processing latency of a real backend can be
+    simulated with delay.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address=(u'127.0.0.1', 0), transcriber=None, delay=0.0):
+        """
+        Constructor
+
+        Args:
+            address (tuple): server address (host, port). Use port 0 to get a free port
+            transcriber (callback): function returning transcript of received audio (params: data (bytes)). If None
+                                    transcript is the number of received bytes
+            delay (float): time to wait before responding (in seconds)
+        """
+        BaseHTTPServer.HTTPServer.__init__(self, address, StandInSttHandler)
+
+        #members
+        self.transcriber = transcriber or (lambda data: u'received %d bytes' % len(data))
+        self.delay = delay
+        self.requests = []
+
+    def get_url(self):
+        """
+        Return server url
+        """
+        return u'http://%s:%d/' % self.server_address
+
+    def start(self):
+        """
+        Serve requests in background thread
+        """
+        thread = Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def stop(self):
+        """
+        Stop server
+        """
+        self.shutdown()
+        self.server_close()
+
+
+class StandInSttHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    Stand-in STT server request handler
+    """
+
+    protocol_version = u'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        """
+        Disable default stderr logging
+        """
+        pass
+
+    def __read_body(self):
+        """
+        Read request body (chunked or not)
+
+        Return:
+            tuple: body and time of end of body reception
+        """
+        if self.headers.get(u'Transfer-Encoding', u'').lower()!=u'chunked':
+            return self.rfile.read(int(self.headers.get(u'Content-Length', 0))), time.time()
+
+        chunks = []
+        while True:
+            size = int(self.rfile.readline().split(b';')[0].strip(), 16)
+            if size==0:
+                #skip trailers
+                while self.rfile.readline().strip():
+                    pass
+                break
+            chunks.append(self.rfile.read(size))
+            self.rfile.readline()
+
+        return b''.join(chunks), time.time()
+
+    def do_POST(self):
+        """
+        Handle POST request
+        """
+        start = time.time()
+        data, end = self.__read_body()
+        if self.server.delay>0.0:
+            time.sleep(self.server.delay)
+        transcript = self.server.transcriber(data)
+        self.server.requests.append({
+            u'size': len(data),
+            u'duration': end - start
+        })
+
+        content = json.dumps({u'transcript': transcript})
+        self.send_response(200)
+        self.send_header(u'Content-Type', u'application/json')
+        self.send_header(u'Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+if __name__ == u'__main__':
+    import sys
+    logging.basicConfig(level=logging.INFO)
+    port = int(sys.argv[1]) if len(sys.argv)>1 else 8080
+    server = StandInSttServer((u'0.0.0.0', port))
+    logging.info(u'Stand-in STT server listening on %s' % server.get_url())
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Offline hotword detector benchmark
+
+Feeds hotword recordings (resources/snowboy1-3.wav by default) mixed with synthetic noise to snowboy detector at
+different chunk sizes, audio gains and sensitivities, and reports real-time factor, CPU time per chunk and
+detection latency (in samples from end of hotword speech).
+
+Must be run on target hardware (snowboy library is built for it), for example:
+    python benchmarks/detector_benchmark.py --chunk-sizes 512 1024 2048 --sensitivities 0.4 0.5 --noise-levels 0 300
+"""
+
+import os
+import sys
+import argparse
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, u'backend', u'snowboylib'))
+import benchmark
+
+DEFAULT_CLIPS = [os.path.join(ROOT_DIR, u'resources', u'snowboy%d.wav' % i) for i in range(1, 4)]
+
+
+def format_result(result):
+    """
+    Format benchmark result line
+
+    Args:
+        result (dict): benchmark result
+
+    Return:
+        string: formatted result
+    """
+    latency = u'-'
+    if result[u'latency_mean'] is not None:
+        latency = u'%d/%d' % (result[u'latency_mean'], result[u'latency_max'])
+    return u'%6d %5.2f %5.2f %6d | %6.3f %9.3f %9.3f %9.3f | %4d %4d %4d | %s' % (
+        result[u'chunk_size'],
+        result[u'audio_gain'],
+        result[u'sensitivity'],
+        result[u'noise_level'],
+        result[u'rtf'],
+        result[u'frame_cpu_mean'] * 1000.0,
+        result[u'frame_cpu_p95'] * 1000.0,
+        result[u'frame_cpu_max'] * 1000.0,
+        result[u'hits'],
+        result[u'misses'],
+        result[u'false_alarms'],
+        latency
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=u'Offline hotword detector benchmark')
+    parser.add_argument(u'--clips', nargs=u'+', default=DEFAULT_CLIPS, help=u'hotword wav files')
+    parser.add_argument(u'--model', default=benchmark.MODEL_FILE, help=u'voice model (pmdl or umdl)')
+    parser.add_argument(u'--resource', default=benchmark.RESOURCE_FILE, help=u'snowboy resource file')
+    parser.add_argument(u'--chunk-sizes', nargs=u'+', type=int, default=[512, 1024, 2048, 4096], help=u'chunk sizes (in samples)')
+    parser.add_argument(u'--audio-gains', nargs=u'+', type=float, default=[1.0], help=u'detector audio gains')
+    parser.add_argument(u'--sensitivities', nargs=u'+', type=float, default=[0.5], help=u'detector sensitivities')
+    parser.add_argument(u'--noise-levels', nargs=u'+', type=float, default=[0.0, 300.0], help=u'noise RMS levels')
+    parser.add_argument(u'--gap', type=float, default=2.0, help=u'seconds of audio around each clip')
+    args = parser.parse_args()
+
+    clips = [benchmark.load_wav(path) for path in args.clips]
+    results = benchmark.benchmark(
+        clips,
+        model=args.model,
+        resource=args.resource,
+        chunk_sizes=args.chunk_sizes,
+        audio_gains=args.audio_gains,
+        sensitivities=args.sensitivities,
+        noise_levels=args.noise_levels,
+        gap=args.gap
+    )
+
+    print(u' chunk  gain  sens  noise |    rtf  cpu mean   cpu p95   cpu max | hit miss   fa | latency mean/max')
+    print(u'                          |         (ms/chunk)                    |                | (samples)')
+    for result in results:
+        print(format_result(result))
+
+
+if __name__ == u'__main__':
+    main()
+
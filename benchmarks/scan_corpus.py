@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Offline corpus scanner
+
+Scans a directory of recorded audio (wav and flac files) for hotword occurrences using one snowboy detector per CPU
+core, and writes detections timestamps of each file to a json file, for example:
+    python benchmarks/scan_corpus.py /data/room-recordings --model voice_model.pmdl --output detections.json
+"""
+
+import os
+import sys
+import time
+import json
+import argparse
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, u'backend', u'snowboylib'))
+import corpus
+
+
+def print_result(result):
+    """
+    Print file result
+
+    Args:
+        result (dict): file result
+    """
+    if result[u'error']:
+        print(u'%s: ERROR %s' % (result[u'path'], result[u'error']))
+        return
+    times = u', '.join([u'%.2f' % detection[u'time'] for detection in result[u'detections']])
+    print(u'%s: %d detections in %.1fs of audio [%s]' % (result[u'path'], len(result[u'detections']), result[u'duration'], times))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=u'Scan audio corpus for hotword occurrences')
+    parser.add_argument(u'directory', help=u'corpus directory (wav and flac files, scanned recursively)')
+    parser.add_argument(u'--model', default=corpus.MODEL_FILE, help=u'voice model (pmdl or umdl)')
+    parser.add_argument(u'--resource', default=corpus.RESOURCE_FILE, help=u'snowboy resource file')
+    parser.add_argument(u'--sensitivity', type=float, default=0.5, help=u'detector sensitivity')
+    parser.add_argument(u'--audio-gain', type=float, default=1.0, help=u'detector audio gain')
+    parser.add_argument(u'--processes', type=int, default=None, help=u'number of processes (default one per core)')
+    parser.add_argument(u'--output', default=u'detections.json', help=u'output json file')
+    args = parser.parse_args()
+
+    paths = corpus.list_corpus(args.directory)
+    if len(paths)==0:
+        print(u'No audio file found in %s' % args.directory)
+        return 1
+
+    start = time.time()
+    results = corpus.scan_corpus(
+        paths,
+        model=args.model,
+        resource=args.resource,
+        sensitivity=args.sensitivity,
+        audio_gain=args.audio_gain,
+        processes=args.processes,
+        callback=print_result
+    )
+    elapsed = time.time() - start
+
+    with open(args.output, u'w') as fd:
+        json.dump({
+            u'model': args.model,
+            u'sensitivity': args.sensitivity,
+            u'audio_gain': args.audio_gain,
+            u'files': results
+        }, fd, indent=2)
+
+    duration = sum([result[u'duration'] for result in results])
+    detections = sum([len(result[u'detections']) for result in results])
+    errors = len([result for result in results if result[u'error']])
+    print(u'%d files (%d errors), %.2f hours of audio scanned in %.1f seconds (x%.1f real time): %d detections written to %s' % (
+        len(results), errors, duration / 3600.0, elapsed, duration / elapsed if elapsed>0 else 0.0, detections, args.output
+    ))
+
+    return 0
+
+
+if __name__ == u'__main__':
+    sys.exit(main())
+
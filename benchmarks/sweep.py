@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Sensitivity and audio gain sweep
+
+Runs snowboy detector over a labeled dataset for each combination of sensitivity and audio gain and reports false
+accepts per hour, miss rate and detection latency (DET curve points), then suggests the best operating point for
+module config (sensitivity and audiogain keys). Dataset directory must contain:
+ - positive/: hotword clips (wav or flac)
+ - negative/: background audio without hotword (wav or flac)
+
+For example:
+    python benchmarks/sweep.py /data/kitchen --model voice_model.pmdl --sensitivities 0.3 0.4 0.5 0.6 --audio-gains 1 1.5 2
+"""
+
+import os
+import sys
+import json
+import argparse
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, u'backend', u'snowboylib'))
+import evaluation
+
+
+def format_value(value, format):
+    """
+    Format optional value
+
+    Args:
+        value (float): value (can be None)
+        format (string): value format
+
+    Return:
+        string: formatted value or "-"
+    """
+    return u'-' if value is None else format % value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=u'Sensitivity and audio gain sweep')
+    parser.add_argument(u'dataset', help=u'dataset directory (with positive and negative sub directories)')
+    parser.add_argument(u'--model', default=evaluation.MODEL_FILE, help=u'voice model (pmdl or umdl)')
+    parser.add_argument(u'--resource', default=evaluation.RESOURCE_FILE, help=u'snowboy resource file')
+    parser.add_argument(u'--sensitivities', nargs=u'+', type=float, default=[0.3, 0.35, 0.4, 0.45, 0.5, 0.55, 0.6], help=u'detector sensitivities')
+    parser.add_argument(u'--audio-gains', nargs=u'+', type=float, default=[1.0, 1.5, 2.0], help=u'detector audio gains')
+    parser.add_argument(u'--max-fa-per-hour', type=float, default=evaluation.MAX_FA_PER_HOUR, help=u'false accepts budget')
+    parser.add_argument(u'--processes', type=int, default=None, help=u'number of processes (default one per core)')
+    parser.add_argument(u'--output', default=None, help=u'output json file')
+    args = parser.parse_args()
+
+    clips, negatives = evaluation.load_dataset(args.dataset)
+    print(u'%d positive clips, %d negative files' % (len(clips), len(negatives)))
+    results = evaluation.sweep(
+        clips,
+        negatives,
+        args.sensitivities,
+        args.audio_gains,
+        model=args.model,
+        resource=args.resource,
+        processes=args.processes
+    )
+    suggestion = evaluation.suggest(results, args.max_fa_per_hour)
+
+    print(u'  gain  sens |  FA/hour   miss | latency mean    p95 (s)')
+    for result in results:
+        print(u' %5.2f  %4.2f | %8s  %5.1f%% | %12s %6s' % (
+            result[u'audio_gain'],
+            result[u'sensitivity'],
+            format_value(result[u'fa_per_hour'], u'%.2f'),
+            result[u'miss_rate'] * 100.0,
+            format_value(result[u'latency_mean'], u'%.3f'),
+            format_value(result[u'latency_p95'], u'%.3f')
+        ))
+    if suggestion is None:
+        print(u'False accepts rate is unknown, no setting can be suggested')
+    else:
+        if not suggestion[u'within_budget']:
+            print(u'No setting meets %.2f false accepts per hour, lowest false accepts setting is suggested' % args.max_fa_per_hour)
+        print(u'Suggested module config: %s' % json.dumps(suggestion[u'config']))
+
+    if args.output:
+        with open(args.output, u'w') as fd:
+            json.dump({
+                u'model': args.model,
+                u'results': results,
+                u'suggestion': suggestion
+            }, fd, indent=2)
+
+    return 0
+
+
+if __name__ == u'__main__':
+    sys.exit(main())
+
@@ -19,6 +19,41 @@ var speechrecognitionService = function($q, $rootScope, rpcService, raspiotServi
             });
     };
 
+    self.setStreamingServer = function(url) {
+        return rpcService.sendCommand('set_streaming_server', 'speechrecognition', {'url':url})
+            .then(function() {
+                return raspiotService.reloadModuleConfig('speechrecognition');
+            });
+    };
+
+    self.setSensitivity = function(sensitivity) {
+        return rpcService.sendCommand('set_sensitivity', 'speechrecognition', {'sensitivity':sensitivity})
+            .then(function() {
+                return raspiotService.reloadModuleConfig('speechrecognition');
+            });
+    };
+
+    self.setAudioGain = function(audioGain) {
+        return rpcService.sendCommand('set_audio_gain', 'speechrecognition', {'audio_gain':audioGain})
+            .then(function() {
+                return raspiotService.reloadModuleConfig('speechrecognition');
+            });
+    };
+
+    self.setOfflineGrammar = function(grammar) {
+        return rpcService.sendCommand('set_offline_grammar', 'speechrecognition', {'grammar':grammar})
+            .then(function() {
+                return raspiotService.reloadModuleConfig('speechrecognition');
+            });
+    };
+
+    self.setOverrunPolicy = function(policy, maxLag) {
+        return rpcService.sendCommand('set_overrun_policy', 'speechrecognition', {'policy':policy, 'max_lag':maxLag})
+            .then(function() {
+                return raspiotService.reloadModuleConfig('speechrecognition');
+            });
+    };
+
     self.recordHotword = function() {
         return rpcService.sendCommand('record_hotword', 'speechrecognition', null, 20)
             .then(function() {
@@ -33,6 +68,20 @@ var speechrecognitionService = function($q, $rootScope, rpcService, raspiotServi
             });
     };
 
+    self.addHotwordModel = function(name, path) {
+        return rpcService.sendCommand('add_hotword_model', 'speechrecognition', {'name':name, 'path':path})
+            .then(function() {
+                return raspiotService.reloadModuleConfig('speechrecognition');
+            });
+    };
+
+    self.removeHotwordModel = function(name) {
+        return rpcService.sendCommand('remove_hotword_model', 'speechrecognition', {'name':name})
+            .then(function() {
+                return raspiotService.reloadModuleConfig('speechrecognition');
+            });
+    };
+
     self.buildHotword = function() {
         return rpcService.sendCommand('build_hotword', 'speechrecognition');
     };
@@ -65,6 +114,18 @@ var speechrecognitionService = function($q, $rootScope, rpcService, raspiotServi
             });
     };
 
+    self.getLatencyStats = function() {
+        return rpcService.sendCommand('get_latency_stats', 'speechrecognition');
+    };
+
+    self.getMetrics = function() {
+        return rpcService.sendCommand('get_metrics', 'speechrecognition');
+    };
+
+    self.getPrometheusMetrics = function() {
+        return rpcService.sendCommand('get_prometheus_metrics', 'speechrecognition');
+    };
+
     $rootScope.$on('speechrecognition.training.ok', function(event, uuid, params) {
 		toast.success('Your hotword voice model has been built successfully');
     });
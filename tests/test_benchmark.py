@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from raspiot.libs.externals.snowboylib import benchmark
+import numpy
+import unittest
+import logging
+
+logging.basicConfig(level=logging.WARN, format=u'%(asctime)s %(name)s %(levelname)s : %(message)s')
+
+class EnergyDetector(object):
+    """
+    Detector reporting hotword at first loud chunk after silence
+    """
+    def __init__(self):
+        self.loud = False
+
+    def RunDetection(self, data):
+        loud = numpy.abs(numpy.frombuffer(data, dtype=numpy.int16)).max()>1000
+        detected = loud and not self.loud
+        self.loud = loud
+        return 1 if detected else 0
+
+class BenchmarkTests(unittest.TestCase):
+
+    def setUp(self):
+        #200ms of speech followed by 100ms of silence
+        self.clip = numpy.concatenate((numpy.ones(3200) * 5000, numpy.zeros(1600))).astype(numpy.int16)
+
+    def tearDown(self):
+        pass
+
+    def test_speech_end(self):
+        self.assertEqual(benchmark.speech_end(self.clip), 3200)
+        self.assertEqual(benchmark.speech_end(numpy.zeros(1600, dtype=numpy.int16)), 0)
+
+    def test_build_stream(self):
+        stream, hotwords = benchmark.build_stream([self.clip, self.clip], gap=0.5)
+        self.assertEqual(len(stream), 3*8000 + 2*4800)
+        self.assertEqual(hotwords[1], {u'start': 20800, u'end': 24000, u'stop': 25600})
+
+    def test_match_detections(self):
+        hotwords = [{u'start': 100, u'end': 200, u'stop': 300}, {u'start': 1000, u'end': 1200, u'stop': 1300}]
+        matches = benchmark.match_detections([250, 260, 700, 2000], hotwords, 100)
+        self.assertEqual(matches[u'hits'], 1)
+        self.assertEqual(matches[u'misses'], 1)
+        self.assertEqual(matches[u'false_alarms'], 2)
+        self.assertEqual(matches[u'latencies'], [50])
+
+    def test_benchmark(self):
+        factory = lambda model, resource, sensitivity, audio_gain: EnergyDetector()
+        results = benchmark.benchmark([self.clip]*3, chunk_sizes=[800, 1600], gap=0.5, detector_factory=factory)
+        self.assertEqual(len(results), 2)
+        for result in results:
+            self.assertEqual(result[u'hits'], 3)
+            self.assertEqual(result[u'false_alarms'], 0)
+            self.assertGreater(result[u'rtf'], 0.0)
+        #detection at end of first chunk of speech
+        self.assertEqual(results[0][u'latency_max'], 800 - 3200)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from raspiot.libs.externals.snowboylib import corpus
+import os
+import wave
+import shutil
+import tempfile
+import numpy
+import unittest
+import logging
+
+logging.basicConfig(level=logging.WARN, format=u'%(asctime)s %(name)s %(levelname)s : %(message)s')
+
+class EnergyDetector(object):
+    """
+    Detector reporting hotword at first loud chunk after silence
+    """
+    def __init__(self):
+        self.loud = False
+
+    def Reset(self):
+        self.loud = False
+
+    def RunDetection(self, data):
+        loud = numpy.abs(numpy.frombuffer(data, dtype=numpy.int16)).max()>1000
+        detected = loud and not self.loud
+        self.loud = loud
+        return 1 if detected else 0
+
+def energy_detector(model, resource, sensitivity, audio_gain):
+    return EnergyDetector()
+
+class CorpusTests(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        #1s of silence then 0.5s of loud audio, repeated
+        silence = numpy.zeros(16000, dtype=numpy.int16)
+        loud = (numpy.ones(8000) * 5000).astype(numpy.int16)
+        self.write(u'a.wav', numpy.concatenate((silence, loud)))
+        os.mkdir(os.path.join(self.dir, u'sub'))
+        self.write(u'sub/b.wav', numpy.concatenate((silence, loud, silence, loud)))
+        open(os.path.join(self.dir, u'notes.txt'), u'w').close()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, name, samples):
+        wav = wave.open(os.path.join(self.dir, name), 'wb')
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(16000)
+        wav.writeframes(samples.tobytes())
+        wav.close()
+
+    def test_list_corpus(self):
+        paths = corpus.list_corpus(self.dir)
+        self.assertEqual([os.path.relpath(path, self.dir) for path in paths], [u'a.wav', os.path.join(u'sub', u'b.wav')])
+
+    def test_scan_corpus(self):
+        paths = corpus.list_corpus(self.dir)
+        results = corpus.scan_corpus(paths, processes=2, detector_factory=energy_detector)
+        self.assertEqual([result[u'path'] for result in results], paths)
+        self.assertEqual(results[0][u'detections'], [{u'time': 1.1, u'hotword': 1}])
+        self.assertEqual([detection[u'time'] for detection in results[1][u'detections']], [1.1, 2.6])
+        self.assertAlmostEqual(results[1][u'duration'], 3.0)
+        self.assertIsNone(results[1][u'error'])
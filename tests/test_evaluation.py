@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from raspiot.libs.externals.snowboylib import evaluation
+import os
+import wave
+import shutil
+import tempfile
+import numpy
+import unittest
+import logging
+
+logging.basicConfig(level=logging.WARN, format=u'%(asctime)s %(name)s %(levelname)s : %(message)s')
+
+class LevelDetector(object):
+    """
+    Detector reporting hotword at first chunk louder than a level depending on sensitivity
+    """
+    def __init__(self, sensitivity, audio_gain):
+        self.level = (1.0 - sensitivity) * 10000 / audio_gain
+        self.loud = False
+
+    def Reset(self):
+        self.loud = False
+
+    def RunDetection(self, data):
+        loud = numpy.abs(numpy.frombuffer(data, dtype=numpy.int16)).max()>self.level
+        detected = loud and not self.loud
+        self.loud = loud
+        return 1 if detected else 0
+
+def level_detector(model, resource, sensitivity, audio_gain):
+    return LevelDetector(sensitivity, audio_gain)
+
+class EvaluationTests(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.dir, u'positive'))
+        os.mkdir(os.path.join(self.dir, u'negative'))
+        #hotword at level 6000, background noise bursts at level 3000
+        hotword = numpy.concatenate(((numpy.ones(4096) * 6000), numpy.zeros(4096))).astype(numpy.int16)
+        background = numpy.tile(numpy.concatenate((numpy.zeros(8192), numpy.ones(2048) * 3000)), 10).astype(numpy.int16)
+        self.write(u'positive/1.wav', hotword)
+        self.write(u'positive/2.wav', hotword)
+        self.write(u'negative/1.wav', background)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, name, samples):
+        wav = wave.open(os.path.join(self.dir, name), 'wb')
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(16000)
+        wav.writeframes(samples.tobytes())
+        wav.close()
+
+    def test_sweep_and_suggest(self):
+        clips, negatives = evaluation.load_dataset(self.dir)
+        self.assertEqual(len(clips), 2)
+        results = evaluation.sweep(clips, negatives, [0.2, 0.5, 0.8], [1.0], processes=2, detector_factory=level_detector)
+        self.assertEqual([result[u'sensitivity'] for result in results], [0.2, 0.5, 0.8])
+        #too deaf, right, too sensitive
+        self.assertEqual(results[0][u'miss_rate'], 1.0)
+        self.assertEqual(results[1][u'miss_rate'], 0.0)
+        self.assertEqual(results[1][u'false_accepts'], 0)
+        self.assertEqual(results[2][u'false_accepts'], 10)
+        suggestion = evaluation.suggest(results)
+        self.assertTrue(suggestion[u'within_budget'])
+        self.assertEqual(suggestion[u'config'], {u'sensitivity': 0.5, u'audiogain': 1.0})
+
+    def test_suggest_without_budget(self):
+        results = [
+            {u'sensitivity': 0.4, u'audio_gain': 1.0, u'miss_rate': 0.1, u'fa_per_hour': 3.0, u'latency_mean': 0.2},
+            {u'sensitivity': 0.3, u'audio_gain': 1.0, u'miss_rate': 0.5, u'fa_per_hour': 2.0, u'latency_mean': 0.2},
+        ]
+        suggestion = evaluation.suggest(results, 1.0)
+        self.assertFalse(suggestion[u'within_budget'])
+        self.assertEqual(suggestion[u'sensitivity'], 0.3)
+        self.assertIsNone(evaluation.suggest([]))
+
+    def test_suggest_unknown_false_accepts(self):
+        results = [
+            {u'sensitivity': 0.8, u'audio_gain': 1.0, u'miss_rate': 0.0, u'fa_per_hour': None, u'latency_mean': 0.1},
+            {u'sensitivity': 0.4, u'audio_gain': 1.0, u'miss_rate': 0.1, u'fa_per_hour': 3.0, u'latency_mean': 0.2},
+        ]
+        suggestion = evaluation.suggest(results, 1.0)
+        self.assertFalse(suggestion[u'within_budget'])
+        self.assertEqual(suggestion[u'sensitivity'], 0.4)
+        self.assertIsNone(evaluation.suggest(results[:1]))
+
+    def test_load_dataset_without_negative(self):
+        os.remove(os.path.join(self.dir, u'negative/1.wav'))
+        with self.assertRaises(Exception):
+            evaluation.load_dataset(self.dir)
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from raspiot.libs.externals.latency import RollingHistogram, LatencyTracker
+import unittest
+import logging
+
+logging.basicConfig(level=logging.WARN, format=u'%(asctime)s %(name)s %(levelname)s : %(message)s')
+
+class RollingHistogramTests(unittest.TestCase):
+
+    def setUp(self):
+        self.h = RollingHistogram(100)
+
+    def tearDown(self):
+        pass
+
+    def test_empty(self):
+        stats = self.h.get_stats()
+        self.assertEqual(stats[u'count'], 0)
+        self.assertIsNone(stats[u'p50'])
+
+    def test_percentiles(self):
+        for i in range(1, 101):
+            self.h.add(float(i))
+        stats = self.h.get_stats()
+        self.assertEqual(stats[u'window'], 100)
+        self.assertAlmostEqual(stats[u'p50'], 50.5)
+        self.assertAlmostEqual(stats[u'p99'], 99.01)
+        self.assertEqual(stats[u'max'], 100.0)
+
+    def test_rolling_window(self):
+        for i in range(150):
+            self.h.add(1000.0 if i<50 else 1.0)
+        stats = self.h.get_stats()
+        self.assertEqual(stats[u'count'], 150)
+        self.assertEqual(stats[u'max'], 1.0)
+
+class LatencyTrackerTests(unittest.TestCase):
+
+    def test_add_timeline(self):
+        tracker = LatencyTracker()
+        tracker.add_timeline({
+            LatencyTracker.MARK_SPEECH_END: 10.0,
+            LatencyTracker.MARK_ENDPOINT: 10.7,
+            LatencyTracker.MARK_AUDIO_READY: 10.75,
+            LatencyTracker.MARK_STT_REQUEST: 10.75,
+            LatencyTracker.MARK_STT_RESPONSE: 11.5,
+            LatencyTracker.MARK_EVENT: 11.5,
+        })
+        stats = tracker.get_stats()
+        self.assertAlmostEqual(stats[u'endpointing'][u'p50'], 0.7)
+        self.assertAlmostEqual(stats[u'stt'][u'p50'], 0.75)
+        self.assertAlmostEqual(stats[u'total'][u'p50'], 1.5)
+        #hotword marks missing
+        self.assertEqual(stats[u'detection'][u'count'], 0)
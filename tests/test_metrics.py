@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from raspiot.libs.externals.metrics import Counter, MetricsRegistry
+from threading import Thread
+import unittest
+import logging
+
+logging.basicConfig(level=logging.WARN, format=u'%(asctime)s %(name)s %(levelname)s : %(message)s')
+
+class CounterTests(unittest.TestCase):
+
+    def setUp(self):
+        self.c = Counter(u'test_total', u'test')
+
+    def tearDown(self):
+        pass
+
+    def test_inc(self):
+        self.assertEqual(self.c.get(), 0)
+        self.c.inc()
+        self.c.inc()
+        self.assertEqual(self.c.get(), 2)
+        #reading doesn't increment
+        self.assertEqual(self.c.get(), 2)
+
+    def test_concurrent_inc(self):
+        def run():
+            for i in range(10000):
+                self.c.inc()
+        threads = [Thread(target=run) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.c.get(), 40000)
+
+class MetricsRegistryTests(unittest.TestCase):
+
+    def setUp(self):
+        self.r = MetricsRegistry(u'test')
+
+    def tearDown(self):
+        pass
+
+    def test_register_existing(self):
+        c1 = self.r.counter(u'errors_total', u'errors', {u'cause': u'a'})
+        c2 = self.r.counter(u'errors_total', u'errors', {u'cause': u'a'})
+        c3 = self.r.counter(u'errors_total', u'errors', {u'cause': u'b'})
+        self.assertIs(c1, c2)
+        self.assertIsNot(c1, c3)
+
+    def test_get_values(self):
+        self.r.counter(u'hits_total', u'hits').inc()
+        self.r.counter(u'errors_total', u'errors', {u'cause': u'a'}).inc()
+        self.r.callback(u'lag_seconds', u'lag', lambda: 0.5)
+        self.assertEqual(self.r.get_values(), {
+            u'hits_total': 1,
+            u'errors_total{cause="a"}': 1,
+            u'lag_seconds': 0.5
+        })
+
+    def test_invalid_type(self):
+        with self.assertRaises(Exception):
+            self.r.callback(u'lag_seconds', u'lag', lambda: 0.5, type=u'histogram')
+
+    def test_prometheus(self):
+        self.r.counter(u'errors_total', u'errors', {u'cause': u'a'}).inc()
+        self.r.counter(u'errors_total', u'errors', {u'cause': u'b'})
+        self.r.callback(u'lag_seconds', u'lag', lambda: None)
+        self.assertEqual(self.r.to_prometheus(), u'\n'.join([
+            u'# HELP test_errors_total errors',
+            u'# TYPE test_errors_total counter',
+            u'test_errors_total{cause="a"} 1',
+            u'test_errors_total{cause="b"} 0',
+            u'# HELP test_lag_seconds lag',
+            u'# TYPE test_lag_seconds gauge',
+            u'test_lag_seconds NaN',
+        ]) + u'\n')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from raspiot.libs.externals.snowboylib.ringbuffer import RingBuffer, SharedRingBuffer, POLICY_DROP_OLDEST, POLICY_DROP_NEWEST, POLICY_CATCH_UP
+import unittest
+import logging
+
+logging.basicConfig(level=logging.WARN, format=u'%(asctime)s %(name)s %(levelname)s : %(message)s')
+
+class RingBufferTests(unittest.TestCase):
+
+    def setUp(self):
+        self.b = RingBuffer(8)
+
+    def tearDown(self):
+        pass
+
+    def test_extend_get(self):
+        self.b.extend(b'abc')
+        self.assertEqual(len(self.b), 3)
+        self.assertEqual(self.b.get(), b'abc')
+        self.assertEqual(len(self.b), 0)
+        self.assertEqual(self.b.get(), b'')
+
+    def test_get_size(self):
+        self.b.extend(b'abcdef')
+        self.assertEqual(self.b.get(4), b'abcd')
+        self.assertEqual(self.b.get(4), b'ef')
+
+    def test_wrap_returns_two_views(self):
+        self.b.extend(b'abcdef')
+        self.b.get()
+        self.b.extend(b'ghijk')
+        views = self.b.get_views()
+        self.assertEqual(len(views), 2)
+        self.assertEqual(b''.join([v.tobytes() for v in views]), b'ghijk')
+
+    def test_overrun(self):
+        self.b.extend(b'abcdef')
+        self.b.extend(b'ghijk')
+        self.assertEqual(self.b.overruns, 1)
+        self.assertEqual(self.b.dropped, 3)
+        self.assertEqual(self.b.get(), b'defghijk')
+
+    def test_extend_bigger_than_buffer(self):
+        self.b.extend(b'0123456789')
+        self.assertEqual(self.b.dropped, 2)
+        self.assertEqual(self.b.get(), b'23456789')
+
+    def test_wait(self):
+        self.assertFalse(self.b.wait(4, 0.01))
+        self.b.extend(b'abcd')
+        self.assertTrue(self.b.wait(4, 0.01))
+
+    def test_interrupt(self):
+        self.b.interrupt()
+        self.b.extend(b'abcd')
+        self.assertFalse(self.b.wait(4))
+        self.b.reset_interrupt()
+        self.assertTrue(self.b.wait(4))
+
+    def test_get_previous(self):
+        self.b.extend(b'abcdef')
+        self.b.get(4)
+        self.assertEqual(self.b.get_previous(3), b'bcd')
+        self.assertEqual(self.b.get_previous(10), b'abcd')
+
+    def test_get_previous_overwritten(self):
+        self.b.extend(b'abcdef')
+        self.b.get()
+        self.b.extend(b'ghijk')
+        #a, b and c are overwritten
+        self.assertEqual(self.b.get_previous(6), b'def')
+        self.b.get(2)
+        self.assertEqual(self.b.get_previous(6), b'defgh')
+
+
+class SharedRingBufferTests(unittest.TestCase):
+
+    def setUp(self):
+        self.b = SharedRingBuffer(8)
+
+    def tearDown(self):
+        pass
+
+    def test_readers_have_own_cursor(self):
+        r1 = self.b.subscribe(u'r1')
+        r2 = self.b.subscribe(u'r2')
+        self.b.extend(b'abcdef')
+        self.assertEqual(r1.get(4), b'abcd')
+        self.assertEqual(len(r2), 6)
+        self.assertEqual(r2.get(), b'abcdef')
+        self.assertEqual(r1.get(), b'ef')
+
+    def test_reader_starts_at_subscription(self):
+        self.b.extend(b'abc')
+        r = self.b.subscribe()
+        self.b.extend(b'def')
+        self.assertEqual(r.get(), b'def')
+        self.assertEqual(r.get_previous(6), b'abcdef')
+
+    def test_overrun_only_affects_slow_reader(self):
+        slow = self.b.subscribe(u'slow')
+        fast = self.b.subscribe(u'fast')
+        self.b.extend(b'abcdef')
+        self.assertEqual(fast.get(), b'abcdef')
+        self.b.extend(b'ghijk')
+        self.assertEqual(fast.overruns, 0)
+        self.assertEqual(fast.get(), b'ghijk')
+        self.assertEqual(slow.overruns, 1)
+        self.assertEqual(slow.dropped, 3)
+        self.assertEqual(slow.get(), b'defghijk')
+
+    def test_drop_oldest_max_lag(self):
+        r = self.b.subscribe()
+        r.set_policy(POLICY_DROP_OLDEST, 4)
+        self.b.extend(b'abcdef')
+        self.assertEqual(r.dropped, 2)
+        self.assertEqual(r.get(), b'cdef')
+
+    def test_drop_newest(self):
+        r = self.b.subscribe()
+        #max lag is limited to half of buffer
+        r.set_policy(POLICY_DROP_NEWEST)
+        self.b.extend(b'abcdef')
+        self.assertEqual(len(r), 4)
+        self.assertEqual(r.get_lag(), 6)
+        self.assertEqual(r.get(), b'abcd')
+        self.assertEqual(r.overruns, 1)
+        self.assertEqual(r.dropped, 2)
+        self.b.extend(b'gh')
+        self.assertEqual(r.get(), b'gh')
+
+    def test_drop_newest_kept_data_overwritten(self):
+        r = self.b.subscribe()
+        r.set_policy(POLICY_DROP_NEWEST)
+        self.b.extend(b'abcdef')
+        self.b.extend(b'ghi')
+        self.assertEqual(r.overruns, 2)
+        self.assertEqual(r.dropped, 1)
+        self.assertEqual(r.get(), b'bcdefghi')
+
+    def test_catch_up(self):
+        r = self.b.subscribe()
+        r.set_policy(POLICY_CATCH_UP, 4)
+        self.b.extend(b'abc')
+        self.b.extend(b'def')
+        self.assertEqual(r.dropped, 6)
+        self.assertEqual(len(r), 0)
+        self.assertEqual(r.get_previous(2), b'ef')
+        self.b.extend(b'g')
+        self.assertEqual(r.get(), b'g')
+
+    def test_invalid_policy(self):
+        r = self.b.subscribe()
+        with self.assertRaises(Exception):
+            r.set_policy(u'dummy')
+        with self.assertRaises(Exception):
+            r.set_policy(POLICY_CATCH_UP, 0)
+
+    def test_unsubscribe_interrupts_reader(self):
+        r = self.b.subscribe()
+        self.b.unsubscribe(r)
+        self.assertEqual(self.b.get_readers(), [])
+        self.b.extend(b'abcd')
+        self.assertFalse(r.wait(4))
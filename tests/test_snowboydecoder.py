@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from raspiot.libs.externals.snowboylib import snowboydecoder
+from raspiot.libs.externals.snowboylib.ringbuffer import SharedRingBuffer
+from raspiot.libs.externals.snowboylib.sources import AudioSource
+from threading import Thread
+import time
+import unittest
+import logging
+
+logging.basicConfig(level=logging.WARN, format=u'%(asctime)s %(name)s %(levelname)s : %(message)s')
+
+class SlowDetector(object):
+    """
+    Snowboy detector slower than real time (never detects hotword)
+    """
+    delay = 0.3
+    lags = []
+    sizes = []
+    decoder = None
+
+    def __init__(self, resource_filename=None, model_str=None):
+        pass
+
+    def SetAudioGain(self, audio_gain):
+        pass
+
+    def SetSensitivity(self, sensitivity):
+        pass
+
+    def NumHotwords(self):
+        return 1
+
+    def NumChannels(self):
+        return 1
+
+    def SampleRate(self):
+        return 16000
+
+    def BitsPerSample(self):
+        return 16
+
+    def RunDetection(self, data):
+        SlowDetector.lags.append(SlowDetector.decoder.lag)
+        SlowDetector.sizes.append(len(data))
+        time.sleep(self.delay)
+        return 0
+
+class BufferSource(AudioSource):
+    """
+    Live audio source written by test
+    """
+    def __init__(self):
+        AudioSource.__init__(self, 16000, 1, 2)
+        self.buffer = SharedRingBuffer(16000 * 2 * 5)
+
+    def subscribe(self, name=None):
+        return self.buffer.subscribe(name)
+
+    def unsubscribe(self, reader):
+        self.buffer.unsubscribe(reader)
+
+class HotwordDetectorTests(unittest.TestCase):
+
+    def setUp(self):
+        self.snowboy_detect = snowboydecoder.snowboydetect.SnowboyDetect
+        snowboydecoder.snowboydetect.SnowboyDetect = SlowDetector
+        SlowDetector.lags = []
+        SlowDetector.sizes = []
+        self.source = BufferSource()
+        self.decoder = snowboydecoder.HotwordDetector(u'model.pmdl', source=self.source)
+        SlowDetector.decoder = self.decoder
+
+    def tearDown(self):
+        self.decoder.terminate()
+        snowboydecoder.snowboydetect.SnowboyDetect = self.snowboy_detect
+
+    def test_lag(self):
+        def capture():
+            #1.2 second of audio captured at real time pace (10ms chunks)
+            for i in range(120):
+                self.source.buffer.extend(b'\x00' * 320)
+                time.sleep(0.01)
+        thread = Thread(target=capture)
+        thread.start()
+        self.decoder.start(detected_callback=None, interrupt_check=lambda: len(SlowDetector.lags)>=4, sleep_time=0.1)
+        thread.join()
+
+        #each frame (128ms) takes 300ms to process: audio piles up behind detection
+        self.assertGreater(max(SlowDetector.lags), 0.2)
+        self.assertGreater(self.decoder.lag, 0.2)
+        #late detection still processes one frame at a time
+        self.assertEqual(SlowDetector.sizes, [self.decoder.frame_size] * len(SlowDetector.sizes))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from raspiot.libs.externals import snowboy
+from raspiot.libs.externals.snowboy import Snowboy
+import os
+import json
+import base64
+import struct
+import time
+import shutil
+import tempfile
+import unittest
+import logging
+
+logging.basicConfig(level=logging.WARN, format=u'%(asctime)s %(name)s %(levelname)s : %(message)s')
+
+class Filesystem(object):
+    """
+    CleepFilesystem writing on local filesystem and recording calls
+    """
+    def __init__(self):
+        self.calls = []
+
+    def open(self, path, mode):
+        self.calls.append((u'open', path))
+        return open(path, mode)
+
+    def close(self, fd):
+        fd.close()
+
+    def mkdir(self, path, recursive):
+        self.calls.append((u'mkdir', path))
+        os.makedirs(path)
+
+    def rm(self, path):
+        self.calls.append((u'rm', path))
+        os.remove(path)
+
+class Response(object):
+    """
+    Training api response
+    """
+    status_code = 201
+    ok = True
+    content = b''
+
+    def __init__(self, model):
+        self.model = model
+
+    def iter_content(self, size):
+        yield self.model
+
+    def close(self):
+        pass
+
+class Session(object):
+    """
+    Requests session storing posted bodies, model content is hotword name
+    """
+    def __init__(self):
+        self.bodies = []
+
+    def post(self, url, data=None, headers=None, stream=False):
+        body = b''.join(data)
+        self.bodies.append(body)
+        return Response(json.loads(body)[u'name'].encode(u'utf-8'))
+
+class SnowboyCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.dir, u'cache')
+        self.fs = Filesystem()
+        self.session = Session()
+        self.get_session = snowboy.get_session
+        snowboy.get_session = lambda: self.session
+        self.s = Snowboy(self.fs, u'token', cache_path=self.cache_path, cache_size=2)
+        self.models = []
+
+    def tearDown(self):
+        snowboy.get_session = self.get_session
+        shutil.rmtree(self.dir)
+        for model in self.models:
+            if os.path.exists(model):
+                os.remove(model)
+
+    def train(self, hotword, samples=None):
+        #distinct access times
+        time.sleep(0.01)
+        model = self.s.train_samples(samples or [b'\x01\x00' * 100, b'\x02\x00' * 100, b'\x03\x00' * 100], hotword)
+        self.models.append(model)
+        with open(model, u'rb') as fd:
+            self.assertEqual(fd.read(), hotword.encode(u'utf-8'))
+        return model
+
+    def cached_models(self):
+        return sorted([filename for filename in os.listdir(self.cache_path) if filename.endswith(u'.pmdl')])
+
+    def test_same_training_is_cached(self):
+        self.train(u'hello')
+        #api token is not part of cache key
+        self.s.set_api_token(u'other')
+        self.train(u'hello')
+        self.assertEqual(len(self.session.bodies), 1)
+        self.assertEqual(len(self.cached_models()), 1)
+
+    def test_different_training_is_not_cached(self):
+        self.train(u'hello')
+        self.train(u'hello', [b'\x04\x00' * 100, b'\x02\x00' * 100, b'\x03\x00' * 100])
+        self.train(u'bonjour')
+        self.assertEqual(len(self.session.bodies), 3)
+
+    def test_least_recently_used_is_evicted(self):
+        self.train(u'one')
+        self.train(u'two')
+        models = self.cached_models()
+        #use first model again, second one is evicted when cache is full
+        self.train(u'one')
+        self.train(u'three')
+        self.assertEqual(len(self.session.bodies), 3)
+        self.assertEqual(len(self.cached_models()), 2)
+        removed = [os.path.basename(path) for call, path in self.fs.calls if call==u'rm']
+        self.assertEqual(len(removed), 1)
+        self.assertIn(removed[0], models)
+        self.train(u'one')
+        self.assertEqual(len(self.session.bodies), 3)
+        self.train(u'two')
+        self.assertEqual(len(self.session.bodies), 4)
+
+    def test_invalid_index_is_rebuilt(self):
+        self.train(u'one')
+        with open(os.path.join(self.cache_path, Snowboy.CACHE_INDEX), u'w') as fd:
+            fd.write(u'not json')
+        self.train(u'two')
+        self.train(u'three')
+        self.assertEqual(len(self.cached_models()), 2)
+        with open(os.path.join(self.cache_path, Snowboy.CACHE_INDEX)) as fd:
+            index = json.load(fd)
+        self.assertEqual(sorted([u'%s.pmdl' % key for key in index.keys()]), self.cached_models())
+        #cache files are written through cleep filesystem
+        self.assertIn((u'open', os.path.join(self.cache_path, Snowboy.CACHE_INDEX)), self.fs.calls)
+
+class SnowboyBodyTests(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.session = Session()
+        self.get_session = snowboy.get_session
+        snowboy.get_session = lambda: self.session
+        #no cache: body is always posted
+        self.s = Snowboy(Filesystem(), u'token', cache_path=os.path.join(self.dir, u'cache'), cache_size=0)
+        self.models = []
+
+    def tearDown(self):
+        snowboy.get_session = self.get_session
+        shutil.rmtree(self.dir)
+        for model in self.models:
+            if os.path.exists(model):
+                os.remove(model)
+
+    def get_body(self):
+        self.assertEqual(len(self.session.bodies), 1)
+        return json.loads(self.session.bodies[0])
+
+    def test_samples_body(self):
+        #sizes spanning several chunks and not multiple of 3 (base64 encoded by chunks)
+        samples = [
+            b'\x01\x02' * (Snowboy.CHUNK_SIZE + 1),
+            b'\x03\x04' * 100,
+            b'\x05\x06' * (Snowboy.CHUNK_SIZE * 2 + 2),
+        ]
+        self.models.append(self.s.train_samples(samples, u'h\xe9llo', rate=8000))
+
+        body = self.get_body()
+        self.assertEqual(body[u'name'], u'h\xe9llo')
+        self.assertEqual(body[u'token'], u'token')
+        self.assertEqual(body[u'language'], u'ot')
+        self.assertEqual(len(body[u'voice_samples']), 3)
+        for sample, voice_sample in zip(samples, body[u'voice_samples']):
+            self.assertEqual(list(voice_sample.keys()), [u'wave'])
+            wave = base64.b64decode(voice_sample[u'wave'])
+            riff, size, fmt = struct.unpack('<4sI4s', wave[:12])
+            self.assertEqual((riff, size, fmt), (b'RIFF', 36 + len(sample), b'WAVE'))
+            channels, rate, byte_rate, block_align, bits = struct.unpack('<HIIHH', wave[22:36])
+            self.assertEqual((channels, rate, byte_rate, block_align, bits), (1, 8000, 16000, 2, 16))
+            self.assertEqual(struct.unpack('<4sI', wave[36:44]), (b'data', len(sample)))
+            self.assertEqual(wave[44:], sample)
+
+    def test_files_body(self):
+        records = []
+        for index, content in enumerate([b'RIFF' * 10000, b'a', b'ab']):
+            path = os.path.join(self.dir, u'record%d.wav' % index)
+            with open(path, u'wb') as fd:
+                fd.write(content)
+            records.append((path, content))
+        self.models.append(self.s.train(records[0][0], records[1][0], records[2][0], u'hello'))
+
+        body = self.get_body()
+        self.assertEqual(body[u'name'], u'hello')
+        self.assertEqual([base64.b64decode(sample[u'wave']) for sample in body[u'voice_samples']], [content for path, content in records])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from raspiot.libs.externals.snowboylib.sources import PcmSource, WavFileSource, SocketSource
+import os
+import socket
+import time
+import threading
+import unittest
+import logging
+
+logging.basicConfig(level=logging.WARN, format=u'%(asctime)s %(name)s %(levelname)s : %(message)s')
+
+RESOURCES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), u'resources')
+
+class PcmSourceTests(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_read_until_end(self):
+        source = PcmSource([b'abc', b'', b'defg', b'h'])
+        reader = source.subscribe()
+        self.assertTrue(reader.wait(2))
+        self.assertEqual(reader.get(2), b'ab')
+        #empty chunk means no audio yet
+        self.assertFalse(reader.wait(4))
+        self.assertFalse(reader.ended)
+        self.assertTrue(reader.wait(4))
+        self.assertEqual(reader.get(4), b'cdef')
+        #remaining audio is available at end of source
+        self.assertTrue(reader.wait(4))
+        self.assertTrue(reader.ended)
+        self.assertEqual(reader.get(), b'gh')
+        self.assertFalse(reader.wait(4))
+        self.assertEqual(reader.get_previous(3), b'fgh')
+
+    def test_single_reader(self):
+        source = PcmSource([])
+        source.subscribe()
+        self.assertRaises(Exception, source.subscribe)
+
+    def test_close(self):
+        source = PcmSource([b'abcd'])
+        reader = source.subscribe()
+        source.close()
+        self.assertTrue(reader.ended)
+        self.assertFalse(reader.wait(1))
+
+class WavFileSourceTests(unittest.TestCase):
+
+    def test_convert(self):
+        #44.1kHz stereo 32 bits recording
+        source = WavFileSource(os.path.join(RESOURCES, u'snowboy1.wav'), rate=16000, channels=1, sample_width=2)
+        reader = source.subscribe()
+        length = 0
+        while reader.wait(4096):
+            length += len(reader.get())
+        self.assertTrue(reader.ended)
+        #4.75 seconds of 16kHz 16 bits audio
+        self.assertAlmostEqual(length / 32000.0, 4.75, places=2)
+
+class SocketSourceTests(unittest.TestCase):
+
+    def test_receive(self):
+        server, client = socket.socketpair()
+        source = SocketSource(server, timeout=0.05)
+        reader = source.subscribe()
+        self.assertFalse(reader.wait(4))
+        def send():
+            client.sendall(b'abcdefgh')
+            client.close()
+        threading.Thread(target=send).start()
+        data = b''
+        while not reader.ended:
+            if reader.wait(4):
+                data += reader.get()
+        self.assertEqual(data, b'abcdefgh')
+        source.close()
+
+    def test_receive_odd_chunks(self):
+        server, client = socket.socketpair()
+        source = SocketSource(server, sample_width=2, chunk_size=4097, timeout=0.05)
+        reader = source.subscribe()
+        def send():
+            for i in range(3):
+                client.sendall(b'\x01' * 4097)
+                time.sleep(0.02)
+            client.close()
+        threading.Thread(target=send).start()
+        chunks = []
+        while not reader.ended:
+            if reader.wait(2):
+                chunks.append(reader.get())
+        #only whole 16 bits samples are delivered, incomplete last sample is dropped
+        for chunk in chunks:
+            self.assertEqual(len(chunk) % 2, 0)
+        self.assertEqual(len(b''.join(chunks)), 3 * 4097 - 1)
+        source.close()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from raspiot.modules.speechrecognition.speechrecognition import SpeechRecognitionProcess
+from raspiot.libs.externals.snowboylib import snowboydecoder
+from raspiot.libs.externals.metrics import MetricsRegistry
+from threading import Event
+import speech_recognition as speechrecognition
+import unittest
+import logging
+
+logging.basicConfig(level=logging.WARN, format=u'%(asctime)s %(name)s %(levelname)s : %(message)s')
+
+class FakeEvent(object):
+    """
+    Event recording sent and rendered events
+    """
+    def __init__(self):
+        self.sent = []
+        self.rendered = 0
+        self.on_send = Event()
+
+    def send(self, params=None, to=None):
+        self.sent.append(params)
+        self.on_send.set()
+
+    def render(self):
+        self.rendered += 1
+
+class FakeDetector(object):
+    """
+    Hotword detector that never runs
+    """
+    def __init__(self, decoder_model, sensitivity=[], audio_gain=1, source=None, overrun_policy=None, max_lag=None):
+        self.timestamps = {}
+        self.lag = 0.0
+
+    def sampleRate(self):
+        return 16000
+
+    def sampleWidth(self):
+        return 2
+
+    def interrupt(self):
+        pass
+
+    def terminate(self):
+        pass
+
+class FakeSttProvider(object):
+    """
+    STT provider returning configured command or raising configured exception
+    """
+    def __init__(self, command=u'turn on the light', error=None):
+        self.command = command
+        self.error = error
+        self.calls = 0
+
+    def prewarm(self):
+        pass
+
+    def open_stream(self, sample_rate, sample_width):
+        return None
+
+    def recognize(self, audio, stream=None):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return {
+            u'command': self.command,
+            u'duration': 0.1
+        }
+
+class SpeechRecognitionProcessTests(unittest.TestCase):
+
+    def setUp(self):
+        self.hotword_detector = snowboydecoder.HotwordDetector
+        snowboydecoder.HotwordDetector = FakeDetector
+        self.events = {
+            u'hotword_detected': FakeEvent(),
+            u'hotword_released': FakeEvent(),
+            u'command_detected': FakeEvent(),
+            u'command_error': FakeEvent(),
+        }
+        self.metrics = MetricsRegistry()
+        self.provider = FakeSttProvider()
+        self.p = None
+
+    def tearDown(self):
+        if self.p:
+            self.p.stop(timeout=1.0)
+        snowboydecoder.HotwordDetector = self.hotword_detector
+
+    def init(self, stt_queue_size=5):
+        self.p = SpeechRecognitionProcess(logging.getLogger(u'test'), None, [{u'name': u'hello', u'path': u'hello.pmdl'}],
+                                          self.events, self.provider, stt_workers=1, stt_queue_size=stt_queue_size, metrics=self.metrics)
+
+    def get_errors(self):
+        values = self.metrics.get_values()
+        return dict([(cause, values[u'command_errors_total{cause="%s"}' % cause]) for cause in (
+            SpeechRecognitionProcess.ERROR_NO_AUDIO,
+            SpeechRecognitionProcess.ERROR_QUEUE_FULL,
+            SpeechRecognitionProcess.ERROR_UNKNOWN_VALUE,
+            SpeechRecognitionProcess.ERROR_REQUEST,
+            SpeechRecognitionProcess.ERROR_NO_COMMAND,
+            SpeechRecognitionProcess.ERROR_PROVIDER,
+        )])
+
+    def assertErrors(self, cause):
+        errors = self.get_errors()
+        self.assertEqual(errors[cause], 1)
+        self.assertEqual(sum(errors.values()), 1)
+        self.assertEqual(len(self.events[u'command_error'].sent), 1)
+        self.assertEqual(self.events[u'command_error'].rendered, 1)
+        self.assertEqual(self.events[u'command_detected'].sent, [])
+        self.assertEqual(self.metrics.get_values()[u'commands_recognized_total'], 0)
+
+    def test_command_recognized_by_worker(self):
+        self.init()
+        for worker in self.p.workers:
+            worker.start()
+        self.p.hotword_detected(u'hello')
+        self.p.record_command(b'\x00\x01' * 1600)
+
+        self.assertTrue(self.events[u'command_detected'].on_send.wait(2.0))
+        self.assertEqual(self.events[u'hotword_detected'].sent, [{u'hotword': u'hello'}])
+        self.assertEqual(len(self.events[u'hotword_released'].sent), 1)
+        self.assertEqual(self.events[u'command_detected'].sent, [{u'hotword': u'hello', u'command': u'turn on the light'}])
+        self.assertEqual(self.events[u'command_error'].sent, [])
+        values = self.metrics.get_values()
+        self.assertEqual(values[u'hotword_detections_total'], 1)
+        self.assertEqual(values[u'stt_requests_total'], 1)
+        self.assertEqual(values[u'commands_recognized_total'], 1)
+        self.assertEqual(sum(self.get_errors().values()), 0)
+
+    def test_queue_full(self):
+        #workers not started: first command waits in queue, second one is dropped
+        self.init(stt_queue_size=1)
+        self.p.record_command(b'\x00\x01' * 1600)
+        self.p.record_command(b'\x00\x01' * 1600)
+
+        self.assertErrors(SpeechRecognitionProcess.ERROR_QUEUE_FULL)
+        self.assertEqual(len(self.events[u'hotword_released'].sent), 2)
+        self.assertEqual(self.provider.calls, 0)
+
+    def test_unknown_value(self):
+        self.provider.error = speechrecognition.UnknownValueError()
+        self.init()
+        self.p.recognize_command(None, hotword=u'hello')
+
+        self.assertErrors(SpeechRecognitionProcess.ERROR_UNKNOWN_VALUE)
+        self.assertEqual(self.metrics.get_values()[u'stt_requests_total'], 1)
+
+    def test_request_error(self):
+        self.provider.error = speechrecognition.RequestError(u'unreachable')
+        self.init()
+        self.p.recognize_command(None, hotword=u'hello')
+
+        self.assertErrors(SpeechRecognitionProcess.ERROR_REQUEST)
+        self.assertEqual(self.metrics.get_values()[u'stt_requests_total'], 1)
+
+    def test_provider_error(self):
+        self.provider.error = KeyError(u'command')
+        self.init()
+        self.p.recognize_command(None, hotword=u'hello')
+
+        self.assertErrors(SpeechRecognitionProcess.ERROR_PROVIDER)
+        self.assertEqual(self.metrics.get_values()[u'stt_requests_total'], 1)
+
+    def test_counters_kept_when_process_restarts(self):
+        self.provider.error = speechrecognition.UnknownValueError()
+        self.init()
+        self.p.recognize_command(None)
+        self.p.stop(timeout=1.0)
+        self.init()
+        self.p.recognize_command(None)
+
+        self.assertEqual(self.get_errors()[SpeechRecognitionProcess.ERROR_UNKNOWN_VALUE], 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from raspiot.libs.externals.sttproviders import ChunkedHttpSttStream, StandInSttServer, StreamingServerSttProvider, SphinxSttProvider
+import speech_recognition as speechrecognition
+import os
+import shutil
+import tempfile
+import unittest
+import logging
+
+logging.basicConfig(level=logging.WARN, format=u'%(asctime)s %(name)s %(levelname)s : %(message)s')
+
+class ChunkedHttpSttStreamTests(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StandInSttServer(transcriber=lambda data: u'turn on the light' if len(data)==6 else u'')
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_stream(self):
+        stream = ChunkedHttpSttStream(self.server.get_url())
+        stream.feed(b'abc')
+        stream.feed(b'def')
+        self.assertEqual(stream.finish(), u'turn on the light')
+        self.assertEqual(self.server.requests[0][u'size'], 6)
+
+    def test_stream_not_understood(self):
+        stream = ChunkedHttpSttStream(self.server.get_url())
+        stream.feed(b'abc')
+        with self.assertRaises(speechrecognition.UnknownValueError):
+            stream.finish()
+
+    def test_stream_unreachable(self):
+        stream = ChunkedHttpSttStream(u'http://127.0.0.1:1/', timeout=1.0)
+        stream.feed(b'abc')
+        with self.assertRaises(speechrecognition.RequestError):
+            stream.finish()
+
+class StreamingServerSttProviderTests(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StandInSttServer()
+        self.server.start()
+        self.provider = StreamingServerSttProvider(self.server.get_url())
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_recognize_stream(self):
+        stream = self.provider.open_stream(16000, 2)
+        stream.feed(b'abcd')
+        result = self.provider.recognize(None, stream)
+        self.assertEqual(result[u'command'], u'received 4 bytes')
+        self.assertGreaterEqual(result[u'duration'], 0.0)
+
+class SphinxSttProviderTests(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_grammar_valid(self):
+        path = os.path.join(self.dir, u'commands.gram')
+        with open(path, u'w') as fd:
+            fd.write(u'#JSGF V1.0;\ngrammar commands;\npublic <command> = turn (on | off) the light;\n')
+        self.assertTrue(SphinxSttProvider.is_grammar_valid(path))
+
+    def test_grammar_invalid(self):
+        self.assertFalse(SphinxSttProvider.is_grammar_valid(os.path.join(self.dir, u'missing.gram')))
+        path = os.path.join(self.dir, u'commands.txt')
+        with open(path, u'w') as fd:
+            fd.write(u'turn on the light\n')
+        self.assertFalse(SphinxSttProvider.is_grammar_valid(path))
+        self.assertFalse(SphinxSttProvider.is_grammar_valid(self.dir))
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from raspiot.libs.externals.snowboylib.vad import Endpointer, trim_silence
+import numpy
+import unittest
+import logging
+
+logging.basicConfig(level=logging.WARN, format=u'%(asctime)s %(name)s %(levelname)s : %(message)s')
+
+class EndpointerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.e = Endpointer(16000, trailing_silence=0.3, max_utterance=5.0)
+        #100ms chunks
+        self.voice = (numpy.ones(1600) * 1000).astype(numpy.int16).tobytes()
+        self.silence = numpy.zeros(1600, dtype=numpy.int16).tobytes()
+
+    def tearDown(self):
+        pass
+
+    def test_trailing_silence(self):
+        chunks = [self.voice]*5 + [self.silence]*2 + [self.voice] + [self.silence]*5
+        ends = [self.e.process(chunk) for chunk in chunks]
+        self.assertEqual(ends.index(True), 10)
+        self.assertEqual(self.e.voiced_samples, 12800)
+        self.assertEqual(self.e.endpoint, 17600)
+        self.assertAlmostEqual(self.e.get_latency(), 0.3)
+        self.assertEqual(self.e.get_endpoint_offset(2), 35200)
+
+    def test_endpoint_independent_of_chunk_size(self):
+        data = self.voice*3 + self.silence*5
+        self.e.process(data)
+        self.assertEqual(self.e.endpoint, 9600)
+        self.assertAlmostEqual(self.e.get_latency(), 0.5)
+
+    def test_max_utterance(self):
+        for i in range(49):
+            self.assertFalse(self.e.process(self.voice))
+        self.assertTrue(self.e.process(self.voice))
+        self.assertEqual(self.e.endpoint, 80000)
+
+    def test_wait_speech(self):
+        e = Endpointer(16000, trailing_silence=0.3, max_utterance=5.0, wait_speech=True)
+        for i in range(10):
+            self.assertFalse(e.process(self.silence))
+        self.assertFalse(e.has_speech())
+        self.assertFalse(e.process(self.voice))
+        self.assertTrue(e.has_speech())
+        ends = [e.process(self.silence) for i in range(3)]
+        self.assertEqual(ends, [False, False, True])
+        self.assertEqual(e.endpoint, 22400)
+
+    def test_reset(self):
+        self.e.process(self.silence*4)
+        self.assertIsNotNone(self.e.endpoint)
+        self.e.reset()
+        self.assertIsNone(self.e.endpoint)
+        self.assertFalse(self.e.process(self.voice))
+
+
+class TrimSilenceTests(unittest.TestCase):
+
+    def setUp(self):
+        #100ms of loud constant signal and 100ms of silence (rms window of 1 sample)
+        self.voice = (numpy.ones(1600) * 10000).astype(numpy.int16)
+        self.silence = numpy.zeros(1600, dtype=numpy.int16)
+
+    def tearDown(self):
+        pass
+
+    def trim(self, samples):
+        return trim_silence(numpy.concatenate(samples), 16000, duration=0.1, threshold=10, window_time=0.0)
+
+    def test_trim_beginning_and_end(self):
+        trimmed = self.trim([self.silence]*3 + [self.voice]*2 + [self.silence]*3)
+        self.assertEqual(len(trimmed), 3200)
+
+    def test_short_sound_at_beginning_is_removed(self):
+        trimmed = self.trim([self.silence, self.voice[:800], self.silence, self.voice])
+        self.assertEqual(len(trimmed), 1600)
+
+    def test_short_silence_is_kept(self):
+        trimmed = self.trim([self.voice, self.silence[:800], self.voice, self.silence[:800]])
+        self.assertEqual(len(trimmed), 4800)
+
+    def test_long_silence_in_middle_is_removed(self):
+        trimmed = self.trim([self.voice, self.silence, self.silence, self.voice])
+        self.assertEqual(len(trimmed), 3200)
+
+    def test_only_silence(self):
+        self.assertEqual(len(self.trim([self.silence]*3)), 0)